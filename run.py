@@ -1,20 +1,13 @@
-# run from repo root: python - <<'PY'
-import os
-from neo4j import GraphDatabase, basic_auth
+# Load the data/ artifacts into Neo4j. Run from repo root:
+#   python run.py [--batch-size 5000] [--writers 4]
+# Connection settings come from the same NEO4J_* env vars / .env as the app.
+import pathlib
+import sys
 
-uri = os.getenv("NEO4J_URI", "bolt://localhost:7687")
-user = os.getenv("NEO4J_USER", "neo4j")
-pwd = os.getenv("NEO4J_PASSWORD", "password")
-db = os.getenv("NEO4J_DATABASE", "neo4j")
+sys.path.append(str(pathlib.Path(__file__).resolve().parent / "src"))
 
-with open("data/sample_import.cypher") as f:
-    statements = f.read()
+from app.ingest import main  # noqa: E402
 
-driver = GraphDatabase.driver(uri, auth=basic_auth(user, pwd))
-with driver.session(database=db) as session:
-    for stmt in statements.split(";"):
-        s = stmt.strip()
-        if s:
-            session.run(s)
-driver.close()
-PY
+
+if __name__ == "__main__":
+    main()
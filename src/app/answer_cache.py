@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import atexit
+import hashlib
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .cache import LRUCache, SQLiteStore, TieredCache
+from .config import Settings
+
+
+def normalize_answer_question(text: str) -> str:
+    """Exact-tier form of a question: lower-cased, whitespace collapsed, trailing punctuation dropped."""
+    return " ".join(text.lower().split()).rstrip("?!. ")
+
+
+def digest(*parts: str) -> str:
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    status: str  # "hit" (exact) or "semantic_hit"
+    similarity: float = 1.0
+    question: str = ""
+
+
+class AnswerCache:
+    """
+    LLM answer cache with an exact and a semantic tier.
+
+    Exact entries are keyed on (model key, persona/task hash, context hash,
+    normalized question). The semantic tier groups answers by (model key,
+    persona/task hash, context hash, embedding model): a new question reuses
+    an answer from its group when their embeddings' cosine similarity is at
+    least ``threshold``. Because the context hash is part of both keys, an
+    answer is only reused for exactly the same retrieved rows.
+
+    Both tiers are LRU/TTL bounded in memory and optionally persisted to SQLite.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[float] = 3600.0,
+        path: Optional[str] = None,
+        semantic: bool = True,
+        threshold: float = 0.92,
+        max_group_size: int = 32,
+    ):
+        self.exact = TieredCache(
+            LRUCache(maxsize=maxsize, ttl=ttl), SQLiteStore(path, table="answer_cache") if path else None
+        )
+        self.groups = TieredCache(
+            LRUCache(maxsize=maxsize, ttl=ttl), SQLiteStore(path, table="answer_groups") if path else None
+        )
+        self.ttl = ttl
+        self.semantic = semantic
+        self.threshold = threshold
+        self.max_group_size = max_group_size
+        self.semantic_hits = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def exact_key(model_key: str, persona: str, task: str, context: str, question: str) -> str:
+        return digest(model_key, digest(persona, task), digest(context), normalize_answer_question(question))
+
+    @staticmethod
+    def group_key(model_key: str, persona: str, task: str, context: str, embed_model: str) -> str:
+        return digest("semantic", model_key, digest(persona, task), digest(context), embed_model)
+
+    def _live_entries(self, group: str) -> List[Dict[str, Any]]:
+        now = time.time()
+        return [e for e in self.groups.get(group) or [] if e.get("expires_at") is None or e["expires_at"] > now]
+
+    def lookup(
+        self,
+        model_key: str,
+        persona: str,
+        task: str,
+        context: str,
+        question: str,
+        embed_model: Optional[str] = None,
+        embed: Optional[Callable[[str], List[float]]] = None,
+    ) -> Optional[CachedAnswer]:
+        """
+        Cached answer for the question, or None.
+
+        ``embed`` is only called when the semantic group for this context
+        already has answers, so misses on new contexts cost no encode.
+        """
+        answer = self.exact.get(self.exact_key(model_key, persona, task, context, question))
+        if answer is not None:
+            return CachedAnswer(answer, "hit", question=question)
+        if not self.semantic or embed is None or embed_model is None:
+            return None
+        entries = self._live_entries(self.group_key(model_key, persona, task, context, embed_model))
+        if not entries:
+            return None
+        try:
+            vector = embed(question)
+        except Exception as e:
+            print(f"Warning: answer cache could not embed question: {e}")
+            return None
+        best = max(entries, key=lambda e: cosine(vector, e["vector"]))
+        similarity = cosine(vector, best["vector"])
+        if similarity < self.threshold:
+            return None
+        with self._lock:
+            self.semantic_hits += 1
+        return CachedAnswer(best["answer"], "semantic_hit", similarity, best["question"])
+
+    def store(
+        self,
+        model_key: str,
+        persona: str,
+        task: str,
+        context: str,
+        question: str,
+        answer: str,
+        embed_model: Optional[str] = None,
+        embed: Optional[Callable[[str], List[float]]] = None,
+    ) -> None:
+        self.exact.set(self.exact_key(model_key, persona, task, context, question), answer)
+        if not self.semantic or embed is None or embed_model is None:
+            return
+        try:
+            vector = embed(question)
+        except Exception as e:
+            print(f"Warning: answer cache could not embed question: {e}")
+            return
+        group = self.group_key(model_key, persona, task, context, embed_model)
+        entry = {
+            "question": question,
+            "vector": [float(v) for v in vector],
+            "answer": answer,
+            "expires_at": time.time() + self.ttl if self.ttl else None,
+        }
+        with self._lock:
+            entries = [
+                e for e in self._live_entries(group)
+                if normalize_answer_question(e["question"]) != normalize_answer_question(question)
+            ]
+            self.groups.set(group, (entries + [entry])[-self.max_group_size:])
+
+    def stats(self) -> Dict[str, float]:
+        payload = self.exact.stats.as_dict()
+        payload["semantic_hits"] = self.semantic_hits
+        return payload
+
+    def clear(self) -> None:
+        self.exact.clear()
+        self.groups.clear()
+
+    def close(self) -> None:
+        for tier in (self.exact, self.groups):
+            if tier.disk is not None:
+                tier.disk.close()
+
+
+def build_answer_cache(settings: Settings) -> Optional[AnswerCache]:
+    if not settings.answer_cache_enabled:
+        return None
+    return AnswerCache(
+        maxsize=settings.answer_cache_size,
+        ttl=settings.answer_cache_ttl or None,
+        path=settings.answer_cache_path or None,
+        semantic=settings.answer_cache_semantic,
+        threshold=settings.answer_cache_threshold,
+    )
+
+
+_shared_answer_cache: Optional[AnswerCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_answer_cache(settings: Settings) -> Optional[AnswerCache]:
+    """
+    Return the process-wide answer cache (None when disabled), creating it on first use.
+
+    Every Pipeline shares it, so the memory tier survives Streamlit reruns and
+    answers are reused across sessions without a SQLite path.
+    """
+    global _shared_answer_cache
+    with _shared_lock:
+        if _shared_answer_cache is None:
+            _shared_answer_cache = build_answer_cache(settings)
+        return _shared_answer_cache
+
+
+def close_answer_cache() -> None:
+    """Close the shared cache's SQLite tier (registered with atexit)."""
+    global _shared_answer_cache
+    with _shared_lock:
+        if _shared_answer_cache is not None:
+            _shared_answer_cache.close()
+            _shared_answer_cache = None
+
+
+atexit.register(close_answer_cache)
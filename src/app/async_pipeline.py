@@ -0,0 +1,356 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from .answer_cache import CachedAnswer
+from .context_budget import BudgetedContext
+from .embedding import EmbeddingService
+from .kg_client import AsyncKGClient
+from .llm import arun_llm, astream_llm
+from .llm_clients import CallTiming
+from .llm_scheduler import PRIORITY_INTERACTIVE
+from .pipeline import Pipeline, RetrievalContext, RetrievalResult
+from .queries import build_query
+from .tracing import Trace, optional_span, payload_bytes
+
+
+class AsyncAnswerStream:
+    """
+    Async iterable of answer text chunks; the asyncio counterpart of ``AnswerStream``.
+
+    ``result`` is set once iteration completes.
+    """
+
+    def __init__(
+        self,
+        tokens: AsyncIterator[str],
+        finish: Callable[[str, Dict[str, float]], RetrievalResult],
+    ):
+        self._tokens = tokens
+        self._finish = finish
+        self.result: Optional[RetrievalResult] = None
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        start = time.perf_counter()
+        first: Optional[float] = None
+        parts: List[str] = []
+        async for token in self._tokens:
+            if first is None:
+                first = time.perf_counter() - start
+            parts.append(token)
+            yield token
+        metrics = {"generation_sec": time.perf_counter() - start}
+        if first is not None:
+            metrics["time_to_first_token_sec"] = first
+        self.result = self._finish("".join(parts), metrics)
+
+
+class AsyncPipeline:
+    """
+    asyncio version of ``Pipeline``: one event loop serves many questions
+    without a blocked thread per request.
+
+    Graph queries run on ``AsyncGraphDatabase`` sessions and LLM calls use
+    ``ainvoke``/``astream``. Embedding encodes, token counting and answer
+    cache lookups are CPU-bound and run on a small thread pool. Classifiers,
+    templates, the LLM registry, caches and the backend scheduler are shared
+    with a sync ``Pipeline``, so both produce the same results for the same
+    question. Answer hedging (``LLM_HEDGE_MODEL``) applies to the sync
+    pipeline only.
+
+    Create it inside the event loop that uses it and ``await aclose()`` at the end.
+    """
+
+    def __init__(self, pipeline: Optional[Pipeline] = None):
+        self.sync = pipeline or Pipeline()
+        self.settings = self.sync.settings
+        self.llm_registry = self.sync.llm_registry
+        self.client = AsyncKGClient(self.settings, query_cache=self.sync.client.query_cache)
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.settings.retrieval_workers, thread_name_prefix="async-offload"
+        )
+
+    async def aclose(self) -> None:
+        await self.client.close()
+        self.executor.shutdown(wait=False)
+
+    async def _offload(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run ``fn`` on the worker pool; spans it opens nest under the current one."""
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(self.executor, context.run, fn, *args)
+
+    @staticmethod
+    async def _collect(
+        call: Optional[Awaitable[List[Dict[str, object]]]], timeout: float, label: str
+    ) -> Optional[List[Dict[str, object]]]:
+        """Await a retrieval branch; failures and timeouts are logged and return None."""
+        if call is None:
+            return None
+        try:
+            return await asyncio.wait_for(call, timeout)
+        except asyncio.TimeoutError:
+            print(f"Warning: {label} timed out after {timeout}s")
+            return None
+        except Exception as e:
+            print(f"Warning: {label} failed: {e}")
+            return None
+
+    async def _run_baseline(self, intent: str, query: Dict[str, object], trace: Trace) -> List[Dict[str, object]]:
+        with trace.span("baseline_query", intent=intent) as span:
+            rows = await self.client.run_query(query["text"], query.get("params"), intent=intent)
+            span.set(rows=len(rows), bytes=payload_bytes(rows))
+        return rows
+
+    async def _run_vector(self, question: str, embed_key: str, trace: Trace) -> List[Dict[str, object]]:
+        # Construction loads the model on first use.
+        embeddings = await self._offload(EmbeddingService, self.settings, embed_key)
+        with trace.span("embedding_encode", model_key=embed_key) as span:
+            vector = await self._offload(embeddings.embed_query, question)
+            span.set(dims=len(vector))
+        with trace.span("vector_query", backend=self.settings.vector_backend) as span:
+            rows = await embeddings.asearch_vector(self.client, vector, top_k=8, executor=self.executor)
+            span.set(rows=len(rows), bytes=payload_bytes(rows))
+        return rows
+
+    async def retrieve(
+        self,
+        question: str,
+        retrieval: str = "hybrid",
+        embed_model_key: Optional[str] = None,
+    ) -> RetrievalContext:
+        """Async ``Pipeline.retrieve``: baseline Cypher and vector search run concurrently."""
+        start = time.perf_counter()
+        trace = Trace()
+        with trace.span("retrieve", retrieval=retrieval):
+            with trace.span("intent_classification") as span:
+                intent_result = self.sync.intent.predict(question)
+                span.set(intent=intent_result.intent)
+            with trace.span("entity_extraction") as span:
+                entities = self.sync.entities.parse(question)
+                span.set(entities=sum(v is not None for v in entities.to_params().values()))
+            with trace.span("query_build", intent=intent_result.intent) as span:
+                query = build_query(
+                    intent_result.intent, entities, canonical=self.sync.canonical, rollups=self.sync.rollups
+                )
+                span.set(found=query is not None, canonical=self.sync.canonical, rollups=self.sync.rollups)
+
+            embed_key = embed_model_key or "model_1"
+            baseline_needed = query and (
+                retrieval in ("baseline", "hybrid")
+                or intent_result.intent in self.sync.BASELINE_REQUIRED_INTENTS
+            )
+            baseline_call = self._run_baseline(intent_result.intent, query, trace) if baseline_needed else None
+            vector_call = (
+                self._run_vector(question, embed_key, trace) if retrieval in ("embeddings", "hybrid") else None
+            )
+            baseline_rows, embed_rows = await asyncio.gather(
+                self._collect(baseline_call, self.settings.baseline_timeout, "Baseline query"),
+                self._collect(vector_call, self.settings.vector_timeout, "Embedding search"),
+            )
+            baseline_rows = baseline_rows or []
+            embed_model_used = embed_key if embed_rows is not None else None
+            embed_rows = embed_rows or []
+
+            with trace.span("context_assembly") as span:
+                context = self.sync._assemble(
+                    question,
+                    retrieval,
+                    intent_result.intent,
+                    entities,
+                    query,
+                    baseline_rows,
+                    embed_rows,
+                    embed_model_used,
+                    retrieval_sec=time.perf_counter() - start,
+                )
+                span.set(
+                    baseline_rows=len(baseline_rows),
+                    embed_rows=len(embed_rows),
+                    bytes=len(context.context.encode("utf-8")),
+                    **context.context_stats,
+                )
+        context.trace_id = trace.trace_id
+        context.spans = list(trace.spans)
+        self.sync._export(trace.spans)
+        return context
+
+    @asynccontextmanager
+    async def _llm_slot(self, model_key: Optional[str], priority: int, trace: Trace) -> AsyncIterator[float]:
+        """
+        ``Pipeline._llm_slot`` for coroutines. Waiting for a busy backend
+        parks a worker thread, not the event loop.
+        """
+        config = self.llm_registry.options().get(model_key)
+        backend = config.backend if config else ""
+        deadline = (self.settings.llm_queue_deadline or None) if priority <= PRIORITY_INTERACTIVE else None
+        slot = self.sync.scheduler.slot(backend, priority, deadline)
+        with optional_span(trace, "llm_queue", backend=backend, priority=priority) as span:
+            acquire = asyncio.get_running_loop().run_in_executor(self.executor, slot.__enter__)
+            try:
+                waited = await asyncio.shield(acquire)
+            except asyncio.CancelledError:
+                # The slot may still be granted after we stop waiting: hand it back then.
+                acquire.add_done_callback(
+                    lambda future: future.cancelled() or future.exception() or slot.__exit__(None, None, None)
+                )
+                raise
+            span.set(wait_ms=round(waited * 1000.0, 3))
+        try:
+            yield waited
+        except BaseException:
+            if not slot.__exit__(*sys.exc_info()):
+                raise
+        else:
+            slot.__exit__(None, None, None)
+
+    async def generate(
+        self,
+        context: RetrievalContext,
+        model_key: Optional[str] = None,
+        persona: Optional[str] = None,
+        task: Optional[str] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> RetrievalResult:
+        """Async ``Pipeline.generate`` built on ``ainvoke``."""
+        start = time.perf_counter()
+        chosen_model = model_key or next(iter(self.llm_registry.options().keys()), None)
+        persona = persona or self.settings.persona
+        task = task or self.settings.default_task
+        trace = Trace(context.trace_id or None)
+        with trace.span("generate", model_key=chosen_model) as span:
+            budgeted = await self._offload(self.sync._budget, context, chosen_model, persona, task, trace)
+            cached = await self._offload(
+                self.sync._cached_answer, context, chosen_model, persona, task, budgeted.context
+            )
+            queue_wait = 0.0
+            if cached is not None:
+                answer = cached.answer
+            else:
+                async with self._llm_slot(chosen_model, priority, trace) as queue_wait:
+                    with self.llm_registry.timer.call() as connection:
+                        answer = await arun_llm(
+                            model=self.llm_registry.get(chosen_model),
+                            context=budgeted.context,
+                            persona=persona,
+                            task=task,
+                            question=context.question,
+                            max_context_tokens=None,
+                            trace=trace,
+                        )
+                await self._offload(
+                    self.sync._store_answer, context, chosen_model, persona, task, budgeted.context, answer
+                )
+            span.set(cache_status=self.sync._cache_status(cached))
+        self.sync._export(trace.spans)
+
+        metrics = {
+            "retrieval_sec": context.retrieval_sec,
+            "generation_sec": time.perf_counter() - start,
+        }
+        if cached is None:
+            metrics.update(self.sync._connection_metrics(connection))
+            metrics["queue_wait_sec"] = queue_wait
+        return self.sync._result(context, answer, metrics, trace.spans, budgeted, cached, answered_by=chosen_model)
+
+    def generate_stream(
+        self,
+        context: RetrievalContext,
+        model_key: Optional[str] = None,
+        persona: Optional[str] = None,
+        task: Optional[str] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> AsyncAnswerStream:
+        """Async ``Pipeline.generate_stream`` built on ``astream``; iterate with ``async for``."""
+        chosen_model = model_key or next(iter(self.llm_registry.options().keys()), None)
+        persona = persona or self.settings.persona
+        task = task or self.settings.default_task
+        trace = Trace(context.trace_id or None)
+        budgeted: List[BudgetedContext] = []
+        cached: List[Optional[CachedAnswer]] = []
+        connections: List[CallTiming] = []
+        queue_waits: List[float] = []
+
+        async def tokens() -> AsyncIterator[str]:
+            with trace.span("generate", model_key=chosen_model, streaming=True) as span:
+                budgeted.append(await self._offload(self.sync._budget, context, chosen_model, persona, task, trace))
+                cached.append(
+                    await self._offload(
+                        self.sync._cached_answer, context, chosen_model, persona, task, budgeted[0].context
+                    )
+                )
+                span.set(cache_status=self.sync._cache_status(cached[0]))
+                if cached[0] is not None:
+                    yield cached[0].answer
+                    return
+                parts: List[str] = []
+                async with self._llm_slot(chosen_model, priority, trace) as queue_wait:
+                    queue_waits.append(queue_wait)
+                    with self.llm_registry.timer.call() as connection:
+                        connections.append(connection)
+                        async for chunk in astream_llm(
+                            model=self.llm_registry.get(chosen_model),
+                            context=budgeted[0].context,
+                            persona=persona,
+                            task=task,
+                            question=context.question,
+                            max_context_tokens=None,
+                            trace=trace,
+                        ):
+                            parts.append(chunk)
+                            yield chunk
+                await self._offload(
+                    self.sync._store_answer, context, chosen_model, persona, task, budgeted[0].context, "".join(parts)
+                )
+
+        def finish(answer: str, metrics: Dict[str, float]) -> RetrievalResult:
+            metrics["retrieval_sec"] = context.retrieval_sec
+            if connections:
+                metrics.update(self.sync._connection_metrics(connections[0]))
+                metrics["queue_wait_sec"] = queue_waits[0]
+            self.sync._export(trace.spans)
+            return self.sync._result(
+                context,
+                answer,
+                metrics,
+                trace.spans,
+                budgeted[0] if budgeted else None,
+                cached[0] if cached else None,
+                answered_by=chosen_model,
+            )
+
+        return AsyncAnswerStream(tokens(), finish)
+
+    async def run(
+        self,
+        question: str,
+        retrieval: str = "hybrid",
+        model_key: Optional[str] = None,
+        embed_model_key: Optional[str] = None,
+        persona: Optional[str] = None,
+        task: Optional[str] = None,
+    ) -> RetrievalResult:
+        """Async ``Pipeline.run``: retrieve, then answer with one LLM."""
+        context = await self.retrieve(question, retrieval=retrieval, embed_model_key=embed_model_key)
+        return await self.generate(context, model_key=model_key, persona=persona, task=task)
+
+    async def run_stream(
+        self,
+        question: str,
+        retrieval: str = "hybrid",
+        model_key: Optional[str] = None,
+        embed_model_key: Optional[str] = None,
+        persona: Optional[str] = None,
+        task: Optional[str] = None,
+    ) -> AsyncAnswerStream:
+        """Retrieve, then stream the answer (see ``generate_stream``)."""
+        context = await self.retrieve(question, retrieval=retrieval, embed_model_key=embed_model_key)
+        return self.generate_stream(context, model_key=model_key, persona=persona, task=task)
+
+    def to_dict(self, result: RetrievalResult) -> Dict[str, object]:
+        return self.sync.to_dict(result)
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from .config import EmbeddingModelConfig, get_settings
+from .embedding import EmbeddingService
+from .kg_client import KGClient, check_identifier, get_client
+
+
+# Product properties concatenated into the feature string that gets embedded.
+FEATURE_FIELDS = [
+    "name",
+    "product_category_name",
+    "category",
+    "description",
+    "price",
+    "product_weight_g",
+]
+
+
+def feature_text(props: Dict[str, Any]) -> str:
+    """Feature string for a product, e.g. "name: X | product_category_name: perfumaria | price: 49.9"."""
+    parts = [f"{field}: {props[field]}" for field in FEATURE_FIELDS if props.get(field) not in (None, "")]
+    return " | ".join(parts) or str(props.get("product_id", ""))
+
+
+class Checkpoint:
+    """JSON file remembering the last written key per embedding property, so a killed run resumes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.state: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.state = json.load(f)
+
+    def get(self, name: str) -> Dict[str, Any]:
+        return self.state.get(name, {"after": None, "written": 0})
+
+    def save(self, name: str, after: Any, written: int) -> None:
+        self.state[name] = {"after": after, "written": written}
+        self._flush()
+
+    def reset(self, name: str) -> None:
+        """Forget ``name``'s position, so the next run starts from the first key."""
+        self.state.pop(name, None)
+        self._flush()
+
+    def _flush(self) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f, default=str)
+        os.replace(tmp, self.path)
+
+
+class EmbeddingBackfill:
+    """
+    Encode Product feature strings and write the vectors back to Neo4j.
+
+    Nodes are streamed out in keyset-paginated pages (ordered by the key
+    property), encoded in large batches and written with one ``UNWIND``
+    transaction per page. Writes overlap with fetching/encoding the next page
+    on ``writers`` threads; the checkpoint only advances past pages whose
+    write committed, in key order, and is cleared once the last page is
+    written.
+    """
+
+    def __init__(
+        self,
+        client: KGClient,
+        service: EmbeddingService,
+        config: EmbeddingModelConfig,
+        label: str = "Product",
+        key_property: str = "product_id",
+        batch_size: int = 1000,
+        encode_batch_size: int = 256,
+        writers: int = 2,
+        only_missing: bool = False,
+        checkpoint: Optional[Checkpoint] = None,
+    ):
+        self.client = client
+        self.service = service
+        self.config = config
+        self.label = check_identifier(label)
+        self.key_property = check_identifier(key_property)
+        self.prop = check_identifier(config.embed_property)
+        self.batch_size = batch_size
+        self.encode_batch_size = encode_batch_size
+        self.writers = max(1, writers)
+        self.only_missing = only_missing
+        self.checkpoint = checkpoint
+        self.name = f"{config.model_id}:{self.label}.{self.prop}"
+
+    def _fetch(self, after: Any) -> List[Dict[str, Any]]:
+        fields = ", ".join(f".{field}" for field in FEATURE_FIELDS)
+        missing = f"AND p.`{self.prop}` IS NULL" if self.only_missing else ""
+        cypher = f"""
+        MATCH (p:`{self.label}`)
+        WHERE p.`{self.key_property}` IS NOT NULL
+          AND ($after IS NULL OR p.`{self.key_property}` > $after)
+          {missing}
+        RETURN p.`{self.key_property}` AS key, p{{{fields}}} AS props
+        ORDER BY p.`{self.key_property}`
+        LIMIT $batch_size
+        """
+        return self.client.run_query(cypher, {"after": after, "batch_size": self.batch_size})
+
+    def _write(self, rows: List[Dict[str, Any]]) -> int:
+        cypher = f"""
+        UNWIND $rows AS row
+        MATCH (p:`{self.label}` {{`{self.key_property}`: row.key}})
+        SET p.`{self.prop}` = row.vector,
+            p.`{self.prop}_updated_at` = timestamp()
+        """
+        with self.client.session() as session:
+            return session.execute_write(
+                lambda tx: tx.run(cypher, rows=rows).consume().counters.properties_set
+            )
+
+    def run(self) -> Dict[str, float]:
+        state = self.checkpoint.get(self.name) if self.checkpoint else {"after": None, "written": 0}
+        after, written = state["after"], state["written"]
+        if after is not None:
+            print(f"[{self.name}] resuming after key {after!r} ({written} already written)")
+        start = time.perf_counter()
+        processed = 0
+        pending: List[tuple[Future, Any, int]] = []
+
+        def drain(block: bool) -> None:
+            nonlocal written
+            while pending and (block or pending[0][0].done()):
+                future, last_key, count = pending.pop(0)
+                future.result()
+                written += count
+                if self.checkpoint:
+                    self.checkpoint.save(self.name, last_key, written)
+
+        with ThreadPoolExecutor(max_workers=self.writers, thread_name_prefix="backfill-write") as pool:
+            while True:
+                page = self._fetch(after)
+                if not page:
+                    break
+                vectors = self.service.encode_batch(
+                    [feature_text(row["props"] or {}) for row in page],
+                    batch_size=self.encode_batch_size,
+                )
+                rows = [{"key": row["key"], "vector": vector} for row, vector in zip(page, vectors)]
+                after = page[-1]["key"]
+                pending.append((pool.submit(self._write, rows), after, len(rows)))
+                processed += len(rows)
+                # Bound memory: at most two pages in flight per writer.
+                drain(block=len(pending) >= self.writers * 2)
+                elapsed = time.perf_counter() - start
+                print(f"[{self.name}] {processed} encoded, {processed / elapsed:.1f} items/sec")
+            drain(block=True)
+        if self.checkpoint:
+            # Every page is written. Product keys are hashes, so new nodes can sort
+            # below the last key; the next run must start from the beginning again.
+            self.checkpoint.reset(self.name)
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            "processed": processed,
+            "written": written,
+            "seconds": elapsed,
+            "items_per_sec": processed / elapsed if elapsed else 0.0,
+        }
+        print(f"[{self.name}] done: {processed} items in {elapsed:.1f}s ({stats['items_per_sec']:.1f} items/sec)")
+        return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backfill product embeddings into Neo4j.")
+    parser.add_argument("--model-key", default=None, help="Embedding model key (default: all configured)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Nodes per page / write transaction")
+    parser.add_argument("--encode-batch-size", type=int, default=256)
+    parser.add_argument("--writers", type=int, default=2, help="Parallel write transactions")
+    parser.add_argument("--only-missing", action="store_true", help="Skip nodes that already have a vector")
+    parser.add_argument("--checkpoint", default=".cache/backfill_checkpoint.json")
+    parser.add_argument("--restart", action="store_true", help="Ignore the saved checkpoint")
+    args = parser.parse_args()
+
+    settings = get_settings()
+    client = get_client(settings)
+    os.makedirs(os.path.dirname(args.checkpoint) or ".", exist_ok=True)
+    checkpoint = Checkpoint(args.checkpoint)
+    models = settings.get_embedding_models()
+    seen = set()
+    for key in [args.model_key] if args.model_key else list(models):
+        config = models[key]
+        # model_2 defaults to model_1's settings; don't encode the same property twice.
+        if (config.model_id, config.embed_property) in seen:
+            continue
+        seen.add((config.model_id, config.embed_property))
+        backfill = EmbeddingBackfill(
+            client,
+            EmbeddingService(settings, model_key=key),
+            config,
+            label=settings.vector_label,
+            key_property=settings.vector_key_property,
+            batch_size=args.batch_size,
+            encode_batch_size=args.encode_batch_size,
+            writers=args.writers,
+            only_missing=args.only_missing,
+            checkpoint=checkpoint,
+        )
+        if args.restart:
+            checkpoint.reset(backfill.name)
+        backfill.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from .async_pipeline import AsyncPipeline
+from .embedding import read_question_log
+from .llm_scheduler import BackendLimits, LLMScheduler
+from .pipeline import Pipeline
+from .tracing import percentile
+
+# Used when no --questions log is given; cycled to fill --requests.
+SAMPLE_QUESTIONS = [
+    "Top electronics in SP with rating > 4?",
+    "Which sellers in RJ have the best reliability?",
+    "What are the most popular categories in MG?",
+    "Are deliveries to BA late?",
+    "Recommend a perfume in perfumaria",
+    "How many sellers are in SP?",
+]
+
+
+class SleepyChatModel(BaseChatModel):
+    """Stand-in LLM with a fixed latency: ``time.sleep`` when sync, ``asyncio.sleep`` when async."""
+
+    delay: float = 0.5
+    answer: str = "Benchmark answer."
+
+    @property
+    def _llm_type(self) -> str:
+        return "sleepy-chat-model"
+
+    def _generate(self, messages: List[BaseMessage], stop: Any = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.delay)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.answer))])
+
+    async def _agenerate(
+        self, messages: List[BaseMessage], stop: Any = None, run_manager: Any = None, **kwargs: Any
+    ) -> ChatResult:
+        await asyncio.sleep(self.delay)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.answer))])
+
+
+def summarize(latencies: List[float], errors: int, wall_sec: float) -> Dict[str, float]:
+    """Throughput and latency percentiles of one run (latencies in seconds)."""
+    done = len(latencies)
+    return {
+        "requests": done + errors,
+        "errors": errors,
+        "wall_sec": round(wall_sec, 3),
+        "throughput_qps": round(done / wall_sec, 2) if wall_sec else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000.0, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000.0, 1),
+        "max_ms": round(max(latencies, default=0.0) * 1000.0, 1),
+    }
+
+
+def bench_sync(
+    pipeline: Pipeline, questions: Sequence[str], concurrency: int, retrieval: str, model_key: Optional[str], llm: bool
+) -> Dict[str, float]:
+    """``concurrency`` threads calling ``Pipeline.run`` (or ``retrieve``)."""
+
+    def one(question: str) -> float:
+        start = time.perf_counter()
+        if llm:
+            pipeline.run(question, retrieval=retrieval, model_key=model_key)
+        else:
+            pipeline.retrieve(question, retrieval=retrieval)
+        return time.perf_counter() - start
+
+    latencies: List[float] = []
+    errors = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench") as pool:
+        for future in [pool.submit(one, q) for q in questions]:
+            try:
+                latencies.append(future.result())
+            except Exception as e:
+                errors += 1
+                print(f"Warning: sync request failed: {e}")
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def bench_async(
+    pipeline: AsyncPipeline,
+    questions: Sequence[str],
+    concurrency: int,
+    retrieval: str,
+    model_key: Optional[str],
+    llm: bool,
+) -> Dict[str, float]:
+    """At most ``concurrency`` in-flight ``AsyncPipeline.run`` (or ``retrieve``) calls on one event loop."""
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(question: str) -> float:
+        async with gate:
+            start = time.perf_counter()
+            if llm:
+                await pipeline.run(question, retrieval=retrieval, model_key=model_key)
+            else:
+                await pipeline.retrieve(question, retrieval=retrieval)
+            return time.perf_counter() - start
+
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*(one(q) for q in questions), return_exceptions=True)
+    wall_sec = time.perf_counter() - start
+    latencies = [o for o in outcomes if not isinstance(o, BaseException)]
+    for outcome in outcomes:
+        if isinstance(outcome, BaseException):
+            print(f"Warning: async request failed: {outcome}")
+    return summarize(latencies, len(outcomes) - len(latencies), wall_sec)
+
+
+def format_report(results: List[Dict[str, Any]]) -> str:
+    header = f"{'mode':<6} {'conc':>5} {'req':>5} {'err':>4} {'wall s':>8} {'q/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}"
+    lines = [header, "-" * len(header)]
+    for row in results:
+        lines.append(
+            f"{row['mode']:<6} {row['concurrency']:>5} {row['requests']:>5} {row['errors']:>4} "
+            f"{row['wall_sec']:>8.2f} {row['throughput_qps']:>8.2f} {row['p50_ms']:>9.1f} "
+            f"{row['p95_ms']:>9.1f} {row['max_ms']:>9.1f}"
+        )
+    return "\n".join(lines)
+
+
+def disable_caches(pipeline: Pipeline) -> None:
+    """
+    Turn off the answer, query-result and question-embedding caches.
+
+    They are process-wide and shared by ``Pipeline`` and ``AsyncPipeline``:
+    with them on, repeated questions measure cache hits, and whichever mode
+    runs second starts warm.
+    """
+    pipeline.answer_cache = None
+    pipeline.client.query_cache = None
+    # EmbeddingService reads this when it is built, once per request.
+    pipeline.settings.embed_cache_size = 0
+
+
+async def _run_async_levels(
+    pipeline: Pipeline, questions: Sequence[str], levels: Sequence[int], args: argparse.Namespace
+) -> List[Dict[str, Any]]:
+    # The async driver belongs to the loop it is created in.
+    apipe = AsyncPipeline(pipeline)
+    try:
+        results = []
+        for level in levels:
+            stats = await bench_async(apipe, questions, level, args.retrieval, args.model, not args.retrieve_only)
+            results.append({"mode": "async", "concurrency": level, **stats})
+        return results
+    finally:
+        await apipe.aclose()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Concurrent throughput of Pipeline (threads) vs AsyncPipeline (asyncio).")
+    parser.add_argument("--questions", default=None, help="Question log (text or JSON lines); defaults to built-in samples")
+    parser.add_argument("--requests", type=int, default=60, help="Requests per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--retrieval", default="hybrid", choices=["baseline", "embeddings", "hybrid"])
+    parser.add_argument("--model", default=None, help="LLM model key (default: first registered)")
+    parser.add_argument("--retrieve-only", action="store_true", help="Skip the LLM call")
+    parser.add_argument(
+        "--fake-llm",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="Replace the LLM with a stand-in of this latency (no provider calls or provider rate limits)",
+    )
+    parser.add_argument("--mode", choices=["sync", "async", "both"], default="both")
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    pool = read_question_log(args.questions) if args.questions else SAMPLE_QUESTIONS
+    if not pool:
+        parser.error("no questions to run")
+    questions = [pool[i % len(pool)] for i in range(args.requests)]
+
+    pipeline = Pipeline()
+    disable_caches(pipeline)
+    if args.fake_llm is not None:
+        fake = SleepyChatModel(delay=args.fake_llm)
+        pipeline.llm_registry.get = lambda key: fake
+        pipeline.scheduler = LLMScheduler({}, BackendLimits(max_concurrency=max(args.concurrency)))
+
+    results: List[Dict[str, Any]] = []
+    if args.mode in ("sync", "both"):
+        for level in args.concurrency:
+            stats = bench_sync(pipeline, questions, level, args.retrieval, args.model, not args.retrieve_only)
+            results.append({"mode": "sync", "concurrency": level, **stats})
+    if args.mode in ("async", "both"):
+        results.extend(asyncio.run(_run_async_levels(pipeline, questions, args.concurrency, args)))
+
+    print(format_report(results))
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,6 +7,24 @@ if str(ROOT) not in sys.path:
     sys.path.append(str(ROOT))
 
 from app.pipeline import Pipeline  # noqa: E402
+from app.tracing import Span  # noqa: E402
+
+
+def print_spans(spans: list) -> None:
+    """Print spans as an indented tree with durations."""
+    children = {}
+    for span in spans:
+        children.setdefault(span.parent_id, []).append(span)
+    ids = {span.span_id for span in spans}
+
+    def show(span: Span, depth: int) -> None:
+        print(f"{'  ' * depth}{span.name:<24} {span.duration_ms:>9.1f} ms  {span.attributes}")
+        for child in sorted(children.get(span.span_id, []), key=lambda s: s.start_ns):
+            show(child, depth + 1)
+
+    roots = [s for s in spans if s.parent_id is None or s.parent_id not in ids]
+    for span in sorted(roots, key=lambda s: s.start_ns):
+        show(span, 0)
 
 
 def main() -> None:
@@ -14,16 +32,69 @@ def main() -> None:
     parser.add_argument("question", help="User question to answer")
     parser.add_argument("--retrieval", choices=["baseline", "embeddings", "hybrid"], default="hybrid")
     parser.add_argument("--model", dest="model", default=None)
+    parser.add_argument(
+        "--compare-retrieval",
+        action="append",
+        choices=["baseline", "embeddings", "hybrid"],
+        default=[],
+        help="Additional retrieval strategy to compare (repeatable).",
+    )
+    parser.add_argument(
+        "--compare-model",
+        action="append",
+        default=[],
+        help="Additional LLM to answer the same retrieval with (repeatable).",
+    )
+    parser.add_argument("--stream", action="store_true", help="Print the answer as it is generated.")
+    parser.add_argument("--trace", action="store_true", help="Print per-stage spans after the answer.")
     args = parser.parse_args()
 
     pipe = Pipeline()
-    result = pipe.run(question=args.question, retrieval=args.retrieval, model_key=args.model)
-    print("Intent:", result.intent)
-    print("Entities:", result.entities.to_params())
-    print("Cypher:", result.cypher)
-    print("Baseline rows:", result.baseline_rows)
-    print("Embedding rows:", result.embed_rows)
-    print("Answer:", result.answer)
+    if args.stream and not args.compare_retrieval and not args.compare_model:
+        context = pipe.retrieve(question=args.question, retrieval=args.retrieval)
+        print("Intent:", context.intent)
+        print("Entities:", context.entities.to_params())
+        print("Cypher:", context.cypher)
+        print("Baseline rows:", context.baseline_rows)
+        print("Embedding rows:", context.embed_rows)
+        print("Answer: ", end="", flush=True)
+        answer_stream = pipe.generate_stream(context, model_key=args.model)
+        for token in answer_stream:
+            print(token, end="", flush=True)
+        print()
+        ttft = answer_stream.result.metrics.get("time_to_first_token_sec")
+        if ttft is not None:
+            print(f"Time to first token: {ttft:.3f}s")
+        if args.trace:
+            print_spans(answer_stream.result.spans)
+        return
+    if not args.compare_retrieval and not args.compare_model:
+        result = pipe.run(question=args.question, retrieval=args.retrieval, model_key=args.model)
+        print("Intent:", result.intent)
+        print("Entities:", result.entities.to_params())
+        print("Cypher:", result.cypher)
+        print("Baseline rows:", result.baseline_rows)
+        print("Embedding rows:", result.embed_rows)
+        print("Answer:", result.answer)
+        if args.trace:
+            print_spans(result.spans)
+        return
+
+    model = args.model or next(iter(pipe.llm_registry.options().keys()), None)
+    models = list(dict.fromkeys([model] + args.compare_model))
+    for retrieval in dict.fromkeys([args.retrieval] + args.compare_retrieval):
+        context = pipe.retrieve(question=args.question, retrieval=retrieval)
+        print(f"=== retrieval={retrieval} ===")
+        print("Intent:", context.intent)
+        print("Entities:", context.entities.to_params())
+        print("Cypher:", context.cypher)
+        print("Baseline rows:", context.baseline_rows)
+        print("Embedding rows:", context.embed_rows)
+        for key, outcome in pipe.generate_many(context, models).items():
+            if isinstance(outcome, Exception):
+                print(f"[{key}] Error:", outcome)
+            else:
+                print(f"[{key}] Answer:", outcome.answer)
 
 
 if __name__ == "__main__":
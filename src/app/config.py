@@ -23,6 +23,13 @@ class Settings:
     neo4j_user: str = os.getenv("NEO4J_USER", "neo4j")
     neo4j_password: str = os.getenv("NEO4J_PASSWORD", "19456hiPA.")
     neo4j_database: str = os.getenv("NEO4J_DATABASE", "neo4j")
+
+    # Shared driver / connection pool
+    neo4j_max_pool_size: int = int(os.getenv("NEO4J_MAX_POOL_SIZE", "50"))
+    neo4j_fetch_size: int = int(os.getenv("NEO4J_FETCH_SIZE", "1000"))
+    neo4j_max_connection_lifetime: float = float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", "3600"))
+    neo4j_acquisition_timeout: float = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "60"))
+    neo4j_warm_up: bool = os.getenv("NEO4J_WARM_UP", "true").lower() in ("1", "true", "yes")
     
     # Primary embedding model (legacy support)
     vector_index: str = os.getenv("VECTOR_INDEX", "product_feature_index")
@@ -34,6 +41,89 @@ class Settings:
     vector_index_2: Optional[str] = os.getenv("VECTOR_INDEX_2", None) or os.getenv("VECTOR_INDEX", "product_feature_index")
     embed_property_2: Optional[str] = os.getenv("EMBED_PROPERTY_2", None) or os.getenv("EMBED_PROPERTY", "embedding")
     
+    # Vector search backend: "neo4j" (db.index.vector.queryNodes) or "local" (in-process index)
+    vector_backend: str = os.getenv("VECTOR_BACKEND", "neo4j")
+    vector_label: str = os.getenv("VECTOR_LABEL", "Product")
+    vector_key_property: str = os.getenv("VECTOR_KEY_PROPERTY", "product_id")
+    local_index_dir: str = os.getenv("LOCAL_INDEX_DIR", ".cache/vector_index")
+    local_index_dtype: str = os.getenv("LOCAL_INDEX_DTYPE", "float32")
+    local_index_mode: str = os.getenv("LOCAL_INDEX_MODE", "exact")
+    local_index_nlist: int = int(os.getenv("LOCAL_INDEX_NLIST", "0"))
+    local_index_nprobe: int = int(os.getenv("LOCAL_INDEX_NPROBE", "8"))
+
+    # Query-embedding cache (set size to 0 to disable; path enables the SQLite tier)
+    embed_cache_size: int = int(os.getenv("EMBED_CACHE_SIZE", "2048"))
+    embed_cache_path: Optional[str] = os.getenv("EMBED_CACHE_PATH") or None
+
+    # Embedding micro-batching (concurrent encode requests share one forward pass)
+    embed_batching: bool = os.getenv("EMBED_BATCHING", "true").lower() in ("1", "true", "yes")
+    embed_batch_max_delay_ms: float = float(os.getenv("EMBED_BATCH_MAX_DELAY_MS", "5"))
+    embed_batch_max_size: int = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
+    embed_torch_threads: int = int(os.getenv("EMBED_TORCH_THREADS", "0"))
+
+    # Cypher result cache (memory LRU + optional SQLite tier)
+    query_cache_enabled: bool = os.getenv("QUERY_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    query_cache_size: int = int(os.getenv("QUERY_CACHE_SIZE", "512"))
+    query_cache_ttl: float = float(os.getenv("QUERY_CACHE_TTL", "600"))
+    query_cache_path: Optional[str] = os.getenv("QUERY_CACHE_PATH") or None
+    query_cache_version_check: float = float(os.getenv("QUERY_CACHE_VERSION_CHECK", "30"))
+
+    # Template variants for graphs normalized by app.migrations: "auto" (read :GraphMeta), "true", "false"
+    canonical_fields: str = os.getenv("CANONICAL_FIELDS", "auto")
+    # Read SellerStats/CategoryStats rollups built by app.rollups: "auto", "true", "false"
+    rollup_templates: str = os.getenv("ROLLUP_TEMPLATES", "auto")
+
+    # Concurrent retrieval (baseline Cypher || embed + vector search)
+    retrieval_workers: int = int(os.getenv("RETRIEVAL_WORKERS", "8"))
+    baseline_timeout: float = float(os.getenv("BASELINE_TIMEOUT", "30"))
+    vector_timeout: float = float(os.getenv("VECTOR_TIMEOUT", "30"))
+    # Concurrent LLM calls when comparing models on one retrieval
+    llm_workers: int = int(os.getenv("LLM_WORKERS", "4"))
+
+    # LLM answer cache: exact (model, persona/task, context, question) tier + semantic tier
+    answer_cache_enabled: bool = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    answer_cache_size: int = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+    answer_cache_ttl: float = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+    answer_cache_path: Optional[str] = os.getenv("ANSWER_CACHE_PATH") or None
+    answer_cache_semantic: bool = os.getenv("ANSWER_CACHE_SEMANTIC", "true").lower() in ("1", "true", "yes")
+    answer_cache_threshold: float = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+
+    # Prompt context serialization: "compact" (tables, deduplicated) or "repr" (raw row dicts)
+    context_format: str = os.getenv("CONTEXT_FORMAT", "compact")
+    context_float_digits: int = int(os.getenv("CONTEXT_FLOAT_DIGITS", "2"))
+
+    # Per-stage spans: appended to this file when set, as "jsonl" (one span per line) or "otlp"
+    trace_export_path: Optional[str] = os.getenv("TRACE_EXPORT_PATH") or None
+    trace_export_format: str = os.getenv("TRACE_EXPORT_FORMAT", "jsonl")
+
+    # LLM admission control per backend: concurrent calls, requests/minute (0 = unlimited),
+    # and the longest queue wait (seconds) an interactive request accepts before being rejected
+    openai_max_concurrency: int = int(os.getenv("OPENAI_MAX_CONCURRENCY", "16"))
+    openai_rpm: float = float(os.getenv("OPENAI_RPM", "0"))
+    ollama_max_concurrency: int = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "2"))
+    ollama_rpm: float = float(os.getenv("OLLAMA_RPM", "0"))
+    huggingface_max_concurrency: int = int(os.getenv("HUGGINGFACE_MAX_CONCURRENCY", "4"))
+    huggingface_rpm: float = float(os.getenv("HUGGINGFACE_RPM", "0"))
+    llm_queue_deadline: float = float(os.getenv("LLM_QUEUE_DEADLINE", "30"))
+
+    # Hedged LLM calls: model key started when the selected model has no first token after the
+    # given percentile of its recent first-token latency (empty disables hedging)
+    llm_hedge_model: str = os.getenv("LLM_HEDGE_MODEL", "")
+    llm_hedge_percentile: float = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+    llm_hedge_delay: float = float(os.getenv("LLM_HEDGE_DELAY", "2.0"))
+    llm_hedge_min_samples: int = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+    # LLM HTTP clients: keep-alive pool size per backend, idle expiry (seconds), startup warm-up
+    openai_pool_size: int = int(os.getenv("OPENAI_POOL_SIZE", "20"))
+    ollama_pool_size: int = int(os.getenv("OLLAMA_POOL_SIZE", "4"))
+    llm_keepalive_expiry: float = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "120"))
+    llm_warm_up: bool = os.getenv("LLM_WARM_UP", "false").lower() in ("1", "true", "yes")
+
+    # HTTP API (app.server): bind address and connection worker threads
+    server_host: str = os.getenv("SERVER_HOST", "127.0.0.1")
+    server_port: int = int(os.getenv("SERVER_PORT", "8080"))
+    server_workers: int = int(os.getenv("SERVER_WORKERS", "16"))
+
     openai_api_key: Optional[str] = os.getenv("OPENAI_API_KEY")
     huggingface_token: Optional[str] = os.getenv("HUGGINGFACEHUB_API_TOKEN")
     ollama_model: Optional[str] = os.getenv("OLLAMA_MODEL")
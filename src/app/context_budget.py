@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import math
+import re
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .context_format import format_value, legacy_context, prepare_rows, render_tables
+
+_WORD = re.compile(r"\w+|[^\w\s]")
+
+# Tokens kept free on top of the estimate when no exact tokenizer is available.
+ESTIMATE_MARGIN = 0.10
+
+# Token counts are memoized for strings up to this many characters: table rows
+# and prompt headers repeat across questions, whole contexts rarely do. The
+# bound keeps the caches from pinning large prompts in a long-running process
+# (at most maxsize x CACHE_MAX_CHARS characters per cache).
+CACHE_MAX_CHARS = 2048
+
+
+def _memoize_short(maxsize: int) -> Callable[[Callable[[str], int]], Callable[[str], int]]:
+    """``lru_cache`` for strings of at most ``CACHE_MAX_CHARS``; longer ones are counted every time."""
+
+    def decorate(count: Callable[[str], int]) -> Callable[[str], int]:
+        cached = lru_cache(maxsize=maxsize)(count)
+
+        def lookup(text: str) -> int:
+            return cached(text) if len(text) <= CACHE_MAX_CHARS else count(text)
+
+        lookup.cache_info = cached.cache_info  # type: ignore[attr-defined]
+        return lookup
+
+    return decorate
+
+
+@_memoize_short(maxsize=8192)
+def estimate_tokens(text: str) -> int:
+    """
+    Fast tokenizer-free count.
+
+    Alphabetic words cost one token per 4 characters, words with digits (ids,
+    numbers, dates) one per 2, and each punctuation mark one. It errs high on
+    prose, which keeps the budget on the safe side.
+    """
+    total = 0
+    for word in _WORD.findall(text):
+        if word.isalpha():
+            total += math.ceil(len(word) / 4)
+        elif word[0].isalnum() or word[0] == "_":
+            total += math.ceil(len(word) / 2)
+        else:
+            total += 1
+    return total
+
+
+class TokenCounter:
+    """
+    Counts tokens with a model's tokenizer, loaded on first use.
+
+    ``tokenizer`` is ``"tiktoken:<encoding>"`` (OpenAI models) or
+    ``"hf:<repo id>"`` (Hugging Face tokenizer). When it is unset or fails to
+    load, counts fall back to ``estimate_tokens`` and ``exact`` is False.
+    """
+
+    def __init__(self, tokenizer: Optional[str] = None):
+        self.tokenizer = tokenizer
+        self._encode: Optional[Callable[[str], List[int]]] = None
+        self._loaded = tokenizer is None
+        self._lock = threading.Lock()
+        self.count = _memoize_short(maxsize=4096)(self._count)
+
+    @property
+    def exact(self) -> bool:
+        self._load()
+        return self._encode is not None
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            kind, _, name = self.tokenizer.partition(":")
+            try:
+                if kind == "tiktoken":
+                    import tiktoken
+
+                    self._encode = tiktoken.get_encoding(name).encode
+                elif kind == "hf":
+                    from transformers import AutoTokenizer
+
+                    hf_tokenizer = AutoTokenizer.from_pretrained(name)
+                    self._encode = lambda text: hf_tokenizer.encode(text, add_special_tokens=False)
+                else:
+                    raise ValueError(f"unknown tokenizer kind '{kind}'")
+            except Exception as e:
+                print(f"Warning: tokenizer '{self.tokenizer}' unavailable, estimating tokens: {e}")
+            self._loaded = True
+
+    def _count(self, text: str) -> int:
+        self._load()
+        if self._encode is None:
+            return estimate_tokens(text)
+        return len(self._encode(text))
+
+
+@lru_cache(maxsize=32)
+def get_counter(tokenizer: Optional[str]) -> TokenCounter:
+    """One shared counter (and loaded tokenizer) per tokenizer spec."""
+    return TokenCounter(tokenizer)
+
+
+@dataclass
+class BudgetedContext:
+    context: str
+    tokens: int
+    budget: int
+    dropped_baseline: int = 0
+    dropped_embed: int = 0
+    exact: bool = False
+
+
+def _priority(n_baseline: int, n_hits: int) -> List[Tuple[int, int]]:
+    """
+    (source, index) pairs, most relevant first.
+
+    Both sources are already ranked (templates ``ORDER BY``, hits by score),
+    so they are interleaved to keep the top rows of each.
+    """
+    order = []
+    for i in range(max(n_baseline, n_hits)):
+        if i < n_baseline:
+            order.append((0, i))
+        if i < n_hits:
+            order.append((1, i))
+    return order
+
+
+def fit_context(
+    baseline_rows: List[Dict[str, Any]],
+    embed_rows: List[Dict[str, Any]],
+    counter: TokenCounter,
+    max_context_tokens: int,
+    prompt_overhead: str = "",
+    answer_tokens: int = 512,
+    fmt: str = "compact",
+    float_digits: int = 2,
+) -> BudgetedContext:
+    """
+    Keep as many whole rows as fit in the model's context window.
+
+    Args:
+        baseline_rows: Rows from the Cypher template, in template order.
+        embed_rows: Vector search hits, best first.
+        counter: Token counter for the model.
+        max_context_tokens: The model's context window.
+        prompt_overhead: The prompt without context (persona, task, question).
+        answer_tokens: Tokens reserved for the answer.
+        fmt: "compact" or "repr", as in ``build_context``.
+        float_digits: Decimal places kept for floats in compact tables.
+
+    Returns:
+        BudgetedContext with the rendered context, its token count, the
+        budget it had and how many rows of each source were dropped.
+    """
+    if fmt == "repr":
+        baseline, hits, duplicates = list(baseline_rows), list(embed_rows), 0
+    else:
+        baseline, hits, duplicates = prepare_rows(baseline_rows, embed_rows)
+
+    def render(keep_baseline: List[Dict[str, Any]], keep_hits: List[Dict[str, Any]]) -> str:
+        if fmt == "repr":
+            return legacy_context(keep_baseline, keep_hits)
+        dropped = (len(baseline) - len(keep_baseline), len(hits) - len(keep_hits))
+        return render_tables(keep_baseline, keep_hits, duplicates, dropped, float_digits)
+
+    full = render(baseline, hits)
+    # A token covers at least one byte, so a prompt whose byte length fits
+    # can't overflow: skip tokenizing entirely.
+    if len(full.encode("utf-8")) + len(prompt_overhead.encode("utf-8")) + answer_tokens <= max_context_tokens:
+        return BudgetedContext(full, estimate_tokens(full), max_context_tokens - answer_tokens)
+
+    budget = max_context_tokens - answer_tokens - counter.count(prompt_overhead)
+    if not counter.exact:
+        budget = int(budget * (1 - ESTIMATE_MARGIN))
+    tokens = counter.count(full)
+    if tokens <= budget:
+        return BudgetedContext(full, tokens, budget, exact=counter.exact)
+
+    # Greedy by priority on per-row line costs, then verify the rendered text.
+    sources = (baseline, hits)
+    used = counter.count(render([], []))
+    chosen: List[Tuple[int, int]] = []
+    for source, index in _priority(len(baseline), len(hits)):
+        row = sources[source][index]
+        line = repr(row) if fmt == "repr" else " | ".join(format_value(v, float_digits) for v in row.values())
+        cost = counter.count(line) + 1
+        if used + cost > budget:
+            continue
+        used += cost
+        chosen.append((source, index))
+
+    while True:
+        kept = set(chosen)
+        keep_baseline = [row for i, row in enumerate(baseline) if (0, i) in kept]
+        keep_hits = [row for i, row in enumerate(hits) if (1, i) in kept]
+        context = render(keep_baseline, keep_hits)
+        tokens = counter.count(context)
+        if tokens <= budget or not chosen:
+            break
+        chosen.pop()
+    return BudgetedContext(
+        context,
+        tokens,
+        budget,
+        dropped_baseline=len(baseline) - len(keep_baseline),
+        dropped_embed=len(hits) - len(keep_hits),
+        exact=counter.exact,
+    )
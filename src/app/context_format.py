@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# Row keys that identify a product in baseline rows and embedding hits.
+PRODUCT_KEYS = ("product_id", "id")
+
+NO_RESULTS = "No results found in graph."
+
+
+def approx_tokens(text: str) -> int:
+    """Rough token count (1 token ≈ 4 characters), the same estimate ``truncate_context`` uses."""
+    return (len(text) + 3) // 4
+
+
+def flatten_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Lift nested maps into the top level.
+
+    Embedding hits come back as ``{"item": {...node properties}, "score": s}``;
+    the node properties become columns next to ``score``. A nested key that
+    clashes with an outer one keeps its ``parent.key`` name.
+    """
+    flat: Dict[str, Any] = {}
+    for key, value in row.items():
+        if isinstance(value, dict):
+            for inner, inner_value in flatten_row(value).items():
+                name = inner if inner not in row and inner not in flat else f"{key}.{inner}"
+                flat[name] = inner_value
+        else:
+            flat[key] = value
+    return flat
+
+
+def format_value(value: Any, float_digits: int = 2) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float):
+        if value != value:  # NaN
+            return ""
+        text = f"{value:.{float_digits}f}"
+        return text.rstrip("0").rstrip(".") if "." in text else text
+    if isinstance(value, (list, tuple)):
+        return ",".join(format_value(v, float_digits) for v in value)
+    if isinstance(value, dict):
+        return json.dumps(value, default=str, separators=(",", ":"))
+    # Keep one row per line and the column separator unambiguous.
+    return " ".join(str(value).split()).replace("|", "/")
+
+
+def product_key(row: Dict[str, Any]) -> Optional[str]:
+    for key in PRODUCT_KEYS:
+        if row.get(key) is not None:
+            return str(row[key])
+    return None
+
+
+def format_table(title: str, rows: List[Dict[str, Any]], float_digits: int = 2, note: str = "") -> str:
+    """
+    Render rows as ``title (n rows):`` then a ``a | b`` header and one line per row.
+
+    Columns that are null on every row are dropped; null cells are left empty.
+    """
+    columns: List[str] = []
+    for row in rows:
+        for key, value in row.items():
+            if key not in columns and value is not None:
+                columns.append(key)
+    heading = f"{title} ({len(rows)} rows{note}):"
+    if not columns:
+        return heading
+    lines = [heading, " | ".join(columns)]
+    for row in rows:
+        lines.append(" | ".join(format_value(row.get(column), float_digits) for column in columns))
+    return "\n".join(lines)
+
+
+def dedupe_hits(
+    baseline_rows: Iterable[Dict[str, Any]], embed_rows: List[Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Embedding hits whose product is not already a baseline row, and how many were dropped."""
+    seen: Set[str] = {key for key in (product_key(row) for row in baseline_rows) if key is not None}
+    kept = []
+    for row in embed_rows:
+        key = product_key(row)
+        if key is not None and key in seen:
+            continue
+        if key is not None:
+            seen.add(key)
+        kept.append(row)
+    return kept, len(embed_rows) - len(kept)
+
+
+def legacy_context(baseline_rows: List[Dict[str, Any]], embed_rows: List[Dict[str, Any]]) -> str:
+    """The previous ``repr``-of-rows serialization, kept for ``CONTEXT_FORMAT=repr`` and comparisons."""
+    parts = []
+    if baseline_rows:
+        parts.append(f"Baseline rows: {baseline_rows}")
+    if embed_rows:
+        parts.append(f"Embedding hits: {embed_rows}")
+    return "\n".join(parts) or NO_RESULTS
+
+
+def prepare_rows(
+    baseline_rows: List[Dict[str, Any]], embed_rows: List[Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]:
+    """Flattened baseline rows, flattened and deduplicated embedding hits, and the number of duplicates."""
+    baseline = [flatten_row(row) for row in baseline_rows]
+    hits, duplicates = dedupe_hits(baseline, [flatten_row(row) for row in embed_rows])
+    return baseline, hits, duplicates
+
+
+def render_tables(
+    baseline: List[Dict[str, Any]],
+    hits: List[Dict[str, Any]],
+    duplicates: int = 0,
+    dropped: Tuple[int, int] = (0, 0),
+    float_digits: int = 2,
+) -> str:
+    """
+    Render prepared rows (see ``prepare_rows``) as the prompt context.
+
+    ``dropped`` is the number of (baseline, embedding) rows left out to fit a
+    token budget; each table heading mentions what it omits.
+    """
+    parts = []
+    if baseline or dropped[0]:
+        note = f", {dropped[0]} more dropped to fit the context" if dropped[0] else ""
+        parts.append(format_table("Baseline rows", baseline, float_digits, note))
+    if hits or duplicates or dropped[1]:
+        note = f", {duplicates} already in baseline rows omitted" if duplicates else ""
+        if dropped[1]:
+            note += f", {dropped[1]} more dropped to fit the context"
+        parts.append(format_table("Embedding hits", hits, float_digits, note))
+    return "\n\n".join(parts) or NO_RESULTS
+
+
+def compact_context(
+    baseline_rows: List[Dict[str, Any]],
+    embed_rows: List[Dict[str, Any]],
+    float_digits: int = 2,
+) -> str:
+    """
+    Baseline rows and embedding hits as compact tables.
+
+    Embedding hits for products already present in the baseline rows are left
+    out (the table heading says how many).
+    """
+    baseline, hits, duplicates = prepare_rows(baseline_rows, embed_rows)
+    return render_tables(baseline, hits, duplicates, float_digits=float_digits)
+
+
+def build_context(
+    baseline_rows: List[Dict[str, Any]],
+    embed_rows: List[Dict[str, Any]],
+    fmt: str = "compact",
+    float_digits: int = 2,
+) -> Tuple[str, Dict[str, int]]:
+    """
+    Serialize retrieved rows for the prompt.
+
+    Args:
+        baseline_rows: Rows from the Cypher template.
+        embed_rows: Vector search hits.
+        fmt: "compact" (tables) or "repr" (the previous ``str(rows)`` format).
+        float_digits: Decimal places kept for floats in compact tables.
+
+    Returns:
+        ``(context, stats)`` where stats has ``context_tokens`` and
+        ``context_tokens_saved`` (vs. the ``repr`` format; 0 for ``repr``).
+    """
+    legacy = legacy_context(baseline_rows, embed_rows)
+    if fmt == "repr":
+        return legacy, {"context_tokens": approx_tokens(legacy), "context_tokens_saved": 0}
+    context = compact_context(baseline_rows, embed_rows, float_digits)
+    tokens = approx_tokens(context)
+    return context, {
+        "context_tokens": tokens,
+        "context_tokens_saved": max(0, approx_tokens(legacy) - tokens),
+    }
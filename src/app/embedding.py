@@ -1,12 +1,23 @@
 from __future__ import annotations
 
+import argparse
+import asyncio
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future
 from functools import lru_cache
-from typing import Iterable, List, Dict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from sentence_transformers import SentenceTransformer
 
-from .config import Settings, EmbeddingModelConfig
-from .kg_client import KGClient
+from .cache import LRUCache, SQLiteStore, TieredCache
+from .config import Settings, EmbeddingModelConfig, get_settings
+from .kg_client import AsyncKGClient, KGClient
+from .tracing import percentile
+from .vector_index import get_local_index
 
 
 @lru_cache(maxsize=4)
@@ -15,6 +26,136 @@ def _load_model(name: str) -> SentenceTransformer:
     return SentenceTransformer(name)
 
 
+_query_caches: Dict[str, TieredCache] = {}
+_query_caches_lock = threading.Lock()
+
+
+def normalize_question(text: str) -> str:
+    """Cache key form of a question: trimmed, with runs of whitespace collapsed."""
+    return " ".join(text.split())
+
+
+def _get_query_cache(settings: Settings, model_id: str) -> Optional[TieredCache]:
+    """Process-wide question -> vector cache, one per embedding model id."""
+    if settings.embed_cache_size <= 0:
+        return None
+    with _query_caches_lock:
+        cache = _query_caches.get(model_id)
+        if cache is None:
+            disk = (
+                SQLiteStore(settings.embed_cache_path, table="query_embeddings")
+                if settings.embed_cache_path
+                else None
+            )
+            cache = TieredCache(LRUCache(maxsize=settings.embed_cache_size), disk)
+            _query_caches[model_id] = cache
+        return cache
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batcher that coalesces concurrent encode requests into one forward pass.
+
+    A worker thread takes the first queued text, then keeps collecting until
+    ``max_delay_ms`` has passed or ``max_batch_size`` texts are queued, encodes
+    them with a single ``model.encode`` call and resolves each caller's future.
+    """
+
+    def __init__(self, model: Any, max_delay_ms: float = 5.0, max_batch_size: int = 32):
+        self.model = model
+        self.max_delay = max_delay_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self._queue: "queue.Queue[Tuple[str, Future, float]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._encode_time = 0.0
+        self._latencies: deque = deque(maxlen=2048)
+        self._batch_sizes: deque = deque(maxlen=2048)
+        self._worker = threading.Thread(target=self._loop, name="embed-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        future: Future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def embed(self, texts: Iterable[str]) -> List[List[float]]:
+        futures = [self.submit(text) for text in texts]
+        return [future.result() for future in futures]
+
+    def _collect(self) -> List[Tuple[str, Future, float]]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect()
+            texts = [text for text, _, _ in batch]
+            start = time.perf_counter()
+            try:
+                vectors = self.model.encode(texts, convert_to_numpy=True)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            done = time.perf_counter()
+            with self._lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._encode_time += done - start
+                self._batch_sizes.append(len(batch))
+                self._latencies.extend(done - queued for _, _, queued in batch)
+            for (_, future, _), vector in zip(batch, vectors):
+                future.set_result(vector.tolist())
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            latencies = [v * 1000.0 for v in self._latencies]
+            return {
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": (sum(self._batch_sizes) / len(self._batch_sizes)) if self._batch_sizes else 0.0,
+                "items_per_sec": (self._items / self._encode_time) if self._encode_time else 0.0,
+                "latency_p50_ms": percentile(latencies, 50),
+                "latency_p95_ms": percentile(latencies, 95),
+                "queue_depth": self._queue.qsize(),
+            }
+
+
+_batchers: Dict[str, EmbeddingBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def _get_batcher(settings: Settings, model_id: str, model: Any) -> Optional[EmbeddingBatcher]:
+    """Process-wide micro-batcher per embedding model id (None when batching is off)."""
+    if not settings.embed_batching:
+        return None
+    with _batchers_lock:
+        batcher = _batchers.get(model_id)
+        if batcher is None:
+            if settings.embed_torch_threads > 0:
+                import torch
+
+                torch.set_num_threads(settings.embed_torch_threads)
+            batcher = EmbeddingBatcher(
+                model,
+                max_delay_ms=settings.embed_batch_max_delay_ms,
+                max_batch_size=settings.embed_batch_max_size,
+            )
+            _batchers[model_id] = batcher
+        return batcher
+
+
 class EmbeddingService:
     def __init__(self, settings: Settings, model_key: str = "model_1"):
         self.settings = settings
@@ -27,25 +168,169 @@ class EmbeddingService:
         
         self.model_config = models[model_key]
         self.model = _load_model(self.model_config.model_id)
+        self.query_cache = _get_query_cache(settings, self.model_config.model_id)
+        self.batcher = _get_batcher(settings, self.model_config.model_id, self.model)
 
     def embed(self, texts: Iterable[str]) -> List[List[float]]:
-        """Embed texts using the selected model."""
-        vectors = self.model.encode(list(texts), convert_to_numpy=True)
+        """
+        Embed texts using the selected model.
+
+        Small requests go through the shared micro-batcher so concurrent callers
+        share one forward pass; lists that already fill a batch are encoded directly.
+        """
+        texts = list(texts)
+        if self.batcher is not None and len(texts) < self.batcher.max_batch_size:
+            return self.batcher.embed(texts)
+        vectors = self.model.encode(texts, convert_to_numpy=True)
+        return [vec.tolist() for vec in vectors]
+
+    def _cache_key(self, text: str) -> str:
+        # Model id is part of the key because the SQLite tier is shared by all models.
+        return f"{self.model_config.model_id}\x1f{normalize_question(text)}"
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a single question, served from the query cache when possible."""
+        if self.query_cache is None:
+            return self.embed([query])[0]
+        key = self._cache_key(query)
+        vector = self.query_cache.get(key)
+        if vector is None:
+            vector = self.embed([normalize_question(query)])[0]
+            self.query_cache.set(key, vector)
+        return vector
+
+    def warm_cache(self, questions: Iterable[str], batch_size: int = 64) -> int:
+        """
+        Pre-compute vectors for questions not yet cached.
+
+        Returns:
+            Number of questions that were encoded.
+        """
+        if self.query_cache is None:
+            return 0
+        pending = list(
+            dict.fromkeys(
+                normalize_question(q)
+                for q in questions
+                if q.strip() and self._cache_key(q) not in self.query_cache
+            )
+        )
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            for text, vector in zip(batch, self.embed(batch)):
+                self.query_cache.set(self._cache_key(text), vector)
+        return len(pending)
+
+    def cache_stats(self) -> Dict[str, float]:
+        return self.query_cache.stats.as_dict() if self.query_cache is not None else {}
+
+    def embed_queries(self, queries: Iterable[str]) -> List[List[float]]:
+        """
+        Embed many questions with a single ``encode`` call for the cache misses.
+
+        Returns one vector per input, in order.
+        """
+        queries = list(queries)
+        if self.query_cache is None:
+            pending = list(dict.fromkeys(normalize_question(q) for q in queries))
+            encoded = dict(zip(pending, self.encode_batch(pending))) if pending else {}
+            return [encoded[normalize_question(q)] for q in queries]
+        vectors: Dict[str, List[float]] = {}
+        pending: Dict[str, None] = {}
+        for q in queries:
+            text = normalize_question(q)
+            if text in vectors or text in pending:
+                continue
+            vector = self.query_cache.get(self._cache_key(text))
+            if vector is None:
+                pending[text] = None
+            else:
+                vectors[text] = vector
+        if pending:
+            for text, vector in zip(pending, self.encode_batch(list(pending))):
+                vectors[text] = vector
+                self.query_cache.set(self._cache_key(text), vector)
+        return [vectors[normalize_question(q)] for q in queries]
+
+    def encode_batch(self, texts: List[str], batch_size: int = 32) -> List[List[float]]:
+        """Encode a list that is already a batch, bypassing the micro-batcher and cache."""
+        vectors = self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
         return [vec.tolist() for vec in vectors]
 
+    def search_vector(self, client: KGClient, vector: List[float], top_k: int = 10) -> List[dict]:
+        """
+        Top-k nodes for an already computed query vector.
+
+        Uses the Neo4j vector index, or the in-process index when
+        ``settings.vector_backend == "local"``; both return ``{item, score}`` rows.
+        """
+        if self.settings.vector_backend == "local":
+            return get_local_index(self.settings, self.model_config).search(vector, top_k=top_k)
+        return client.vector_query(
+            vector=vector,
+            top_k=top_k,
+            index_name=self.model_config.vector_index,
+            embed_property=self.model_config.embed_property,
+        )
+
+    async def asearch_vector(
+        self, client: AsyncKGClient, vector: List[float], top_k: int = 10, executor: Optional[Executor] = None
+    ) -> List[dict]:
+        """Async ``search_vector``: awaits the Neo4j index, or runs the in-process index on ``executor``."""
+        if self.settings.vector_backend == "local":
+            index = get_local_index(self.settings, self.model_config)
+            return await asyncio.get_running_loop().run_in_executor(executor, index.search, vector, top_k)
+        return await client.vector_query(
+            vector=vector,
+            top_k=top_k,
+            index_name=self.model_config.vector_index,
+            embed_property=self.model_config.embed_property,
+        )
+
     def semantic_search(
         self, client: KGClient, query: str, top_k: int = 10
     ) -> List[dict]:
         """Perform semantic search using vector queries."""
         try:
-            vector = self.embed([query])[0]
-            return client.vector_query(
-                vector=vector,
-                top_k=top_k,
-                index_name=self.model_config.vector_index,
-                embed_property=self.model_config.embed_property,
-            )
+            return self.search_vector(client, self.embed_query(query), top_k=top_k)
         except Exception as e:
             # Return empty list if vector search fails
             print(f"Warning: Vector search failed for query '{query}': {e}")
             return []
+
+
+def read_question_log(path: str) -> List[str]:
+    """Read questions from a log: plain text (one per line) or JSON lines with a "question" field."""
+    questions: List[str] = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                try:
+                    line = str(json.loads(line).get("question") or "")
+                except json.JSONDecodeError:
+                    pass
+            if line:
+                questions.append(line)
+    return questions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pre-warm the query-embedding cache from a question log.")
+    parser.add_argument("log", help="Question log (one question per line, or JSON lines with 'question')")
+    parser.add_argument("--model-key", default=None, help="Embedding model key (default: all configured)")
+    args = parser.parse_args()
+
+    settings = get_settings()
+    keys = [args.model_key] if args.model_key else list(settings.get_embedding_models())
+    questions = read_question_log(args.log)
+    for key in keys:
+        service = EmbeddingService(settings, model_key=key)
+        encoded = service.warm_cache(questions)
+        print(f"{key}: encoded {encoded} of {len(questions)} questions")
+
+
+if __name__ == "__main__":
+    main()
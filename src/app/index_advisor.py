@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import argparse
+import json
+import re
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .config import get_settings
+from .entities import EntityResult
+from .kg_client import KGClient, check_identifier, get_client
+from .queries import CANONICAL_QUERY_LIBRARY, QUERY_LIBRARY, ROLLUP_QUERY_LIBRARY, specialize_template
+
+
+# Node keys that get a uniqueness constraint (which also backs a range index).
+KEY_CONSTRAINTS: List[Tuple[str, str]] = [
+    ("Product", "product_id"),
+    ("Order", "id"),
+    ("Customer", "id"),
+    ("State", "code"),
+]
+
+# Substring operators need a TEXT index; everything else is served by RANGE.
+TEXT_OPERATORS = {"CONTAINS", "ENDS WITH"}
+
+# Values used to plan templates with every optional filter set.
+SAMPLE_ENTITIES = EntityResult(
+    category="eletronicos",
+    state="SP",
+    city="sao paulo",
+    min_rating=4.0,
+    min_reliability=0.8,
+    start_date="2018-01-01",
+    end_date="2018-12-31",
+    product="phone",
+    seller="seller",
+)
+
+_BINDING = re.compile(r"\((\w+):(\w+)")
+# Clause keywords; the WITH of ``STARTS WITH``/``ENDS WITH`` is an operator, not a clause.
+_CLAUSE = re.compile(
+    r"\b(OPTIONAL MATCH|MATCH|WHERE|(?<!STARTS )(?<!ENDS )WITH|RETURN|ORDER BY|UNWIND|CALL|MERGE|SET|LIMIT)\b"
+)
+_MATCH_CLAUSES = {"MATCH", "OPTIONAL MATCH"}
+_PREDICATE = re.compile(
+    r"\b(\w+)\.(\w+)\s*(=|<>|<=|>=|<|>|\bIN\b|\bCONTAINS\b|\bSTARTS WITH\b|\bENDS WITH\b|\bIS NOT NULL\b)"
+)
+_CALL = re.compile(r"\b\w+\s*\(")
+_PROPERTY = re.compile(r"\b(\w+)\.(\w+)\b")
+_SEEK_OPERATORS = ("NodeIndex", "NodeUniqueIndex", "MultiNodeIndexSeek")
+_SCAN_OPERATORS = ("NodeByLabelScan", "AllNodesScan")
+
+
+@dataclass(frozen=True)
+class Predicate:
+    label: str
+    property: str
+    operator: str
+
+    @property
+    def index_type(self) -> str:
+        return "TEXT" if self.operator in TEXT_OPERATORS else "RANGE"
+
+
+@dataclass
+class IndexSuggestion:
+    label: str
+    property: str
+    index_type: str
+    templates: List[str]
+
+    @property
+    def name(self) -> str:
+        return f"{self.label.lower()}_{self.property.lower()}_{self.index_type.lower()}"
+
+    def statement(self) -> str:
+        check_identifier(self.label)
+        check_identifier(self.property)
+        prefix = "CREATE TEXT INDEX" if self.index_type == "TEXT" else "CREATE INDEX"
+        return f"{prefix} {self.name} IF NOT EXISTS FOR (n:{self.label}) ON (n.{self.property})"
+
+
+def template_library() -> Dict[str, str]:
+    """Every template the pipeline can run, keyed ``intent`` / ``canonical:intent`` / ``rollup:intent``."""
+    library = dict(QUERY_LIBRARY)
+    library.update({f"canonical:{k}": v for k, v in CANONICAL_QUERY_LIBRARY.items()})
+    library.update({f"rollup:{k}": v for k, v in ROLLUP_QUERY_LIBRARY.items()})
+    return library
+
+
+def match_filters(template: str) -> List[str]:
+    """
+    Bodies of the WHERE clauses attached directly to a MATCH/OPTIONAL MATCH.
+
+    A WHERE after WITH filters projected rows (often aggregates), which no
+    index can serve, so those clauses are left out.
+    """
+    clauses = list(_CLAUSE.finditer(template))
+    filters = []
+    for i, clause in enumerate(clauses):
+        if clause.group(1) != "WHERE" or i == 0 or clauses[i - 1].group(1) not in _MATCH_CLAUSES:
+            continue
+        end = clauses[i + 1].start() if i + 1 < len(clauses) else len(template)
+        filters.append(template[clause.end():end])
+    return filters
+
+
+def wrapped_properties(clause: str) -> Set[Tuple[str, str]]:
+    """``(variable, property)`` pairs used as a function argument, e.g. ``toLower(p.name)``."""
+    wrapped = set()
+    for call in _CALL.finditer(clause):
+        depth = 0
+        for end in range(call.end() - 1, len(clause)):
+            depth += {"(": 1, ")": -1}.get(clause[end], 0)
+            if depth == 0:
+                break
+        wrapped.update(_PROPERTY.findall(clause[call.end():end]))
+    return wrapped
+
+
+def parse_predicates(template: str) -> Set[Predicate]:
+    """
+    Label/property predicates in a template that an index could serve.
+
+    Only comparisons in WHERE clauses of a MATCH/OPTIONAL MATCH (see
+    ``match_filters``) on a bare ``variable.property`` whose variable is
+    bound to a label count; ``coalesce(...)``/``date(...)`` wrapped
+    properties can't use an index and are skipped. ``IS NOT NULL`` is kept
+    only when it is the sole predicate on that property and the property isn't
+    also passed to a function in the same clause: ``p.name IS NOT NULL AND
+    toLower(p.name) CONTAINS ...`` is a null guard for a filter no index serves.
+    """
+    labels: Dict[str, str] = {}
+    for var, label in _BINDING.findall(template):
+        labels.setdefault(var, label)
+    predicates = set()
+    for clause in match_filters(template):
+        wrapped = wrapped_properties(clause)
+        for match in _PREDICATE.finditer(clause):
+            var, prop, operator = match.groups()
+            operator = " ".join(operator.split())
+            if var not in labels or (operator == "IS NOT NULL" and (var, prop) in wrapped):
+                continue
+            predicates.add(Predicate(labels[var], prop, operator))
+    compared = {(p.label, p.property) for p in predicates if p.operator != "IS NOT NULL"}
+    return {p for p in predicates if p.operator != "IS NOT NULL" or (p.label, p.property) not in compared}
+
+
+def existing_indexes(rows: Iterable[Dict[str, Any]]) -> Set[Tuple[str, str, str]]:
+    """``SHOW INDEXES`` rows -> {(type, label, first property)}; constraint-backed indexes included."""
+    found = set()
+    for row in rows:
+        if row.get("entityType") != "NODE" or not row.get("labelsOrTypes") or not row.get("properties"):
+            continue
+        found.add((row.get("type"), row["labelsOrTypes"][0], row["properties"][0]))
+    return found
+
+
+def suggest_indexes(
+    library: Dict[str, str], existing: Set[Tuple[str, str, str]]
+) -> List[IndexSuggestion]:
+    """Indexes the templates would use that ``existing`` doesn't cover (key constraints excluded)."""
+    wanted: Dict[Tuple[str, str, str], List[str]] = {}
+    for name, template in library.items():
+        for predicate in parse_predicates(template):
+            key = (predicate.index_type, predicate.label, predicate.property)
+            wanted.setdefault(key, []).append(name)
+    keys = {(label, prop) for label, prop in KEY_CONSTRAINTS}
+    suggestions = []
+    for (index_type, label, prop), templates in sorted(wanted.items()):
+        if (index_type, label, prop) in existing:
+            continue
+        if index_type == "RANGE" and (label, prop) in keys:
+            continue
+        suggestions.append(IndexSuggestion(label, prop, index_type, sorted(set(templates))))
+    return suggestions
+
+
+def plan_operators(plan: Dict[str, Any]) -> List[str]:
+    """Operator names of a plan tree (``@neo4j`` runtime suffixes stripped)."""
+    if not plan:
+        return []
+    name = str(plan.get("operatorType", "")).split("@")[0]
+    operators = [name]
+    for child in plan.get("children", []) or []:
+        operators.extend(plan_operators(child))
+    return operators
+
+
+def access_summary(operators: List[str]) -> Dict[str, int]:
+    return {
+        "label_scans": sum(op.startswith(_SCAN_OPERATORS) for op in operators),
+        "index_seeks": sum(op.startswith(_SEEK_OPERATORS) for op in operators),
+    }
+
+
+class IndexAdvisor:
+    """
+    Compare the templates' predicates with the database schema and create what is missing.
+
+    ``report()`` is read-only. ``apply()`` creates key constraints and the
+    suggested indexes, waits for them to come online and EXPLAINs every
+    template before and after.
+    """
+
+    def __init__(self, client: KGClient, library: Optional[Dict[str, str]] = None):
+        self.client = client
+        self.library = library or template_library()
+
+    def show_indexes(self) -> Set[Tuple[str, str, str]]:
+        return existing_indexes(self.client.run_query("SHOW INDEXES"))
+
+    def report(self) -> Dict[str, Any]:
+        existing = self.show_indexes()
+        return {
+            "predicates": {
+                name: sorted(f"{p.label}.{p.property} {p.operator}" for p in parse_predicates(template))
+                for name, template in self.library.items()
+            },
+            "missing_constraints": [
+                f"{label}.{prop}" for label, prop in KEY_CONSTRAINTS if ("RANGE", label, prop) not in existing
+            ],
+            "missing_indexes": [asdict(s) | {"statement": s.statement()} for s in suggest_indexes(self.library, existing)],
+        }
+
+    def explain_all(self) -> Dict[str, Dict[str, int]]:
+        """Label scans / index seeks per template, planned with every optional filter set."""
+        params = SAMPLE_ENTITIES.to_params()
+        present = frozenset(k for k, v in params.items() if v is not None)
+        summaries = {}
+        for name, template in self.library.items():
+            try:
+                plan = self.client.explain(specialize_template(template, present), params)
+                summaries[name] = access_summary(plan_operators(plan))
+            except Exception as e:
+                print(f"Warning: EXPLAIN failed for {name}: {e}")
+        return summaries
+
+    def create_constraints(self, existing: Set[Tuple[str, str, str]]) -> List[str]:
+        created = []
+        for label, prop in KEY_CONSTRAINTS:
+            if ("RANGE", label, prop) in existing:
+                continue
+            statement = (
+                f"CREATE CONSTRAINT {label.lower()}_{prop.lower()}_unique IF NOT EXISTS "
+                f"FOR (n:{label}) REQUIRE n.{prop} IS UNIQUE"
+            )
+            try:
+                self.client.run_query(statement)
+                created.append(statement)
+            except Exception as e:
+                print(f"Warning: could not create constraint on {label}.{prop}: {e}")
+        return created
+
+    def apply(self, timeout: int = 300) -> Dict[str, Any]:
+        before = self.explain_all()
+        existing = self.show_indexes()
+        created = self.create_constraints(existing)
+        for suggestion in suggest_indexes(self.library, existing):
+            self.client.run_query(suggestion.statement())
+            created.append(suggestion.statement())
+        if created:
+            self.client.run_query("CALL db.awaitIndexes($timeout)", {"timeout": timeout})
+        after = self.explain_all()
+        switched = sorted(
+            name
+            for name in after
+            if name in before
+            and before[name]["label_scans"] > after[name]["label_scans"]
+            and after[name]["index_seeks"] > before[name]["index_seeks"]
+        )
+        return {"created": created, "before": before, "after": after, "switched_to_index_seek": switched}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Suggest and create indexes for the Cypher template library.")
+    parser.add_argument("--apply", action="store_true", help="Create missing constraints/indexes and compare plans")
+    parser.add_argument("--timeout", type=int, default=300, help="Seconds to wait for new indexes to come online")
+    args = parser.parse_args()
+
+    advisor = IndexAdvisor(get_client(get_settings()))
+    result = advisor.apply(timeout=args.timeout) if args.apply else advisor.report()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
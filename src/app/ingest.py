@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .config import get_settings
+from .entities import STATES
+from .kg_client import KGClient, get_client
+
+
+def _bool(value: Any) -> Optional[bool]:
+    if isinstance(value, bool) or value is None:
+        return value
+    text = str(value).strip().lower()
+    if text in ("true", "1", "yes"):
+        return True
+    if text in ("false", "0", "no"):
+        return False
+    return None
+
+
+def _float(value: Any) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    return float(value)
+
+
+@dataclass
+class Dataset:
+    """One product x state artifact in data/ and the relationship properties it provides."""
+    name: str
+    filename: str
+    fields: Dict[str, Callable[[Any], Any]]
+
+
+DATASETS: List[Dataset] = [
+    Dataset(
+        "avg_review_score",
+        "product_state_avg_review_score.csv",
+        {"avg_review_score_state": _float},
+    ),
+    Dataset(
+        "delivery_delays",
+        "product_state_delivery_delays.csv",
+        {"avg_delay_days": _float},
+    ),
+    Dataset(
+        "normalized_delay",
+        "product_state_normalized_delay.csv",
+        {"normalized_delay": _float},
+    ),
+    Dataset(
+        "exceeds_expectations",
+        "product_state_exceeds_expectations.csv",
+        {
+            "avg_review_score_state": _float,
+            "normalized_delay": _float,
+            "expected_category_score": _float,
+            "expected_score": _float,
+            "exceeds": _bool,
+        },
+    ),
+]
+
+CONSTRAINTS = [
+    "CREATE CONSTRAINT product_id_unique IF NOT EXISTS FOR (p:Product) REQUIRE p.product_id IS UNIQUE",
+    "CREATE CONSTRAINT state_code_unique IF NOT EXISTS FOR (s:State) REQUIRE s.code IS UNIQUE",
+]
+
+# Idempotent: re-running a file rewrites the same relationship properties.
+WRITE_ROWS = """
+UNWIND $rows AS row
+MERGE (p:Product {product_id: row.product_id})
+MERGE (s:State {code: row.customer_state})
+MERGE (p)-[r:STATE_STATS]->(s)
+SET r += row.props
+"""
+
+
+def iter_rows(path: str, dataset: Dataset) -> Iterator[Dict[str, Any]]:
+    """
+    Stream rows as ``{product_id, customer_state, props}``.
+
+    CSV files are read line by line. The JSON variants in data/ map
+    ``"product_id|STATE"`` to a single value and are accepted for one-field datasets.
+    """
+    if path.endswith(".json"):
+        if len(dataset.fields) != 1:
+            raise ValueError(f"{path}: JSON input only supports single-field datasets")
+        (field, convert), = dataset.fields.items()
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        for key, value in payload.items():
+            product_id, _, state = key.partition("|")
+            yield {"product_id": product_id, "customer_state": state, "props": {field: convert(value)}}
+        return
+    with open(path, newline="", encoding="utf-8") as f:
+        for record in csv.DictReader(f):
+            product_id = (record.get("product_id") or "").strip()
+            state = (record.get("customer_state") or "").strip().upper()
+            if not product_id or not state:
+                continue
+            props = {field: convert(record.get(field)) for field, convert in dataset.fields.items()}
+            yield {"product_id": product_id, "customer_state": state, "props": props}
+
+
+def chunked(rows: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk: List[Dict[str, Any]] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def partition_of(product_id: str, partitions: int) -> int:
+    """Stable partition so every row for a product goes to the same writer."""
+    return zlib.crc32(product_id.encode("utf-8")) % partitions
+
+
+class BulkLoader:
+    """
+    Stream data/ artifacts into Neo4j with parameterized ``UNWIND`` batches.
+
+    Each batch is one explicit write transaction. With ``writers > 1`` rows are
+    partitioned by product_id and each partition has its own single-threaded
+    writer, so two transactions never touch the same product concurrently.
+    """
+
+    def __init__(self, client: KGClient, batch_size: int = 5000, writers: int = 1):
+        self.client = client
+        self.batch_size = batch_size
+        self.writers = max(1, writers)
+
+    def ensure_schema(self) -> None:
+        """Uniqueness constraints make every MERGE an index seek and concurrent MERGE safe."""
+        for statement in CONSTRAINTS:
+            self.client.run_query(statement)
+        # Pre-create states so parallel writers never race to MERGE the same State node.
+        self.client.run_query(
+            "UNWIND $codes AS code MERGE (:State {code: code})", {"codes": STATES}
+        )
+
+    def write_batch(self, rows: List[Dict[str, Any]]) -> int:
+        with self.client.session() as session:
+            session.execute_write(lambda tx: tx.run(WRITE_ROWS, rows=rows).consume())
+        return len(rows)
+
+    def load(self, path: str, dataset: Dataset) -> Dict[str, float]:
+        start = time.perf_counter()
+        written = 0
+        executors = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"ingest-{i}") for i in range(self.writers)
+        ]
+        pending: List[Future] = []
+        try:
+            for chunk in chunked(iter_rows(path, dataset), self.batch_size):
+                if self.writers == 1:
+                    written += self.write_batch(chunk)
+                else:
+                    partitions: List[List[Dict[str, Any]]] = [[] for _ in range(self.writers)]
+                    for row in chunk:
+                        partitions[partition_of(row["product_id"], self.writers)].append(row)
+                    for executor, rows in zip(executors, partitions):
+                        if rows:
+                            pending.append(executor.submit(self.write_batch, rows))
+                    # Keep at most two batches per writer in flight.
+                    while len(pending) > self.writers * 2:
+                        written += pending.pop(0).result()
+                elapsed = time.perf_counter() - start
+                print(f"[{dataset.name}] {written} rows written, {written / elapsed:.0f} rows/sec")
+            for future in pending:
+                written += future.result()
+        finally:
+            for executor in executors:
+                executor.shutdown(wait=True)
+        elapsed = time.perf_counter() - start
+        stats = {"rows": written, "seconds": elapsed, "rows_per_sec": written / elapsed if elapsed else 0.0}
+        print(f"[{dataset.name}] done: {written} rows in {elapsed:.1f}s ({stats['rows_per_sec']:.0f} rows/sec)")
+        return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk-load the data/ product x state artifacts into Neo4j.")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per UNWIND transaction")
+    parser.add_argument("--writers", type=int, default=1, help="Parallel writers (partitioned by product_id)")
+    parser.add_argument(
+        "--dataset",
+        action="append",
+        choices=[d.name for d in DATASETS],
+        help="Load only these datasets (repeatable; default: all)",
+    )
+    parser.add_argument("--skip-schema", action="store_true", help="Don't create constraints/State nodes")
+    args = parser.parse_args()
+
+    settings = get_settings()
+    client = get_client(settings)
+    loader = BulkLoader(client, batch_size=args.batch_size, writers=args.writers)
+    if not args.skip_schema:
+        loader.ensure_schema()
+    for dataset in DATASETS:
+        if args.dataset and dataset.name not in args.dataset:
+            continue
+        path = os.path.join(args.data_dir, dataset.filename)
+        if not os.path.exists(path):
+            print(f"[{dataset.name}] skipped: {path} not found")
+            continue
+        loader.load(path, dataset)
+    # Loaded data changes query results; drop cached rows everywhere.
+    client.bump_data_version()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,205 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import atexit
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from neo4j import GraphDatabase, basic_auth
+from neo4j import AsyncGraphDatabase, GraphDatabase, basic_auth
 
 from .config import Settings
+from .query_cache import QueryCache, build_query_cache
+
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def check_identifier(name: str) -> str:
+    """Validate a label/property name before it is interpolated into Cypher."""
+    if not name or not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid label/property name: {name}")
+    return name
+
+
+class PoolGauge:
+    """
+    Client-side view of the connection pool.
+
+    Each session holds at most one pooled connection, so bounding concurrent
+    sessions to the driver's pool size makes the time spent waiting here the
+    pool acquisition wait. With ``limit=None`` it only counts.
+    """
+
+    def __init__(self, limit: Optional[int] = None, timeout: Optional[float] = None):
+        self.limit = limit
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.acquired = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @contextmanager
+    def hold(self) -> Iterator[None]:
+        start = time.perf_counter()
+        with self._cond:
+            if self.limit is not None:
+                ok = self._cond.wait_for(lambda: self.in_use < self.limit, timeout=self.timeout)
+                if not ok:
+                    self.timeouts += 1
+                    raise RuntimeError(
+                        f"Timed out after {self.timeout}s waiting for a Neo4j connection "
+                        f"(pool size {self.limit})"
+                    )
+            waited = time.perf_counter() - start
+            self.in_use += 1
+            self.acquired += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_use -= 1
+                self._cond.notify()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "pool_size": self.limit,
+                "in_use": self.in_use,
+                "idle": None if self.limit is None else self.limit - self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "acquired": self.acquired,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": (self.total_wait / self.acquired * 1000.0) if self.acquired else 0.0,
+                "max_wait_ms": self.max_wait * 1000.0,
+            }
 
 
 class KGClient:
-    def __init__(self, settings: Settings):
+    def __init__(
+        self,
+        settings: Settings,
+        pool: Optional[PoolGauge] = None,
+        query_cache: Optional[QueryCache] = None,
+    ):
         self.settings = settings
+        self.pool = pool or PoolGauge()
+        self.query_cache = query_cache
         self.driver = GraphDatabase.driver(
             settings.neo4j_uri,
             auth=basic_auth(settings.neo4j_user, settings.neo4j_password),
+            max_connection_pool_size=settings.neo4j_max_pool_size,
+            max_connection_lifetime=settings.neo4j_max_connection_lifetime,
+            connection_acquisition_timeout=settings.neo4j_acquisition_timeout,
+            fetch_size=settings.neo4j_fetch_size,
         )
 
     def close(self) -> None:
         self.driver.close()
 
-    def run_query(self, query: str, params: Dict[str, Any] | None = None) -> List[Dict[str, Any]]:
-        """Execute a Cypher query with parameters, handling NULL params gracefully."""
+    @contextmanager
+    def session(self) -> Iterator[Any]:
+        """Open a session against the configured database, tracked by the pool gauge."""
+        with self.pool.hold():
+            with self.driver.session(database=self.settings.neo4j_database) as session:
+                yield session
+
+    def warm_up(self) -> bool:
+        """Verify connectivity so the first question doesn't pay for the handshake."""
+        try:
+            self.driver.verify_connectivity()
+            return True
+        except Exception as e:
+            print(f"Warning: Neo4j warm-up failed: {e}")
+            return False
+
+    def pool_metrics(self) -> Dict[str, Any]:
+        return self.pool.snapshot()
+
+    def run_query(
+        self,
+        query: str,
+        params: Dict[str, Any] | None = None,
+        intent: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Execute a Cypher query with parameters, handling NULL params gracefully.
+
+        When ``intent`` names a library template and a query cache is attached,
+        results are served from / stored in the cache.
+        """
         params = params or {}
-        with self.driver.session(database=self.settings.neo4j_database) as session:
+        if intent and self.query_cache is not None:
+            return self.query_cache.get_or_run(
+                intent,
+                query,
+                params,
+                self.settings.neo4j_database,
+                lambda: self._execute(query, params),
+            )
+        return self._execute(query, params)
+
+    def _execute(self, query: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with self.session() as session:
             result = session.run(query, **params)
             return [record.data() for record in result]
 
+    def explain(self, query: str, params: Dict[str, Any] | None = None) -> Dict[str, Any]:
+        """Planner output for ``query`` (``EXPLAIN``; nothing is executed)."""
+        with self.session() as session:
+            summary = session.run("EXPLAIN " + query, **(params or {})).consume()
+            return summary.plan or {}
+
+    def profile(self, query: str, params: Dict[str, Any] | None = None) -> Dict[str, Any]:
+        """
+        Execute ``query`` under ``PROFILE`` (bypassing the query cache).
+
+        Returns:
+            Dict with the server's profiled plan (``profile``), the number of
+            records returned and the client-side wall time in seconds.
+        """
+        with self.session() as session:
+            start = time.perf_counter()
+            result = session.run("PROFILE " + query, **(params or {}))
+            records = sum(1 for _ in result)
+            summary = result.consume()
+            wall_sec = time.perf_counter() - start
+        return {"profile": summary.profile or {}, "records": records, "wall_sec": wall_sec}
+
+    def data_version(self) -> int:
+        """Graph data version stored on the ``:GraphMeta`` node (0 if never set)."""
+        rows = self._execute(
+            "MATCH (m:GraphMeta {key: 'graph'}) RETURN m.data_version AS version", {}
+        )
+        return int(rows[0]["version"] or 0) if rows else 0
+
+    def graph_meta(self) -> Dict[str, Any]:
+        """Properties of the ``:GraphMeta`` node (empty if it doesn't exist)."""
+        rows = self._execute("MATCH (m:GraphMeta {key: 'graph'}) RETURN properties(m) AS meta", {})
+        return dict(rows[0]["meta"] or {}) if rows else {}
+
+    def bump_data_version(self) -> int:
+        """Increment the graph data version; call after any write that changes query results."""
+        rows = self._execute(
+            """
+            MERGE (m:GraphMeta {key: 'graph'})
+            SET m.data_version = coalesce(m.data_version, 0) + 1
+            RETURN m.data_version AS version
+            """,
+            {},
+        )
+        version = int(rows[0]["version"])
+        if self.query_cache is not None:
+            self.query_cache.invalidate(version)
+        return version
+
     def vector_query(
         self,
         vector: List[float],
@@ -48,21 +223,52 @@ class KGClient:
             ValueError: If vector dimensions or index parameters are invalid.
             RuntimeError: If vector query execution fails.
         """
-        # Validate input parameters
-        if not vector:
-            raise ValueError("Vector cannot be empty")
-        if top_k < 1:
-            raise ValueError("top_k must be at least 1")
-        
-        index_name = index_name or self.settings.vector_index
-        embed_property = embed_property or self.settings.embed_property
-        
-        # Validate index name (basic sanity check)
-        if not index_name or not isinstance(index_name, str):
-            raise ValueError(f"Invalid index name: {index_name}")
-        
+        cypher, index_name = vector_query_cypher(self.settings, vector, top_k, index_name, embed_property)
         try:
-            cypher = f"""
+            with self.session() as session:
+                result = session.run(cypher, vector=vector, top_k=top_k)
+                records = [record.data() for record in result]
+                
+                if not records:
+                    print(f"Vector search returned no results for index '{index_name}'")
+                
+                return records
+        except Exception as e:
+            error_msg = f"Vector query failed on index '{index_name}': {str(e)}"
+            print(f"Error: {error_msg}")
+            raise RuntimeError(error_msg) from e
+
+
+def vector_query_cypher(
+    settings: Settings,
+    vector: List[float],
+    top_k: int,
+    index_name: str | None = None,
+    embed_property: str | None = None,
+) -> Tuple[str, str]:
+    """
+    Validate vector query arguments and build the index query.
+
+    Returns:
+        ``(cypher, index_name)``; the query takes ``$vector`` and ``$top_k``.
+
+    Raises:
+        ValueError: If the vector, ``top_k`` or index name is invalid.
+    """
+    # Validate input parameters
+    if not vector:
+        raise ValueError("Vector cannot be empty")
+    if top_k < 1:
+        raise ValueError("top_k must be at least 1")
+
+    index_name = index_name or settings.vector_index
+    embed_property = embed_property or settings.embed_property
+
+    # Validate index name (basic sanity check)
+    if not index_name or not isinstance(index_name, str):
+        raise ValueError(f"Invalid index name: {index_name}")
+
+    cypher = f"""
             CALL db.index.vector.queryNodes(
                 '{index_name}',
                 $top_k,
@@ -71,15 +277,123 @@ class KGClient:
             RETURN node{{.*, `{embed_property}`: null}} AS item, score
             ORDER BY score DESC
             """
-            with self.driver.session(database=self.settings.neo4j_database) as session:
-                result = session.run(cypher, vector=vector, top_k=top_k)
-                records = [record.data() for record in result]
-                
-                if not records:
-                    print(f"Vector search returned no results for index '{index_name}'")
-                
-                return records
+    return cypher, index_name
+
+
+class AsyncKGClient:
+    """
+    asyncio counterpart of ``KGClient`` for the queries the pipeline runs:
+    templates (through the shared query cache), vector search and graph metadata.
+
+    The driver's own pool (``NEO4J_MAX_POOL_SIZE``, ``NEO4J_ACQUISITION_TIMEOUT``)
+    bounds concurrent sessions. Create it inside the event loop that uses it,
+    and ``await close()`` before the loop ends.
+    """
+
+    def __init__(self, settings: Settings, query_cache: Optional[QueryCache] = None):
+        self.settings = settings
+        self.query_cache = query_cache
+        self.driver = AsyncGraphDatabase.driver(
+            settings.neo4j_uri,
+            auth=basic_auth(settings.neo4j_user, settings.neo4j_password),
+            max_connection_pool_size=settings.neo4j_max_pool_size,
+            max_connection_lifetime=settings.neo4j_max_connection_lifetime,
+            connection_acquisition_timeout=settings.neo4j_acquisition_timeout,
+            fetch_size=settings.neo4j_fetch_size,
+        )
+
+    async def close(self) -> None:
+        await self.driver.close()
+
+    async def warm_up(self) -> bool:
+        try:
+            await self.driver.verify_connectivity()
+            return True
+        except Exception as e:
+            print(f"Warning: Neo4j warm-up failed: {e}")
+            return False
+
+    async def run_query(
+        self,
+        query: str,
+        params: Dict[str, Any] | None = None,
+        intent: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Async ``KGClient.run_query``; shares cache entries with the sync client."""
+        params = params or {}
+        if intent and self.query_cache is not None:
+            return await self.query_cache.aget_or_run(
+                intent,
+                query,
+                params,
+                self.settings.neo4j_database,
+                lambda: self._execute(query, params),
+            )
+        return await self._execute(query, params)
+
+    async def _execute(self, query: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        async with self.driver.session(database=self.settings.neo4j_database) as session:
+            result = await session.run(query, **params)
+            return [record.data() async for record in result]
+
+    async def graph_meta(self) -> Dict[str, Any]:
+        rows = await self._execute("MATCH (m:GraphMeta {key: 'graph'}) RETURN properties(m) AS meta", {})
+        return dict(rows[0]["meta"] or {}) if rows else {}
+
+    async def vector_query(
+        self,
+        vector: List[float],
+        top_k: int = 10,
+        index_name: str | None = None,
+        embed_property: str | None = None,
+    ) -> List[Dict[str, Any]]:
+        """Async ``KGClient.vector_query``."""
+        cypher, index_name = vector_query_cypher(self.settings, vector, top_k, index_name, embed_property)
+        try:
+            records = await self._execute(cypher, {"vector": vector, "top_k": top_k})
         except Exception as e:
             error_msg = f"Vector query failed on index '{index_name}': {str(e)}"
             print(f"Error: {error_msg}")
             raise RuntimeError(error_msg) from e
+        if not records:
+            print(f"Vector search returned no results for index '{index_name}'")
+        return records
+
+
+_shared_client: Optional[KGClient] = None
+_shared_lock = threading.Lock()
+
+
+def get_client(settings: Settings) -> KGClient:
+    """
+    Return the process-wide client, creating (and warming up) its driver on first use.
+
+    The driver is thread-safe and keeps a connection pool, so every Pipeline
+    in the process should share it instead of opening a new one per question.
+    """
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            pool = PoolGauge(
+                limit=settings.neo4j_max_pool_size,
+                timeout=settings.neo4j_acquisition_timeout,
+            )
+            _shared_client = KGClient(settings, pool=pool)
+            _shared_client.query_cache = build_query_cache(
+                settings, version_loader=_shared_client.data_version
+            )
+            if settings.neo4j_warm_up:
+                _shared_client.warm_up()
+        return _shared_client
+
+
+def close_client() -> None:
+    """Close the shared driver (registered with atexit)."""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is not None:
+            _shared_client.close()
+            _shared_client = None
+
+
+atexit.register(close_client)
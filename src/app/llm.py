@@ -1,15 +1,22 @@
 from __future__ import annotations
 
+import atexit
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Callable, Dict, Optional, TYPE_CHECKING
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, Optional, Tuple, TYPE_CHECKING
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import AIMessage
+from langchain_core.runnables import Runnable
 from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
 
 from .config import Settings
+from .llm_clients import ConnectionTimer, close_http_client, http_clients, pool_limits
+from .tracing import Trace, optional_span
 
 if TYPE_CHECKING:
     from langchain_openai import ChatOpenAI
@@ -21,55 +28,135 @@ class LLMConfig:
     name: str
     constructor: Callable[[], BaseChatModel]
     max_context_tokens: int = 30000  # Safe default
+    # "tiktoken:<encoding>" or "hf:<repo id>"; None counts with the estimator
+    tokenizer: Optional[str] = None
+    max_answer_tokens: int = 512
+    # "openai", "ollama" or "huggingface": selects the HTTP pool and connection stats bucket
+    backend: str = ""
+    # Opens a pooled connection (and loads the model where that applies) ahead of the first question
+    warm_up: Optional[Callable[[BaseChatModel], None]] = None
+
+
+# Used when the model has no ``openai_api_base`` (OPENAI_BASE_URL) set.
+OPENAI_API_BASE = "https://api.openai.com/v1"
+
+
+def _warm_up_ollama(model: BaseChatModel) -> None:
+    """One-token generation: loads the model into memory and opens its pooled connection."""
+    model.invoke("ping", options={"num_predict": 1})
 
 
 class LLMRegistry:
     """
     Simple registry to offer at least three model choices.
     Extend with Groq, Gemini, etc. as needed.
+
+    Each model is constructed once and reused. OpenAI models share one
+    keep-alive httpx pool; each Ollama model keeps its own pooled client.
+    Connection setup time per backend is tracked by ``timer``.
     """
 
     def __init__(self, settings: Settings):
         self.settings = settings
         self._registry: Dict[str, LLMConfig] = {}
+        self._instances: Dict[str, BaseChatModel] = {}
+        self._instances_lock = threading.Lock()
+        self._http: Dict[str, Dict[str, object]] = {}
+        self.timer = ConnectionTimer()
         self._build_defaults()
 
+    def _http_clients(self, backend: str) -> Dict[str, object]:
+        """Shared sync/async httpx clients for a backend, created on first use."""
+        with self._instances_lock:
+            if backend not in self._http:
+                self._http[backend] = http_clients(
+                    backend,
+                    self.timer,
+                    pool_size=self._pool_size(backend),
+                    keepalive_expiry=self.settings.llm_keepalive_expiry,
+                )
+            return self._http[backend]
+
+    def _pool_size(self, backend: str) -> int:
+        if backend == "openai":
+            return self.settings.openai_pool_size
+        if backend == "ollama":
+            return self.settings.ollama_pool_size
+        # The Hugging Face endpoint client manages its own connections.
+        raise ValueError(f"Backend '{backend}' has no shared HTTP pool")
+
+    def _warm_up_openai(self, model: BaseChatModel) -> None:
+        """``GET /models`` on the shared pool the model sends its requests through."""
+        base = (model.openai_api_base or OPENAI_API_BASE).rstrip("/")
+        response = self._http_clients("openai")["sync"].get(
+            f"{base}/models", headers={"Authorization": f"Bearer {self.settings.openai_api_key}"}
+        )
+        response.raise_for_status()
+
+    def _ollama_client_kwargs(self) -> Dict[str, Dict[str, object]]:
+        limits = pool_limits(self._pool_size("ollama"), self.settings.llm_keepalive_expiry)
+        return {
+            "client_kwargs": {"limits": limits},
+            "sync_client_kwargs": {"event_hooks": self.timer.hooks("ollama")},
+            "async_client_kwargs": {"event_hooks": self.timer.async_hooks("ollama")},
+        }
+
     def _build_defaults(self) -> None:
         if self.settings.openai_api_key:
             def _make_openai_gpt4():
                 from langchain_openai import ChatOpenAI
+                http = self._http_clients("openai")
                 return ChatOpenAI(
                     api_key=self.settings.openai_api_key,
                     model_name="gpt-4o-mini",
                     temperature=0.2,
+                    http_client=http["sync"],
+                    http_async_client=http["async"],
                 )
             def _make_openai_gpt35():
                 from langchain_openai import ChatOpenAI
+                http = self._http_clients("openai")
                 return ChatOpenAI(
                     api_key=self.settings.openai_api_key,
                     model_name="gpt-3.5-turbo",
                     temperature=0.3,
+                    http_client=http["sync"],
+                    http_async_client=http["async"],
                 )
             self._registry["openai-gpt4"] = LLMConfig(
                 name="openai-gpt4",
                 constructor=_make_openai_gpt4,
                 max_context_tokens=120000,
+                tokenizer="tiktoken:o200k_base",
+                backend="openai",
+                warm_up=self._warm_up_openai,
             )
             self._registry["openai-gpt35"] = LLMConfig(
                 name="openai-gpt35",
                 constructor=_make_openai_gpt35,
                 max_context_tokens=15000,
+                tokenizer="tiktoken:cl100k_base",
+                backend="openai",
+                warm_up=self._warm_up_openai,
             )
-        # Fixed set of Ollama models (edit here if you want different tags)
-        ollama_models = ["llama2", "phi3:mini", "mistral"]
-        for model_name in ollama_models:
+        # Fixed set of Ollama models (edit here if you want different tags),
+        # with the Hugging Face tokenizer each one was trained with
+        ollama_models = {
+            "llama2": "hf:hf-internal-testing/llama-tokenizer",
+            "phi3:mini": "hf:microsoft/Phi-3-mini-4k-instruct",
+            "mistral": "hf:mistralai/Mistral-7B-v0.1",
+        }
+        for model_name, tokenizer in ollama_models.items():
             def _make_ollama(model=model_name):
                 from langchain_ollama import ChatOllama
-                return ChatOllama(model=model, temperature=0.2)
+                return ChatOllama(model=model, temperature=0.2, **self._ollama_client_kwargs())
             self._registry[f"ollama-{model_name}"] = LLMConfig(
                 name=f"ollama-{model_name}",
                 constructor=_make_ollama,
                 max_context_tokens=4000,
+                tokenizer=tokenizer,
+                backend="ollama",
+                warm_up=_warm_up_ollama,
             )
         if self.settings.huggingface_token:
             def _make_huggingface():
@@ -89,6 +176,9 @@ class LLMRegistry:
                 name="huggingface-endpoint",
                 constructor=_make_huggingface,
                 max_context_tokens=25000,  # Conservative limit for 32K models
+                tokenizer=f"hf:{os.getenv('HF_MODEL', 'HuggingFaceH4/zephyr-7b-alpha')}",
+                max_answer_tokens=256,
+                backend="huggingface",
             )
             
     def options(self) -> Dict[str, LLMConfig]:
@@ -101,7 +191,62 @@ class LLMRegistry:
             )
         if key not in self._registry:
             raise KeyError(f"Model '{key}' not registered")
-        return self._registry[key].constructor()
+        instance = self._instances.get(key)
+        if instance is None:
+            with self._instances_lock:
+                instance = self._instances.get(key)
+            if instance is None:
+                # Construct outside the lock: _http_clients takes it too.
+                instance = self._registry[key].constructor()
+                with self._instances_lock:
+                    instance = self._instances.setdefault(key, instance)
+        return instance
+
+    def warm_up(self, keys: Optional[Iterable[str]] = None) -> Dict[str, object]:
+        """
+        Construct models and open their pooled connections concurrently.
+
+        Returns:
+            ``{model key: warm-up seconds}``, or the error message for models
+            that could not be reached (also printed as a warning).
+        """
+        keys = list(keys if keys is not None else self._registry)
+
+        def warm(key: str) -> object:
+            start = time.perf_counter()
+            try:
+                model = self.get(key)
+                config = self._registry[key]
+                if config.warm_up is not None:
+                    config.warm_up(model)
+                return time.perf_counter() - start
+            except Exception as e:
+                print(f"Warning: LLM warm-up failed for {key}: {e}")
+                return str(e)
+
+        if not keys:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(keys), thread_name_prefix="llm-warm-up") as pool:
+            return dict(zip(keys, pool.map(warm, keys)))
+
+    def connection_stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-backend requests, new connections, connect time and keep-alive reuse rate."""
+        return self.timer.snapshot()
+
+    def close(self) -> None:
+        """Close every pooled HTTP client (sync and async) and drop the model instances."""
+        with self._instances_lock:
+            http = list(self._http.values())
+            instances = list(self._instances.values())
+            self._http.clear()
+            self._instances.clear()
+        for clients in http:
+            close_http_client(clients["sync"])
+            close_http_client(clients["async"])
+        for model in instances:
+            # Ollama models own their pools: ollama.Client/AsyncClient wrap httpx clients.
+            for attr in ("_client", "_async_client"):
+                close_http_client(getattr(getattr(model, attr, None), "_client", None))
     
     def get_config(self, key: str) -> LLMConfig:
         if key not in self._registry:
@@ -109,6 +254,39 @@ class LLMRegistry:
         return self._registry[key]
 
 
+_shared_registry: Optional[LLMRegistry] = None
+_shared_lock = threading.Lock()
+
+
+def get_registry(settings: Settings) -> LLMRegistry:
+    """
+    Return the process-wide registry, creating it on first use.
+
+    Model instances and their keep-alive pools are built once per process,
+    not per Pipeline (Streamlit reruns), and ``LLM_WARM_UP`` runs once, in
+    the background.
+    """
+    global _shared_registry
+    with _shared_lock:
+        if _shared_registry is None:
+            _shared_registry = LLMRegistry(settings)
+            if settings.llm_warm_up:
+                threading.Thread(target=_shared_registry.warm_up, name="llm-warm-up", daemon=True).start()
+        return _shared_registry
+
+
+def close_registry() -> None:
+    """Close the shared registry's HTTP clients (registered with atexit)."""
+    global _shared_registry
+    with _shared_lock:
+        if _shared_registry is not None:
+            _shared_registry.close()
+            _shared_registry = None
+
+
+atexit.register(close_registry)
+
+
 def truncate_context(context: str, max_tokens: int = 20000) -> str:
     """
     Truncate context to approximate token limit.
@@ -120,9 +298,12 @@ def truncate_context(context: str, max_tokens: int = 20000) -> str:
     
     # Truncate and add indicator
     truncated = context[:max_chars]
-    # Try to cut at a sentence boundary
+    # Try to cut at a row (line) boundary, else a sentence boundary
+    last_newline = truncated.rfind('\n')
     last_period = truncated.rfind('.')
-    if last_period > max_chars * 0.8:  # If we can find a period in the last 20%
+    if last_newline > max_chars * 0.8:  # If we can find one in the last 20%
+        truncated = truncated[:last_newline]
+    elif last_period > max_chars * 0.8:
         truncated = truncated[:last_period + 1]
     
     return truncated + "\n\n[Context truncated due to length...]"
@@ -140,28 +321,117 @@ Answer using only the context. If insufficient, say you cannot find the answer."
     return ChatPromptTemplate.from_template(template)
 
 
+def prompt_overhead(persona: str, task: str, question: str) -> str:
+    """The prompt text around the context, for token budgeting."""
+    return build_prompt("", persona, task, question).format(
+        context="", persona=persona, task=task, question=question
+    )
+
+
+def _prepare(
+    model: BaseChatModel,
+    context: str,
+    persona: str,
+    task: str,
+    question: str,
+    max_context_tokens: Optional[int],
+    trace: Optional[Trace],
+) -> Tuple[Runnable, Dict[str, str]]:
+    """
+    Truncate the context and build the prompt chain, under a ``prompt_build`` span.
+
+    ``max_context_tokens=None`` means the context was already fitted to the
+    model by ``fit_context`` and is used as is; the 4-characters-per-token
+    cut would otherwise drop the tail of a row the budget kept.
+
+    Returns:
+        (prompt | model chain, its input variables)
+    """
+    with optional_span(trace, "prompt_build", context_bytes=len(context.encode("utf-8"))) as span:
+        truncated_context = context
+        if max_context_tokens is not None:
+            # Truncate unbudgeted context to prevent token limit errors
+            truncated_context = truncate_context(context, max_context_tokens)
+        span.set(truncated=len(truncated_context) != len(context))
+        prompt = build_prompt(context=truncated_context, persona=persona, task=task, question=question)
+    inputs = {"context": truncated_context, "persona": persona, "task": task, "question": question}
+    return prompt | model, inputs
+
+
 def run_llm(
     model: BaseChatModel,
     context: str,
     persona: str,
     task: str,
     question: str,
-    max_context_tokens: int = 20000,  # Very conservative default
+    max_context_tokens: Optional[int] = 20000,  # Very conservative default
+    trace: Optional[Trace] = None,
 ) -> str:
-    # ALWAYS truncate context to prevent token limit errors
-    truncated_context = truncate_context(context, max_context_tokens)
-    
-    prompt = build_prompt(
-        context=truncated_context, 
-        persona=persona, 
-        task=task, 
-        question=question
-    )
-    chain = prompt | model
-    result: AIMessage = chain.invoke({
-        "context": truncated_context, 
-        "persona": persona, 
-        "task": task, 
-        "question": question
-    })
+    chain, inputs = _prepare(model, context, persona, task, question, max_context_tokens, trace)
+    with optional_span(trace, "llm_call", model=type(model).__name__) as span:
+        result: AIMessage = chain.invoke(inputs)
+        span.set(answer_chars=len(result.content or ""))
     return result.content
+
+
+async def arun_llm(
+    model: BaseChatModel,
+    context: str,
+    persona: str,
+    task: str,
+    question: str,
+    max_context_tokens: Optional[int] = 20000,
+    trace: Optional[Trace] = None,
+) -> str:
+    """Async variant of ``run_llm`` built on ``ainvoke``."""
+    chain, inputs = _prepare(model, context, persona, task, question, max_context_tokens, trace)
+    with optional_span(trace, "llm_call", model=type(model).__name__) as span:
+        result: AIMessage = await chain.ainvoke(inputs)
+        span.set(answer_chars=len(result.content or ""))
+    return result.content
+
+
+def stream_llm(
+    model: BaseChatModel,
+    context: str,
+    persona: str,
+    task: str,
+    question: str,
+    max_context_tokens: Optional[int] = 20000,
+    trace: Optional[Trace] = None,
+) -> Iterator[str]:
+    """Like ``run_llm`` but yields answer text chunks as the model produces them."""
+    chain, inputs = _prepare(model, context, persona, task, question, max_context_tokens, trace)
+    with optional_span(trace, "llm_call", model=type(model).__name__, streaming=True) as span:
+        start = time.perf_counter()
+        chunks = 0
+        for chunk in chain.stream(inputs):
+            if chunk.content:
+                if not chunks:
+                    span.set(time_to_first_token_ms=(time.perf_counter() - start) * 1000.0)
+                chunks += 1
+                yield chunk.content
+        span.set(chunks=chunks)
+
+
+async def astream_llm(
+    model: BaseChatModel,
+    context: str,
+    persona: str,
+    task: str,
+    question: str,
+    max_context_tokens: Optional[int] = 20000,
+    trace: Optional[Trace] = None,
+) -> AsyncIterator[str]:
+    """Async variant of ``stream_llm`` built on ``astream``."""
+    chain, inputs = _prepare(model, context, persona, task, question, max_context_tokens, trace)
+    with optional_span(trace, "llm_call", model=type(model).__name__, streaming=True) as span:
+        start = time.perf_counter()
+        chunks = 0
+        async for chunk in chain.astream(inputs):
+            if chunk.content:
+                if not chunks:
+                    span.set(time_to_first_token_ms=(time.perf_counter() - start) * 1000.0)
+                chunks += 1
+                yield chunk.content
+        span.set(chunks=chunks)
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import httpx
+
+
+@dataclass
+class CallTiming:
+    """Connection work done during one LLM call."""
+    new_connections: int = 0
+    connect_ms: float = 0.0  # TCP connect + TLS handshake
+
+
+@dataclass
+class BackendStats:
+    requests: int = 0
+    new_connections: int = 0
+    connect_ms: float = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        payload = asdict(self)
+        payload["connect_ms"] = round(self.connect_ms, 2)
+        payload["reuse_rate"] = round(1 - self.new_connections / self.requests, 4) if self.requests else 0.0
+        return payload
+
+
+_current_call: contextvars.ContextVar[Optional[CallTiming]] = contextvars.ContextVar("llm_call_timing", default=None)
+
+
+class ConnectionTimer:
+    """
+    Measures connection setup per backend through httpx request hooks.
+
+    The hooks attach an httpcore ``trace`` callback to each request, which
+    reports TCP connect and TLS handshake events. Requests that reuse a pooled
+    keep-alive connection report none. Time spent inside ``call()`` is also
+    attributed to that call; a context variable keeps concurrent calls
+    (threads or asyncio tasks) apart.
+    """
+
+    _CONNECT_EVENTS = ("connection.connect_tcp", "connection.start_tls")
+
+    def __init__(self):
+        self._stats: Dict[str, BackendStats] = {}
+        self._lock = threading.Lock()
+
+    def _trace(self, backend: str) -> Callable[[str, Dict[str, Any]], None]:
+        started: Dict[str, float] = {}
+
+        def record(event: str, info: Dict[str, Any]) -> None:
+            name, _, phase = event.rpartition(".")
+            if name not in self._CONNECT_EVENTS:
+                return
+            if phase == "started":
+                started[name] = time.perf_counter()
+                return
+            if phase != "complete" or name not in started:
+                return
+            elapsed = (time.perf_counter() - started.pop(name)) * 1000.0
+            new = name == "connection.connect_tcp"
+            with self._lock:
+                stats = self._stats.setdefault(backend, BackendStats())
+                stats.connect_ms += elapsed
+                stats.new_connections += int(new)
+            call = _current_call.get()
+            if call is not None:
+                call.connect_ms += elapsed
+                call.new_connections += int(new)
+
+        return record
+
+    def _count_request(self, backend: str, request: httpx.Request) -> None:
+        with self._lock:
+            self._stats.setdefault(backend, BackendStats()).requests += 1
+        request.extensions["trace"] = self._trace(backend)
+
+    def hooks(self, backend: str) -> Dict[str, list]:
+        """``event_hooks`` for a sync ``httpx.Client``."""
+        return {"request": [lambda request: self._count_request(backend, request)]}
+
+    def async_hooks(self, backend: str) -> Dict[str, list]:
+        """``event_hooks`` for an ``httpx.AsyncClient``; its trace callback must be a coroutine."""
+        async def hook(request: httpx.Request) -> None:
+            self._count_request(backend, request)
+            record = request.extensions["trace"]
+
+            async def async_record(event: str, info: Dict[str, Any]) -> None:
+                record(event, info)
+
+            request.extensions["trace"] = async_record
+
+        return {"request": [hook]}
+
+    @contextmanager
+    def call(self) -> Iterator[CallTiming]:
+        """Collect the connection work of the HTTP requests made inside the block."""
+        timing = CallTiming()
+        token = _current_call.set(timing)
+        try:
+            yield timing
+        finally:
+            _current_call.reset(token)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {backend: stats.as_dict() for backend, stats in sorted(self._stats.items())}
+
+
+def pool_limits(pool_size: int, keepalive_expiry: float) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=pool_size,
+        keepalive_expiry=keepalive_expiry,
+    )
+
+
+def http_clients(
+    backend: str, timer: ConnectionTimer, pool_size: int, keepalive_expiry: float, timeout: float = 120.0
+) -> Dict[str, httpx.Client | httpx.AsyncClient]:
+    """A keep-alive sync and async httpx client pair for one backend, instrumented by ``timer``."""
+    limits = pool_limits(pool_size, keepalive_expiry)
+    return {
+        "sync": httpx.Client(limits=limits, timeout=timeout, event_hooks=timer.hooks(backend)),
+        "async": httpx.AsyncClient(limits=limits, timeout=timeout, event_hooks=timer.async_hooks(backend)),
+    }
+
+
+def close_http_client(client: object) -> None:
+    """
+    Close an httpx client and its pooled connections; anything else is ignored.
+
+    An async client is closed on the running loop if there is one, else on a
+    short-lived loop of its own (as at interpreter shutdown).
+    """
+    try:
+        if isinstance(client, httpx.AsyncClient):
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                asyncio.run(client.aclose())
+            else:
+                loop.create_task(client.aclose())
+        elif isinstance(client, httpx.Client):
+            client.close()
+    except Exception as e:
+        print(f"Warning: closing LLM HTTP client failed: {e}")
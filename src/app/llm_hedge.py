@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional
+
+from .config import Settings
+from .tracing import LatencyRecorder
+
+# How a hedged call picks its winner: the first model to emit a token
+# (streaming, so the user never sees two answers mixed) or the first to finish.
+FIRST_TOKEN = "first_token"
+COMPLETE = "complete"
+
+
+@dataclass
+class HedgePolicy:
+    secondary: str
+    # Hedge once the primary has gone this percentile of its recent first-token latency without a token
+    percentile: float = 95.0
+    # Delay (seconds) used until a model has ``min_samples`` first-token latencies
+    initial_delay: float = 2.0
+    min_samples: int = 20
+
+
+@dataclass
+class Attempt:
+    """One model's try at the answer. ``start`` is called on the attempt's own thread."""
+    key: str
+    start: Callable[[], Iterator[str]]
+
+
+class HedgedCall:
+    """
+    Iterable of answer chunks from the winning attempt of a hedged call.
+
+    After iteration, ``winner`` is the model key that answered, ``hedged``
+    whether the secondary was started, and ``delay`` the hedge delay used.
+    """
+
+    def __init__(
+        self,
+        hedger: "Hedger",
+        primary: Attempt,
+        secondary: Optional[Attempt],
+        wait_for: str = FIRST_TOKEN,
+    ):
+        self.hedger = hedger
+        self.primary = primary
+        self.secondary = secondary
+        self.wait_for = wait_for
+        self.delay = hedger.delay(primary.key) if secondary else 0.0
+        self.hedged = False
+        self.winner: Optional[str] = None
+        self.errors: Dict[str, Exception] = {}
+        self._events: "queue.Queue[tuple]" = queue.Queue()
+        self._cancel: Dict[str, threading.Event] = {}
+
+    def _launch(self, attempt: Attempt) -> None:
+        cancel = threading.Event()
+        self._cancel[attempt.key] = cancel
+        threading.Thread(
+            target=self._run, args=(attempt, cancel), name=f"llm-hedge-{attempt.key}", daemon=True
+        ).start()
+
+    def _run(self, attempt: Attempt, cancel: threading.Event) -> None:
+        start = time.perf_counter()
+        first = True
+        try:
+            chunks = attempt.start()
+            try:
+                for chunk in chunks:
+                    if cancel.is_set():
+                        break
+                    if first:
+                        self.hedger.observe(attempt.key, time.perf_counter() - start)
+                        first = False
+                    self._events.put((attempt.key, "chunk", chunk))
+            finally:
+                # Closes the model's response stream (and releases its scheduler slot).
+                close = getattr(chunks, "close", None)
+                if close is not None:
+                    close()
+            self._events.put((attempt.key, "done", None))
+        except Exception as e:
+            self._events.put((attempt.key, "error", e))
+
+    def _start_secondary(self) -> None:
+        self.hedged = True
+        self.hedger.count_hedge()
+        self._launch(self.secondary)
+
+    def _pick(self, key: str) -> None:
+        self.winner = key
+        self.hedger.count_win(key)
+        for other, cancel in self._cancel.items():
+            if other != key:
+                cancel.set()
+
+    def __iter__(self) -> Iterator[str]:
+        self._launch(self.primary)
+        hedge_at = time.perf_counter() + self.delay
+        # The secondary is started once: on the delay, or right away if the primary fails first.
+        can_hedge = self.secondary is not None
+        parts: Dict[str, List[str]] = {self.primary.key: []}
+        if self.secondary is not None:
+            parts[self.secondary.key] = []
+        try:
+            while True:
+                timeout = max(0.0, hedge_at - time.perf_counter()) if can_hedge else None
+                try:
+                    key, kind, value = self._events.get(timeout=timeout)
+                except queue.Empty:
+                    can_hedge = False
+                    self._start_secondary()
+                    continue
+                if self.winner is not None and key != self.winner:
+                    continue
+                if kind == "error":
+                    self.errors[key] = value
+                    if key == self.winner:
+                        raise value
+                    if can_hedge:
+                        can_hedge = False
+                        self._start_secondary()
+                    elif len(self.errors) == len(self._cancel):
+                        raise self.errors[self.primary.key]
+                    continue
+                if key == self.primary.key:
+                    # The primary has produced a token in time: no hedge.
+                    can_hedge = False
+                if self.wait_for == FIRST_TOKEN:
+                    if self.winner is None:
+                        self._pick(key)
+                    if kind == "done":
+                        return
+                    yield value
+                elif kind == "chunk":
+                    parts[key].append(value)
+                else:
+                    self._pick(key)
+                    yield "".join(parts[key])
+                    return
+        finally:
+            # Consumer stopped early (or an error): stop every attempt still running.
+            for cancel in self._cancel.values():
+                cancel.set()
+
+
+class Hedger:
+    """
+    Hedged LLM calls: if the primary model has not produced its first token
+    within a percentile of its recent first-token latency, the same prompt is
+    started on a secondary model and the faster one is used.
+
+    A failure of the primary before the hedge delay starts the secondary
+    immediately (fallback). The loser is cancelled: its stream is closed at
+    the next chunk it produces. A call blocked inside the HTTP client before
+    its first chunk cannot be interrupted from another thread and finishes in
+    the background, holding its scheduler slot until then.
+    """
+
+    def __init__(self, policy: HedgePolicy, recorder: Optional[LatencyRecorder] = None):
+        self.policy = policy
+        # First-token latency (ms) per model key.
+        self.latency = recorder or LatencyRecorder(maxlen=512)
+        self.calls = 0
+        self.hedges = 0
+        self.wins: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def delay(self, key: str) -> float:
+        """Seconds to wait for ``key``'s first token before hedging."""
+        ms = self.latency.quantile(key, self.policy.percentile, min_count=self.policy.min_samples)
+        return self.policy.initial_delay if ms is None else ms / 1000.0
+
+    def observe(self, key: str, first_token_sec: float) -> None:
+        self.latency.observe(key, first_token_sec * 1000.0)
+
+    def count_hedge(self) -> None:
+        with self._lock:
+            self.hedges += 1
+
+    def count_win(self, key: str) -> None:
+        with self._lock:
+            self.wins[key] = self.wins.get(key, 0) + 1
+
+    def call(self, primary: Attempt, secondary: Optional[Attempt] = None, wait_for: str = FIRST_TOKEN) -> HedgedCall:
+        """
+        Race ``primary`` against a delayed ``secondary``.
+
+        Args:
+            primary: The selected model's attempt, started immediately.
+            secondary: The hedge, started after ``delay(primary.key)`` or on a
+                primary failure. None runs the primary alone.
+            wait_for: ``FIRST_TOKEN`` (streaming) or ``COMPLETE``.
+
+        Returns:
+            HedgedCall to iterate for the winner's answer chunks (one chunk
+            with the whole answer for ``COMPLETE``).
+        """
+        with self._lock:
+            self.calls += 1
+        return HedgedCall(self, primary, secondary, wait_for)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            payload: Dict[str, object] = {
+                "secondary": self.policy.secondary,
+                "calls": self.calls,
+                "hedges": self.hedges,
+                "hedge_rate": round(self.hedges / self.calls, 4) if self.calls else 0.0,
+                "wins": dict(self.wins),
+            }
+        payload["first_token_ms"] = self.latency.summary()
+        return payload
+
+
+def build_hedger(settings: Settings) -> Optional[Hedger]:
+    if not settings.llm_hedge_model:
+        return None
+    return Hedger(
+        HedgePolicy(
+            secondary=settings.llm_hedge_model,
+            percentile=settings.llm_hedge_percentile,
+            initial_delay=settings.llm_hedge_delay,
+            min_samples=settings.llm_hedge_min_samples,
+        )
+    )
+
+
+_shared_hedger: Optional[Hedger] = None
+_shared_lock = threading.Lock()
+
+
+def get_hedger(settings: Settings) -> Optional[Hedger]:
+    """
+    Return the process-wide hedger (None when disabled), creating it on first use.
+
+    The first-token latency history that sets the hedge delay has to outlive
+    any one Pipeline (a Streamlit rerun) to ever reach ``min_samples``.
+    """
+    global _shared_hedger
+    with _shared_lock:
+        if _shared_hedger is None:
+            _shared_hedger = build_hedger(settings)
+        return _shared_hedger
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, ContextManager, Deque, Dict, Iterator, List, Optional, Tuple
+
+from .config import Settings
+from .tracing import percentile
+
+# Lower runs first.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+
+class SchedulerRejected(RuntimeError):
+    """The request would wait (or has waited) longer than its deadline for an LLM slot."""
+
+
+@dataclass
+class BackendLimits:
+    max_concurrency: int = 4
+    requests_per_minute: float = 0.0  # 0 disables rate limiting
+
+
+class TokenBucket:
+    """Request-rate limiter: ``rate`` tokens per second, at most ``burst`` saved up. Not thread-safe."""
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = burst
+        self._last = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def wait_for(self, n: int = 1) -> float:
+        """Seconds until ``n`` tokens are available."""
+        self._refill()
+        return max(0.0, (n - self.tokens) / self.rate)
+
+    def reserve(self) -> float:
+        """Take a token, possibly from the future; returns how long to wait before using it."""
+        self._refill()
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+
+class BackendScheduler:
+    """
+    Admission control for one LLM backend.
+
+    At most ``max_concurrency`` calls run at once and (optionally) no more
+    than ``requests_per_minute`` start per minute. Waiting calls are served
+    by priority, then arrival order. A call is rejected up front when its
+    estimated wait exceeds its deadline, and while queued once the deadline
+    passes.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limits: BackendLimits,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.name = name
+        self.limits = limits
+        self.clock = clock
+        self.sleep = sleep
+        self.bucket = (
+            TokenBucket(limits.requests_per_minute / 60.0, max(1, limits.max_concurrency), clock)
+            if limits.requests_per_minute
+            else None
+        )
+        self.running = 0
+        self.admitted = 0
+        self.rejected = 0
+        # Moving average of call duration, used to estimate queue waits.
+        self.service_sec = 1.0
+        self._queue: List[Tuple[int, int, object]] = []
+        self._seq = itertools.count()
+        self._waits: Deque[float] = deque(maxlen=1024)
+        self._cond = threading.Condition()
+
+    def _ahead(self, priority: int) -> int:
+        return sum(1 for p, _, _ in self._queue if p <= priority)
+
+    def estimate_wait(self, priority: int = PRIORITY_INTERACTIVE) -> float:
+        """Expected seconds before a new request with ``priority`` would start."""
+        with self._cond:
+            return self._estimate(priority)
+
+    def _estimate(self, priority: int) -> float:
+        ahead = self._ahead(priority)
+        slots = self.limits.max_concurrency
+        busy = self.running + ahead
+        concurrency_wait = 0.0 if busy < slots else ((busy - slots) // slots + 1) * self.service_sec
+        rate_wait = self.bucket.wait_for(ahead + 1) if self.bucket else 0.0
+        return max(concurrency_wait, rate_wait)
+
+    def _drop(self, ticket: object) -> None:
+        self._queue = [entry for entry in self._queue if entry[2] is not ticket]
+        heapq.heapify(self._queue)
+        self._cond.notify_all()
+
+    def _reject(self, message: str) -> SchedulerRejected:
+        self.rejected += 1
+        return SchedulerRejected(f"LLM backend '{self.name}' is busy: {message}")
+
+    @contextmanager
+    def slot(self, priority: int = PRIORITY_INTERACTIVE, deadline: Optional[float] = None) -> Iterator[float]:
+        """
+        Hold one concurrency slot for the duration of the block.
+
+        Args:
+            priority: ``PRIORITY_INTERACTIVE``, ``PRIORITY_BATCH`` or any int (lower first).
+            deadline: Longest acceptable wait in seconds; None waits indefinitely.
+
+        Yields:
+            Seconds spent waiting for the slot.
+
+        Raises:
+            SchedulerRejected: If the estimated or actual wait exceeds ``deadline``.
+        """
+        start = self.clock()
+        ticket = object()
+        with self._cond:
+            estimate = self._estimate(priority)
+            if deadline is not None and estimate > deadline:
+                raise self._reject(f"estimated wait {estimate:.1f}s exceeds {deadline:.1f}s")
+            heapq.heappush(self._queue, (priority, next(self._seq), ticket))
+            while not (self._queue[0][2] is ticket and self.running < self.limits.max_concurrency):
+                remaining = None if deadline is None else deadline - (self.clock() - start)
+                if remaining is not None and remaining <= 0:
+                    self._drop(ticket)
+                    raise self._reject(f"waited more than {deadline:.1f}s")
+                self._cond.wait(remaining)
+            heapq.heappop(self._queue)
+            self.running += 1
+            self.admitted += 1
+            rate_wait = self.bucket.reserve() if self.bucket else 0.0
+            # The next request in line may also fit in a free slot.
+            self._cond.notify_all()
+        try:
+            if rate_wait:
+                self.sleep(rate_wait)
+            waited = self.clock() - start
+            with self._cond:
+                self._waits.append(waited)
+            began = self.clock()
+            try:
+                yield waited
+            finally:
+                elapsed = self.clock() - began
+                with self._cond:
+                    self.service_sec = 0.8 * self.service_sec + 0.2 * elapsed
+        finally:
+            with self._cond:
+                self.running -= 1
+                self._cond.notify_all()
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            waits = list(self._waits)
+            return {
+                "max_concurrency": self.limits.max_concurrency,
+                "requests_per_minute": self.limits.requests_per_minute,
+                "running": self.running,
+                "queued": len(self._queue),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "wait_p50_ms": percentile(waits, 50) * 1000.0,
+                "wait_p95_ms": percentile(waits, 95) * 1000.0,
+                "wait_max_ms": max(waits, default=0.0) * 1000.0,
+                "avg_call_sec": round(self.service_sec, 3),
+            }
+
+
+class LLMScheduler:
+    """One BackendScheduler per registered backend ("openai", "ollama", "huggingface")."""
+
+    def __init__(self, limits: Dict[str, BackendLimits], default: Optional[BackendLimits] = None):
+        self.limits = limits
+        self.default = default or BackendLimits()
+        self._backends: Dict[str, BackendScheduler] = {}
+        self._lock = threading.Lock()
+
+    def backend(self, name: str) -> BackendScheduler:
+        name = name or "default"
+        with self._lock:
+            if name not in self._backends:
+                self._backends[name] = BackendScheduler(name, self.limits.get(name, self.default))
+            return self._backends[name]
+
+    def slot(
+        self, backend: str, priority: int = PRIORITY_INTERACTIVE, deadline: Optional[float] = None
+    ) -> ContextManager[float]:
+        return self.backend(backend).slot(priority=priority, deadline=deadline)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            backends = dict(self._backends)
+        return {name: scheduler.stats() for name, scheduler in sorted(backends.items())}
+
+
+def build_scheduler(settings: Settings) -> LLMScheduler:
+    return LLMScheduler(
+        {
+            "openai": BackendLimits(settings.openai_max_concurrency, settings.openai_rpm),
+            "ollama": BackendLimits(settings.ollama_max_concurrency, settings.ollama_rpm),
+            "huggingface": BackendLimits(settings.huggingface_max_concurrency, settings.huggingface_rpm),
+        }
+    )
+
+
+_shared_scheduler: Optional[LLMScheduler] = None
+_shared_lock = threading.Lock()
+
+
+def get_scheduler(settings: Settings) -> LLMScheduler:
+    """
+    Return the process-wide scheduler, creating it on first use.
+
+    Limits only hold if every caller in the process (each Streamlit session,
+    server worker and batch job) queues on the same backend slots.
+    """
+    global _shared_scheduler
+    with _shared_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = build_scheduler(settings)
+        return _shared_scheduler
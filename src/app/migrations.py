@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import argparse
+import textwrap
+import time
+from dataclasses import dataclass
+from typing import Dict, List
+
+from .config import get_settings
+from .kg_client import KGClient, get_client
+
+
+# Bumped whenever the canonical property set changes; stored on :GraphMeta.
+CANONICAL_SCHEMA_VERSION = 2
+
+
+@dataclass
+class Migration:
+    name: str
+    cypher: str
+    # Legacy aliases removed when running with drop_legacy=True.
+    drop: str = ""
+
+
+# (canonical property, raw loader property) for the Order dates.
+ORDER_DATE_FIELDS = [
+    ("purchase_date", "order_purchase_timestamp"),
+    ("delivery_date", "order_delivered_customer_date"),
+    ("estimated_delivery_date", "order_estimated_delivery_date"),
+]
+
+
+def _prefer(canonical: str, *raw: str, source_first: bool = False) -> str:
+    """Comma-separated coalesce arguments, canonical or raw first."""
+    return ", ".join([*raw, canonical] if source_first else [canonical, *raw])
+
+
+def order_dates_set(source_first: bool = False) -> str:
+    """
+    SET clause writing the canonical Date properties of ``o``.
+
+    The canonical value wins by default, so re-running the migration keeps
+    what it wrote. ``source_first`` re-reads the raw loader fields instead,
+    for orders a loader has rewritten since they were migrated.
+    """
+    assignments = []
+    for canonical, raw in ORDER_DATE_FIELDS:
+        value = f"coalesce({_prefer(f'o.{canonical}', f'o.{raw}', source_first=source_first)})"
+        assignments.append(f"o.{canonical} = CASE WHEN {value} IS NULL THEN null ELSE date({value}) END")
+    return "SET " + ",\n    ".join(assignments)
+
+
+def order_derived_set() -> str:
+    """
+    Clauses deriving ``delay_days``, ``on_time`` and ``review_score_canonical`` of ``o`` (dates must be canonical).
+
+    ``review_score_canonical`` is the average of the order's Review scores,
+    else the order's own score, like ``coalesce(r.review_score, o.review_score)``
+    in the legacy templates. It is written next to the loader's
+    ``review_score``, which stays untouched so re-deriving can fall back to it
+    and templates without a canonical variant keep their results.
+    """
+    return """OPTIONAL MATCH (r:Review)-[:REFERS_TO]->(o)
+WITH o, avg(r.review_score) AS review_avg
+SET o.delay_days = CASE
+        WHEN o.delivery_date IS NOT NULL AND o.estimated_delivery_date IS NOT NULL
+        THEN duration.inDays(o.estimated_delivery_date, o.delivery_date).days
+        ELSE o.delivery_delay_days END,
+    o.on_time = CASE
+        WHEN o.delivery_date IS NULL OR o.estimated_delivery_date IS NULL THEN null
+        ELSE o.delivery_date <= o.estimated_delivery_date END,
+    o.review_score_canonical = toFloat(coalesce(review_avg, o.review_score, o.reviewScore))"""
+
+
+def order_item_seller_set(source_first: bool = False) -> str:
+    return f"SET oi.seller_id = coalesce({_prefer('oi.seller_id', 'oi.sellerId', 'oi.seller', source_first=source_first)})"
+
+
+def _batched(variable: str, label: str, body: str) -> str:
+    """Run ``body`` for every ``label`` node, ``$batch_size`` nodes per inner transaction."""
+    return f"""
+        MATCH ({variable}:{label})
+        CALL {{
+            WITH {variable}
+{textwrap.indent(body, " " * 12)}
+        }} IN TRANSACTIONS OF $batch_size ROWS
+        """
+
+
+# Each statement is idempotent: canonical properties are listed first in every
+# coalesce, so re-running keeps the values already written.
+MIGRATIONS: List[Migration] = [
+    Migration(
+        "order_dates",
+        _batched("o", "Order", order_dates_set()),
+        drop=_batched(
+            "o",
+            "Order",
+            "REMOVE o.order_purchase_timestamp, o.order_delivered_customer_date, o.order_estimated_delivery_date",
+        ),
+    ),
+    Migration(
+        "order_derived",
+        _batched("o", "Order", order_derived_set()),
+        # Folds the alias into the loader's own score so re-deriving still sees it.
+        drop=_batched("o", "Order", "SET o.review_score = coalesce(o.review_score, o.reviewScore) REMOVE o.reviewScore"),
+    ),
+    Migration(
+        "order_item_seller",
+        _batched("oi", "OrderItem", order_item_seller_set()),
+        drop=_batched("oi", "OrderItem", "REMOVE oi.sellerId, oi.seller"),
+    ),
+]
+
+# Re-derives every canonical property of the orders in $ids (element ids) and
+# their items from the raw loader fields; used by incremental rollup refreshes.
+REDERIVE_ORDERS = f"""
+UNWIND $ids AS id
+MATCH (o:Order) WHERE elementId(o) = id
+{order_dates_set(source_first=True)}
+WITH o
+{order_derived_set()}
+WITH o
+OPTIONAL MATCH (o)-[:CONTAINS]->(oi:OrderItem)
+{order_item_seller_set(source_first=True)}
+"""
+
+
+def canonical_schema_version(client: KGClient) -> int:
+    """Canonical schema version recorded on :GraphMeta (0 when the migration never ran)."""
+    return int(client.graph_meta().get("canonical_schema") or 0)
+
+
+def migrate(client: KGClient, batch_size: int = 10000, drop_legacy: bool = False) -> Dict[str, float]:
+    """
+    Rewrite Order/OrderItem nodes to canonical, typed properties.
+
+    - Order.purchase_date / delivery_date / estimated_delivery_date as Date
+    - Order.delay_days (int), Order.on_time (bool)
+    - Order.review_score_canonical (float): average of linked Review scores, else the order's own score
+    - OrderItem.seller_id
+
+    Records the schema version on :GraphMeta so the pipeline switches to the
+    canonical template variants, and bumps the data version.
+    """
+    timings: Dict[str, float] = {}
+    for migration in MIGRATIONS:
+        start = time.perf_counter()
+        client.run_query(migration.cypher, {"batch_size": batch_size})
+        if drop_legacy and migration.drop:
+            client.run_query(migration.drop, {"batch_size": batch_size})
+        timings[migration.name] = time.perf_counter() - start
+        print(f"[{migration.name}] done in {timings[migration.name]:.1f}s")
+    client.run_query(
+        "MERGE (m:GraphMeta {key: 'graph'}) SET m.canonical_schema = $version",
+        {"version": CANONICAL_SCHEMA_VERSION},
+    )
+    client.bump_data_version()
+    return timings
+
+
+def rederive_orders(client: KGClient, order_ids: List[str], batch_size: int = 10000) -> int:
+    """
+    Re-derive the canonical properties of the given orders (element ids) and their items.
+
+    Unlike ``migrate``, raw loader fields win over canonical values already
+    written, so a rewritten delivery date or review score is picked up.
+
+    Returns:
+        Number of orders processed.
+    """
+    for i in range(0, len(order_ids), batch_size):
+        client.run_query(REDERIVE_ORDERS, {"ids": order_ids[i : i + batch_size]})
+    return len(order_ids)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Normalize coalesced properties and materialize derived fields.")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Rows per inner transaction")
+    parser.add_argument(
+        "--drop-legacy",
+        action="store_true",
+        help="Remove the legacy alias properties after copying them to the canonical names",
+    )
+    args = parser.parse_args()
+
+    client = get_client(get_settings())
+    migrate(client, batch_size=args.batch_size, drop_legacy=args.drop_legacy)
+
+
+if __name__ == "__main__":
+    main()
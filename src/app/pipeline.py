@@ -1,15 +1,29 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, asdict
-from typing import Dict, List, Optional
+import json
+import time
+from contextlib import ExitStack, contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass, asdict, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
+from .answer_cache import CachedAnswer, get_answer_cache
 from .config import get_settings
+from .context_budget import BudgetedContext, fit_context, get_counter
+from .context_format import build_context
 from .embedding import EmbeddingService
 from .entities import EntityExtractor, EntityResult
 from .intent import IntentClassifier
-from .kg_client import KGClient
-from .llm import LLMRegistry, run_llm
+from .kg_client import get_client
+from .llm import get_registry, prompt_overhead, run_llm, stream_llm
+from .llm_clients import CallTiming
+from .llm_hedge import COMPLETE, FIRST_TOKEN, Attempt, HedgedCall, get_hedger
+from .llm_scheduler import PRIORITY_BATCH, PRIORITY_INTERACTIVE, get_scheduler
+from .migrations import CANONICAL_SCHEMA_VERSION
+from .rollups import ROLLUP_SCHEMA_VERSION
 from .queries import build_query
+from .query_cache import normalize_params
+from .tracing import Span, Trace, export_spans, optional_span, payload_bytes
 
 
 @dataclass
@@ -22,6 +36,67 @@ class RetrievalResult:
     embed_rows: List[Dict[str, object]]
     embed_model_used: Optional[str] = None
     answer: Optional[str] = None
+    metrics: Dict[str, float] = field(default_factory=dict)
+    spans: List[Span] = field(default_factory=list)
+    # Rows left out of the prompt to fit the model's context: {"baseline": n, "embed": n}
+    dropped_rows: Dict[str, int] = field(default_factory=dict)
+    # Answer cache outcome: "hit", "semantic_hit", "miss", or "off" when the cache is disabled
+    cache_status: str = "off"
+    # Model key that produced the answer (the hedge model when it beat the selected one)
+    answered_by: Optional[str] = None
+    # True when the hedge model was started for this answer
+    hedged: bool = False
+
+
+@dataclass
+class RetrievalContext:
+    """Everything retrieved for a question; reusable across LLM calls."""
+    question: str
+    retrieval: str
+    intent: str
+    entities: EntityResult
+    cypher: Optional[str]
+    params: Dict[str, object]
+    baseline_rows: List[Dict[str, object]]
+    embed_rows: List[Dict[str, object]]
+    embed_model_used: Optional[str] = None
+    context: str = ""
+    retrieval_sec: float = 0.0
+    context_stats: Dict[str, int] = field(default_factory=dict)
+    trace_id: str = ""
+    spans: List[Span] = field(default_factory=list)
+
+
+class AnswerStream:
+    """
+    Iterable of answer text chunks from a streaming LLM call.
+
+    ``result`` is set once iteration completes; ``time_to_first_token_sec``
+    and ``generation_sec`` are measured from the first ``next()`` call.
+    """
+
+    def __init__(
+        self,
+        tokens: Iterator[str],
+        finish: Callable[[str, Dict[str, float]], RetrievalResult],
+    ):
+        self._tokens = tokens
+        self._finish = finish
+        self.result: Optional[RetrievalResult] = None
+
+    def __iter__(self) -> Iterator[str]:
+        start = time.perf_counter()
+        first: Optional[float] = None
+        parts: List[str] = []
+        for token in self._tokens:
+            if first is None:
+                first = time.perf_counter() - start
+            parts.append(token)
+            yield token
+        metrics = {"generation_sec": time.perf_counter() - start}
+        if first is not None:
+            metrics["time_to_first_token_sec"] = first
+        self.result = self._finish("".join(parts), metrics)
 
 
 class Pipeline:
@@ -32,99 +107,774 @@ class Pipeline:
         self.settings = get_settings()
         self.intent = IntentClassifier()
         self.entities = EntityExtractor()
-        self.llm_registry = LLMRegistry(self.settings)
+        # Shared model instances and keep-alive HTTP pools; built (and warmed up) once per process.
+        self.llm_registry = get_registry(self.settings)
+        # Shared, pooled driver; created and warmed up once per process.
+        self.client = get_client(self.settings)
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.settings.retrieval_workers, thread_name_prefix="retrieval"
+        )
+        self.llm_executor = ThreadPoolExecutor(
+            max_workers=self.settings.llm_workers, thread_name_prefix="llm"
+        )
+        self.canonical, self.rollups = self._detect_graph_features()
+        self.answer_cache = get_answer_cache(self.settings)
+        # Per-backend concurrency/rate limits shared by every LLM call in the process.
+        self.scheduler = get_scheduler(self.settings)
+        self.hedger = get_hedger(self.settings)
 
-    def run(
+    def _detect_graph_features(self) -> Tuple[bool, bool]:
+        """
+        Which template variants to use: canonical properties (``app.migrations``)
+        and rollup nodes (``app.rollups``). "auto" settings read ``:GraphMeta`` once.
+        """
+        canonical_mode = str(self.settings.canonical_fields).lower()
+        rollup_mode = str(self.settings.rollup_templates).lower()
+        meta: Dict[str, object] = {}
+        if "auto" in (canonical_mode, rollup_mode):
+            try:
+                meta = self.client.graph_meta()
+            except Exception as e:
+                print(f"Warning: could not read graph metadata, using legacy templates: {e}")
+
+        def enabled(mode: str, detected: bool) -> bool:
+            return mode in ("1", "true", "yes") or (mode == "auto" and detected)
+
+        canonical = enabled(canonical_mode, int(meta.get("canonical_schema") or 0) >= CANONICAL_SCHEMA_VERSION)
+        rollups = enabled(rollup_mode, int(meta.get("rollup_schema") or 0) >= ROLLUP_SCHEMA_VERSION)
+        return canonical, rollups
+
+    def _run_baseline(
+        self,
+        intent: str,
+        query: Dict[str, object],
+        trace: Optional[Trace] = None,
+        parent: Optional[Span] = None,
+    ) -> List[Dict[str, object]]:
+        with optional_span(trace, "baseline_query", parent=parent, intent=intent) as span:
+            rows = self.client.run_query(query["text"], query.get("params"), intent=intent)
+            span.set(rows=len(rows), bytes=payload_bytes(rows))
+        return rows
+
+    def _run_vector(
+        self,
+        question: str,
+        embed_key: str,
+        trace: Optional[Trace] = None,
+        parent: Optional[Span] = None,
+    ) -> List[Dict[str, object]]:
+        embeddings = EmbeddingService(self.settings, model_key=embed_key)
+        with optional_span(trace, "embedding_encode", parent=parent, model_key=embed_key) as span:
+            vector = embeddings.embed_query(question)
+            span.set(dims=len(vector))
+        with optional_span(trace, "vector_query", parent=parent, backend=self.settings.vector_backend) as span:
+            rows = embeddings.search_vector(self.client, vector, top_k=8)
+            span.set(rows=len(rows), bytes=payload_bytes(rows))
+        return rows
+
+    def _export(self, spans: List[Span]) -> None:
+        """Append finished spans to ``settings.trace_export_path`` when configured."""
+        path = getattr(self.settings, "trace_export_path", None)
+        if not path:
+            return
+        try:
+            export_spans(spans, path, self.settings.trace_export_format)
+        except Exception as e:
+            print(f"Warning: trace export failed: {e}")
+
+    @staticmethod
+    def _collect(
+        future: Optional[Future], deadline: float, timeout: float, label: str
+    ) -> Optional[List[Dict[str, object]]]:
+        """
+        Wait for a retrieval branch until its ``deadline`` (``time.perf_counter()``
+        at submission plus ``timeout``), so branches collected one after another
+        still time out ``timeout`` seconds after they started. Failures and
+        timeouts are logged and return None so the caller can fall back to no rows.
+
+        A branch that is already running can't be cancelled: after a timeout it
+        keeps its retrieval worker until the query or search returns.
+        """
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=max(0.0, deadline - time.perf_counter()))
+        except FutureTimeout:
+            future.cancel()
+            print(f"Warning: {label} timed out after {timeout}s")
+            return None
+        except Exception as e:
+            print(f"Warning: {label} failed: {e}")
+            return None
+
+    def retrieve(
         self,
         question: str,
         retrieval: str = "hybrid",
-        model_key: Optional[str] = None,
         embed_model_key: Optional[str] = None,
-        persona: Optional[str] = None,
-        task: Optional[str] = None,
-    ) -> RetrievalResult:
+    ) -> RetrievalContext:
         """
-        Run the full RAG pipeline.
-        
+        Classify, extract entities and run retrieval, without calling an LLM.
+
+        The returned context can be passed to ``generate`` any number of times,
+        e.g. to compare several LLMs on the same retrieved rows.
+
         Args:
             question: User's question.
             retrieval: Retrieval strategy: "baseline", "embeddings", or "hybrid".
-            model_key: LLM model key to use.
             embed_model_key: Embedding model key ("model_1", "model_2", etc.).
-            persona: Optional custom persona override.
-            task: Optional custom task override.
-            
+
         Returns:
-            RetrievalResult with retrieved context and LLM answer.
+            RetrievalContext with the retrieved rows and the assembled context text.
         """
-        intent_result = self.intent.predict(question)
-        entities = self.entities.parse(question)
-
-        query = build_query(intent_result.intent, entities)
-        baseline_rows: List[Dict[str, object]] = []
-        embed_rows: List[Dict[str, object]] = []
-        embed_model_used: Optional[str] = None
+        start = time.perf_counter()
+        trace = Trace()
+        with trace.span("retrieve", retrieval=retrieval) as root:
+            with trace.span("intent_classification") as span:
+                intent_result = self.intent.predict(question)
+                span.set(intent=intent_result.intent)
+            with trace.span("entity_extraction") as span:
+                entities = self.entities.parse(question)
+                span.set(entities=sum(v is not None for v in entities.to_params().values()))
+            with trace.span("query_build", intent=intent_result.intent) as span:
+                query = build_query(intent_result.intent, entities, canonical=self.canonical, rollups=self.rollups)
+                span.set(found=query is not None, canonical=self.canonical, rollups=self.rollups)
+            embed_model_used: Optional[str] = None
 
-        client = KGClient(self.settings)
-        try:
-            # Run baseline Cypher query if needed
+            # Baseline Cypher and embed + vector search are independent, so fan them
+            # out and wait for both: latency is max(baseline, embed + vector).
+            baseline_future: Optional[Future] = None
+            vector_future: Optional[Future] = None
+            baseline_deadline = vector_deadline = 0.0
+            embed_key = embed_model_key or "model_1"
             baseline_needed = query and (
                 retrieval in ("baseline", "hybrid")
                 or intent_result.intent in self.BASELINE_REQUIRED_INTENTS
             )
             if baseline_needed:
-                try:
-                    baseline_rows = client.run_query(query["text"], query.get("params"))
-                except Exception as e:
-                    print(f"Warning: Baseline query failed: {e}")
-                    baseline_rows = []
-            
-            # Run embedding-based retrieval if needed
+                baseline_future = self.executor.submit(
+                    self._run_baseline, intent_result.intent, query, trace, root
+                )
+                baseline_deadline = time.perf_counter() + self.settings.baseline_timeout
             if retrieval in ("embeddings", "hybrid"):
-                try:
-                    # Use specified embedding model or default to model_1
-                    embed_key = embed_model_key or "model_1"
-                    embeddings = EmbeddingService(self.settings, model_key=embed_key)
-                    embed_rows = embeddings.semantic_search(client, query=question, top_k=8)
-                    embed_model_used = embed_key
-                except Exception as e:
-                    print(f"Warning: Embedding search failed: {e}")
-                    embed_rows = []
-                    
-        finally:
-            client.close()
-
-        context_parts: List[str] = []
-        if baseline_rows:
-            context_parts.append(f"Baseline rows: {baseline_rows}")
-        if embed_rows:
-            context_parts.append(f"Embedding hits: {embed_rows}")
-        if not context_parts:
-            context_parts.append("No results found in graph.")
-        context = "\n".join(context_parts)
+                # Use specified embedding model or default to model_1
+                vector_future = self.executor.submit(self._run_vector, question, embed_key, trace, root)
+                vector_deadline = time.perf_counter() + self.settings.vector_timeout
 
-        chosen_model = model_key or next(iter(self.llm_registry.options().keys()), None)
-        model = self.llm_registry.get(chosen_model)
-        answer = run_llm(
-            model=model,
-            context=context,
-            persona=persona or self.settings.persona,
-            task=task or self.settings.default_task,
-            question=question,
-        )
+            baseline_rows = self._collect(
+                baseline_future, baseline_deadline, self.settings.baseline_timeout, "Baseline query"
+            ) or []
+            embed_rows = self._collect(
+                vector_future, vector_deadline, self.settings.vector_timeout, "Embedding search"
+            )
+            if embed_rows is not None:
+                embed_model_used = embed_key
+            embed_rows = embed_rows or []
 
-        return RetrievalResult(
-            intent=intent_result.intent,
+            with trace.span("context_assembly") as span:
+                context = self._assemble(
+                    question,
+                    retrieval,
+                    intent_result.intent,
+                    entities,
+                    query,
+                    baseline_rows,
+                    embed_rows,
+                    embed_model_used,
+                    retrieval_sec=time.perf_counter() - start,
+                )
+                span.set(
+                    baseline_rows=len(baseline_rows),
+                    embed_rows=len(embed_rows),
+                    bytes=len(context.context.encode("utf-8")),
+                    **context.context_stats,
+                )
+        context.trace_id = trace.trace_id
+        context.spans = list(trace.spans)
+        self._export(trace.spans)
+        return context
+
+    def _assemble(
+        self,
+        question: str,
+        retrieval: str,
+        intent: str,
+        entities: EntityResult,
+        query: Optional[Dict[str, object]],
+        baseline_rows: List[Dict[str, object]],
+        embed_rows: List[Dict[str, object]],
+        embed_model_used: Optional[str],
+        retrieval_sec: float = 0.0,
+    ) -> RetrievalContext:
+        context, context_stats = build_context(
+            baseline_rows,
+            embed_rows,
+            fmt=self.settings.context_format,
+            float_digits=self.settings.context_float_digits,
+        )
+        return RetrievalContext(
+            question=question,
+            retrieval=retrieval,
+            intent=intent,
             entities=entities,
             cypher=query["text"] if query else None,
             params=query.get("params") if query else {},
             baseline_rows=baseline_rows,
             embed_rows=embed_rows,
             embed_model_used=embed_model_used,
+            context=context,
+            retrieval_sec=retrieval_sec,
+            context_stats=context_stats,
+        )
+
+    def generate(
+        self,
+        context: RetrievalContext,
+        model_key: Optional[str] = None,
+        persona: Optional[str] = None,
+        task: Optional[str] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> RetrievalResult:
+        """
+        Answer a retrieved context with one LLM.
+
+        Args:
+            context: Output of ``retrieve``.
+            model_key: LLM model key to use (defaults to the first registered model).
+            persona: Optional custom persona override.
+            task: Optional custom task override.
+            priority: Scheduler priority; interactive calls are served before
+                batch calls and rejected when the backend queue is too long.
+
+        Returns:
+            RetrievalResult with retrieved context and LLM answer.
+
+        Raises:
+            SchedulerRejected: If an interactive call would wait longer than
+                ``settings.llm_queue_deadline`` for its backend.
+        """
+        start = time.perf_counter()
+        chosen_model = model_key or next(iter(self.llm_registry.options().keys()), None)
+        persona = persona or self.settings.persona
+        task = task or self.settings.default_task
+        trace = Trace(context.trace_id or None)
+        with trace.span("generate", model_key=chosen_model) as span:
+            budgeted = self._budget(context, chosen_model, persona, task, trace)
+            cached = self._cached_answer(context, chosen_model, persona, task, budgeted.context)
+            queue_wait = 0.0
+            call: Optional[HedgedCall] = None
+            hedge_model = self._hedge_model(chosen_model)
+            if cached is not None:
+                answer = cached.answer
+            elif hedge_model is not None:
+                call, attempts = self._hedged_call(
+                    context, chosen_model, hedge_model, persona, task, priority, trace, span, budgeted, COMPLETE
+                )
+                answer = "".join(call)
+                budgeted, queue_wait, connection = attempts[call.winner]
+                self._store_answer(context, call.winner, persona, task, budgeted.context, answer)
+                span.set(answered_by=call.winner, hedged=call.hedged)
+            else:
+                with self._llm_slot(chosen_model, priority, trace) as queue_wait, \
+                        self.llm_registry.timer.call() as connection:
+                    model = self.llm_registry.get(chosen_model)
+                    answer = run_llm(
+                        model=model,
+                        context=budgeted.context,
+                        persona=persona,
+                        task=task,
+                        question=context.question,
+                        max_context_tokens=None,
+                        trace=trace,
+                    )
+                self._store_answer(context, chosen_model, persona, task, budgeted.context, answer)
+            span.set(cache_status=self._cache_status(cached))
+        self._export(trace.spans)
+
+        metrics = {
+            "retrieval_sec": context.retrieval_sec,
+            "generation_sec": time.perf_counter() - start,
+        }
+        if cached is None:
+            metrics.update(self._connection_metrics(connection))
+            metrics["queue_wait_sec"] = queue_wait
+        if call is not None:
+            metrics["hedge_delay_sec"] = call.delay
+        return self._result(
+            context,
+            answer,
+            metrics,
+            trace.spans,
+            budgeted,
+            cached,
+            answered_by=call.winner if call is not None else chosen_model,
+            hedged=call is not None and call.hedged,
+        )
+
+    def generate_stream(
+        self,
+        context: RetrievalContext,
+        model_key: Optional[str] = None,
+        persona: Optional[str] = None,
+        task: Optional[str] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> AnswerStream:
+        """
+        Streaming variant of ``generate``.
+
+        Iterate the returned AnswerStream for text chunks; once it is exhausted
+        ``stream.result`` holds the RetrievalResult, with
+        ``metrics["time_to_first_token_sec"]`` recorded. The backend slot is
+        held until the stream ends.
+        """
+        chosen_model = model_key or next(iter(self.llm_registry.options().keys()), None)
+        persona = persona or self.settings.persona
+        task = task or self.settings.default_task
+        trace = Trace(context.trace_id or None)
+        budgeted: List[BudgetedContext] = []
+        cached: List[Optional[CachedAnswer]] = []
+        connections: List[CallTiming] = []
+        queue_waits: List[float] = []
+        calls: List[HedgedCall] = []
+
+        def tokens() -> Iterator[str]:
+            with trace.span("generate", model_key=chosen_model, streaming=True) as span:
+                budgeted.append(self._budget(context, chosen_model, persona, task, trace))
+                cached.append(self._cached_answer(context, chosen_model, persona, task, budgeted[0].context))
+                span.set(cache_status=self._cache_status(cached[0]))
+                if cached[0] is not None:
+                    yield cached[0].answer
+                    return
+                parts: List[str] = []
+                hedge_model = self._hedge_model(chosen_model)
+                if hedge_model is not None:
+                    call, attempts = self._hedged_call(
+                        context, chosen_model, hedge_model, persona, task, priority, trace, span,
+                        budgeted[0], FIRST_TOKEN,
+                    )
+                    calls.append(call)
+                    for chunk in call:
+                        parts.append(chunk)
+                        yield chunk
+                    budgeted[0], queue_wait, connection = attempts[call.winner]
+                    queue_waits.append(queue_wait)
+                    connections.append(connection)
+                    self._store_answer(context, call.winner, persona, task, budgeted[0].context, "".join(parts))
+                    span.set(answered_by=call.winner, hedged=call.hedged)
+                    return
+                with self._llm_slot(chosen_model, priority, trace) as queue_wait, \
+                        self.llm_registry.timer.call() as connection:
+                    queue_waits.append(queue_wait)
+                    connections.append(connection)
+                    model = self.llm_registry.get(chosen_model)
+                    for chunk in stream_llm(
+                        model=model,
+                        context=budgeted[0].context,
+                        persona=persona,
+                        task=task,
+                        question=context.question,
+                        max_context_tokens=None,
+                        trace=trace,
+                    ):
+                        parts.append(chunk)
+                        yield chunk
+                self._store_answer(context, chosen_model, persona, task, budgeted[0].context, "".join(parts))
+
+        def finish(answer: str, metrics: Dict[str, float]) -> RetrievalResult:
+            metrics["retrieval_sec"] = context.retrieval_sec
+            if connections:
+                metrics.update(self._connection_metrics(connections[0]))
+                metrics["queue_wait_sec"] = queue_waits[0]
+            if calls:
+                metrics["hedge_delay_sec"] = calls[0].delay
+            self._export(trace.spans)
+            return self._result(
+                context,
+                answer,
+                metrics,
+                trace.spans,
+                budgeted[0] if budgeted else None,
+                cached[0] if cached else None,
+                answered_by=calls[0].winner if calls else chosen_model,
+                hedged=bool(calls) and calls[0].hedged,
+            )
+
+        return AnswerStream(tokens(), finish)
+
+    def run_stream(
+        self,
+        question: str,
+        retrieval: str = "hybrid",
+        model_key: Optional[str] = None,
+        embed_model_key: Optional[str] = None,
+        persona: Optional[str] = None,
+        task: Optional[str] = None,
+    ) -> AnswerStream:
+        """Retrieve, then stream the answer (see ``generate_stream``)."""
+        context = self.retrieve(question, retrieval=retrieval, embed_model_key=embed_model_key)
+        return self.generate_stream(context, model_key=model_key, persona=persona, task=task)
+
+    def _question_embedder(self, context: RetrievalContext) -> Tuple[Optional[str], Optional[Callable[[str], List[float]]]]:
+        """(embedding model id, question -> vector) for the answer cache's semantic tier."""
+        key = context.embed_model_used or "model_1"
+        config = self.settings.get_embedding_models().get(key)
+        if config is None:
+            return None, None
+        return config.model_id, lambda question: EmbeddingService(self.settings, model_key=key).embed_query(question)
+
+    def _cached_answer(
+        self, context: RetrievalContext, model_key: str, persona: str, task: str, prompt_context: str
+    ) -> Optional[CachedAnswer]:
+        if self.answer_cache is None:
+            return None
+        embed_model, embed = self._question_embedder(context)
+        return self.answer_cache.lookup(
+            model_key, persona, task, prompt_context, context.question, embed_model=embed_model, embed=embed
+        )
+
+    def _store_answer(
+        self, context: RetrievalContext, model_key: str, persona: str, task: str, prompt_context: str, answer: str
+    ) -> None:
+        if self.answer_cache is None:
+            return
+        embed_model, embed = self._question_embedder(context)
+        self.answer_cache.store(
+            model_key, persona, task, prompt_context, context.question, answer, embed_model=embed_model, embed=embed
+        )
+
+    def _cache_status(self, cached: Optional[CachedAnswer]) -> str:
+        if self.answer_cache is None:
+            return "off"
+        return cached.status if cached is not None else "miss"
+
+    def _hedge_model(self, model_key: Optional[str]) -> Optional[str]:
+        """The registered hedge model for ``model_key``, or None when hedging does not apply."""
+        if self.hedger is None:
+            return None
+        secondary = self.hedger.policy.secondary
+        if secondary == model_key or secondary not in self.llm_registry.options():
+            return None
+        return secondary
+
+    def _hedged_call(
+        self,
+        context: RetrievalContext,
+        model_key: str,
+        hedge_model: str,
+        persona: str,
+        task: str,
+        priority: int,
+        trace: Trace,
+        parent: Span,
+        budgeted: BudgetedContext,
+        wait_for: str,
+    ) -> Tuple[HedgedCall, Dict[str, Tuple[BudgetedContext, float, CallTiming]]]:
+        """
+        Streamed attempts on ``model_key`` and ``hedge_model`` raced by the hedger.
+
+        Each attempt fits the context to its own model, takes its own backend
+        slot and runs on its own thread. The returned dict is filled with
+        ``(budgeted context, queue wait, connection timing)`` per model key as
+        the attempts start; read it for ``call.winner`` after iterating the call.
+        """
+        attempts: Dict[str, Tuple[BudgetedContext, float, CallTiming]] = {}
+
+        def attempt(key: str, role: str, fitted: Optional[BudgetedContext]) -> Attempt:
+            def chunks() -> Iterator[str]:
+                with trace.span("llm_attempt", parent=parent, model_key=key, role=role):
+                    prompt_context = fitted or self._budget(context, key, persona, task, trace)
+                    with self._llm_slot(key, priority, trace) as queue_wait, \
+                            self.llm_registry.timer.call() as connection:
+                        attempts[key] = (prompt_context, queue_wait, connection)
+                        yield from stream_llm(
+                            model=self.llm_registry.get(key),
+                            context=prompt_context.context,
+                            persona=persona,
+                            task=task,
+                            question=context.question,
+                            max_context_tokens=None,
+                            trace=trace,
+                        )
+
+            return Attempt(key, chunks)
+
+        call = self.hedger.call(
+            attempt(model_key, "primary", budgeted), attempt(hedge_model, "hedge", None), wait_for=wait_for
+        )
+        return call, attempts
+
+    @contextmanager
+    def _llm_slot(self, model_key: Optional[str], priority: int, trace: Optional[Trace] = None) -> Iterator[float]:
+        """
+        Wait for a slot on ``model_key``'s backend and hold it for the block.
+
+        Interactive calls give up after ``settings.llm_queue_deadline`` seconds
+        (0 waits indefinitely); batch calls always wait. Yields the queue wait.
+        """
+        config = self.llm_registry.options().get(model_key)
+        backend = config.backend if config else ""
+        deadline = (self.settings.llm_queue_deadline or None) if priority <= PRIORITY_INTERACTIVE else None
+        with ExitStack() as stack:
+            with optional_span(trace, "llm_queue", backend=backend, priority=priority) as span:
+                waited = stack.enter_context(self.scheduler.slot(backend, priority, deadline))
+                span.set(wait_ms=round(waited * 1000.0, 3))
+            yield waited
+
+    @staticmethod
+    def _connection_metrics(connection: CallTiming) -> Dict[str, float]:
+        """Connect (TCP + TLS) time of an LLM call; 0 when a keep-alive connection was reused."""
+        return {
+            "llm_connect_sec": connection.connect_ms / 1000.0,
+            "llm_new_connections": connection.new_connections,
+        }
+
+    def _max_context_tokens(self, model_key: Optional[str]) -> int:
+        config = self.llm_registry.options().get(model_key)
+        return config.max_context_tokens if config else 20000
+
+    def _budget(
+        self,
+        context: RetrievalContext,
+        model_key: Optional[str],
+        persona: str,
+        task: str,
+        trace: Optional[Trace] = None,
+    ) -> BudgetedContext:
+        """
+        Fit the retrieved rows into ``model_key``'s context window.
+
+        Whole rows are dropped, least relevant first, until the context plus
+        the persona/task/question prompt and the model's answer reserve fit.
+        """
+        config = self.llm_registry.options().get(model_key)
+        with optional_span(trace, "context_budget", model_key=model_key) as span:
+            budgeted = fit_context(
+                context.baseline_rows,
+                context.embed_rows,
+                get_counter(config.tokenizer if config else None),
+                max_context_tokens=self._max_context_tokens(model_key),
+                prompt_overhead=prompt_overhead(persona, task, context.question),
+                answer_tokens=config.max_answer_tokens if config else 512,
+                fmt=self.settings.context_format,
+                float_digits=self.settings.context_float_digits,
+            )
+            span.set(
+                tokens=budgeted.tokens,
+                budget=budgeted.budget,
+                exact=budgeted.exact,
+                dropped_baseline=budgeted.dropped_baseline,
+                dropped_embed=budgeted.dropped_embed,
+            )
+        return budgeted
+
+    def _result(
+        self,
+        context: RetrievalContext,
+        answer: Optional[str],
+        metrics: Dict[str, float],
+        spans: Optional[List[Span]] = None,
+        budgeted: Optional[BudgetedContext] = None,
+        cached: Optional[CachedAnswer] = None,
+        answered_by: Optional[str] = None,
+        hedged: bool = False,
+    ) -> RetrievalResult:
+        if cached is not None and cached.status == "semantic_hit":
+            metrics = {**metrics, "answer_cache_similarity": cached.similarity}
+        budget_metrics: Dict[str, float] = {}
+        dropped: Dict[str, int] = {}
+        if budgeted is not None:
+            budget_metrics = {"context_tokens": budgeted.tokens, "context_budget": budgeted.budget}
+            dropped = {"baseline": budgeted.dropped_baseline, "embed": budgeted.dropped_embed}
+        return RetrievalResult(
+            intent=context.intent,
+            entities=context.entities,
+            cypher=context.cypher,
+            params=context.params,
+            baseline_rows=context.baseline_rows,
+            embed_rows=context.embed_rows,
+            embed_model_used=context.embed_model_used,
             answer=answer,
+            metrics={**context.context_stats, **budget_metrics, **metrics},
+            spans=list(context.spans) + list(spans or []),
+            dropped_rows=dropped,
+            cache_status=self._cache_status(cached),
+            answered_by=answered_by,
+            hedged=hedged,
         )
 
+    def generate_many(
+        self,
+        context: RetrievalContext,
+        model_keys: Iterable[str],
+        persona: Optional[str] = None,
+        task: Optional[str] = None,
+    ) -> Dict[str, Union[RetrievalResult, Exception]]:
+        """
+        Answer one retrieved context with several LLMs concurrently.
+
+        Returns a dict keyed by model key, in the order given. A failing model
+        maps to its exception instead of aborting the other calls.
+        """
+        futures = {
+            key: self.llm_executor.submit(self.generate, context, key, persona, task)
+            for key in dict.fromkeys(model_keys)
+        }
+        results: Dict[str, Union[RetrievalResult, Exception]] = {}
+        for key, future in futures.items():
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                results[key] = e
+        return results
+
+    def run(
+        self,
+        question: str,
+        retrieval: str = "hybrid",
+        model_key: Optional[str] = None,
+        embed_model_key: Optional[str] = None,
+        persona: Optional[str] = None,
+        task: Optional[str] = None,
+    ) -> RetrievalResult:
+        """
+        Run the full RAG pipeline.
+        
+        Args:
+            question: User's question.
+            retrieval: Retrieval strategy: "baseline", "embeddings", or "hybrid".
+            model_key: LLM model key to use.
+            embed_model_key: Embedding model key ("model_1", "model_2", etc.).
+            persona: Optional custom persona override.
+            task: Optional custom task override.
+            
+        Returns:
+            RetrievalResult with retrieved context and LLM answer.
+        """
+        context = self.retrieve(question, retrieval=retrieval, embed_model_key=embed_model_key)
+        return self.generate(context, model_key=model_key, persona=persona, task=task)
+
+    def run_batch(
+        self,
+        questions: Sequence[str],
+        retrieval: str = "hybrid",
+        model_key: Optional[str] = None,
+        embed_model_key: Optional[str] = None,
+        persona: Optional[str] = None,
+        task: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+    ) -> List[Union[RetrievalResult, Exception]]:
+        """
+        Answer many questions at once.
+
+        Questions are classified in bulk, embedded with one ``encode`` call,
+        identical (intent, params) baseline queries run once, and LLM calls run
+        with at most ``max_concurrency`` (default ``settings.llm_workers``) in flight.
+        LLM calls are queued at batch priority, behind interactive requests.
+
+        Returns:
+            One entry per question, in input order: a RetrievalResult, or the
+            exception raised while answering that question.
+        """
+        start = time.perf_counter()
+        questions = list(questions)
+        # One trace for the shared retrieval stages; each answer adds its own
+        # generate spans under the same trace id.
+        trace = Trace()
+        with trace.span("batch.intent_classification", questions=len(questions)):
+            intents = [self.intent.predict(q).intent for q in questions]
+        with trace.span("batch.entity_extraction"):
+            entities = [self.entities.parse(q) for q in questions]
+        with trace.span("batch.query_build"):
+            queries = [
+                build_query(intent, ents, canonical=self.canonical, rollups=self.rollups)
+                for intent, ents in zip(intents, entities)
+            ]
+
+        # One baseline execution per distinct (intent, params).
+        groups: Dict[str, Tuple[Future, float]] = {}
+        group_of: List[Optional[str]] = []
+        for intent, query in zip(intents, queries):
+            needed = query and (
+                retrieval in ("baseline", "hybrid") or intent in self.BASELINE_REQUIRED_INTENTS
+            )
+            if not needed:
+                group_of.append(None)
+                continue
+            key = json.dumps([intent, normalize_params(query.get("params"))], sort_keys=True, default=str)
+            if key not in groups:
+                groups[key] = (
+                    self.executor.submit(self._run_baseline, intent, query),
+                    time.perf_counter() + self.settings.baseline_timeout,
+                )
+            group_of.append(key)
+        with trace.span("batch.baseline_query", queries=len(groups)) as span:
+            baseline_results = {
+                key: self._collect(future, deadline, self.settings.baseline_timeout, "Baseline query") or []
+                for key, (future, deadline) in groups.items()
+            }
+            span.set(rows=sum(len(rows) for rows in baseline_results.values()))
+
+        embed_rows: List[Optional[List[Dict[str, object]]]] = [None] * len(questions)
+        embed_key = embed_model_key or "model_1"
+        if retrieval in ("embeddings", "hybrid") and questions:
+            try:
+                embeddings = EmbeddingService(self.settings, model_key=embed_key)
+                with trace.span("batch.embedding_encode", model_key=embed_key):
+                    vectors = embeddings.embed_queries(questions)
+                with trace.span("batch.vector_query", backend=self.settings.vector_backend):
+                    futures = [
+                        (
+                            self.executor.submit(embeddings.search_vector, self.client, vector, 8),
+                            time.perf_counter() + self.settings.vector_timeout,
+                        )
+                        for vector in vectors
+                    ]
+                    embed_rows = [
+                        self._collect(future, deadline, self.settings.vector_timeout, "Embedding search")
+                        for future, deadline in futures
+                    ]
+            except Exception as e:
+                print(f"Warning: Batch embedding failed: {e}")
+        retrieval_sec = (time.perf_counter() - start) / max(len(questions), 1)
+
+        with trace.span("batch.context_assembly"):
+            contexts = [
+                self._assemble(
+                    question,
+                    retrieval,
+                    intent,
+                    ents,
+                    query,
+                    list(baseline_results.get(group, [])) if group else [],
+                    rows or [],
+                    embed_key if rows is not None else None,
+                    retrieval_sec=retrieval_sec,
+                )
+                for question, intent, ents, query, group, rows in zip(
+                    questions, intents, entities, queries, group_of, embed_rows
+                )
+            ]
+        for ctx in contexts:
+            ctx.trace_id = trace.trace_id
+            ctx.spans = list(trace.spans)
+        self._export(trace.spans)
+
+        results: List[Union[RetrievalResult, Exception]] = []
+        with ThreadPoolExecutor(
+            max_workers=max_concurrency or self.settings.llm_workers, thread_name_prefix="llm-batch"
+        ) as pool:
+            futures = [
+                pool.submit(self.generate, ctx, model_key, persona, task, PRIORITY_BATCH) for ctx in contexts
+            ]
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append(e)
+        return results
+
     def to_dict(self, result: RetrievalResult) -> Dict[str, object]:
         payload = asdict(result)
         payload["entities"] = result.entities.to_params()
+        payload["spans"] = [span.as_dict() for span in result.spans]
         return payload
\ No newline at end of file
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import sys
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional
+
+from .config import get_settings
+from .entities import EntityResult
+from .kg_client import KGClient, get_client
+from .queries import QUERY_LIBRARY, build_query
+
+
+# Entity bindings each template is profiled with. Bindings that specialize a
+# template to the same query text are profiled once.
+REPRESENTATIVE_ENTITIES: Dict[str, EntityResult] = {
+    "unfiltered": EntityResult(),
+    "state": EntityResult(state="SP"),
+    "category": EntityResult(category="beleza_saude"),
+    "category_state_rating": EntityResult(category="beleza_saude", state="SP", min_rating=4.0),
+    "city": EntityResult(state="SP", city="sao paulo"),
+    "date_range": EntityResult(state="RJ", start_date="2018-01-01", end_date="2018-06-30"),
+    "reliability": EntityResult(state="SP", min_reliability=0.9),
+    "product": EntityResult(product="perfume", category="perfumaria"),
+}
+
+
+@dataclass
+class ProfileSample:
+    db_hits: int
+    rows: int
+    page_cache_hits: int
+    page_cache_misses: int
+    wall_ms: float
+
+
+def sum_profile(plan: Dict[str, Any]) -> Dict[str, int]:
+    """Add up dbHits / page cache counters over a ``PROFILE`` plan tree; rows come from the root."""
+    totals = {"db_hits": 0, "page_cache_hits": 0, "page_cache_misses": 0}
+
+    def visit(node: Dict[str, Any]) -> None:
+        totals["db_hits"] += int(node.get("dbHits", 0) or 0)
+        totals["page_cache_hits"] += int(node.get("pageCacheHits", 0) or 0)
+        totals["page_cache_misses"] += int(node.get("pageCacheMisses", 0) or 0)
+        for child in node.get("children", []) or []:
+            visit(child)
+
+    if plan:
+        visit(plan)
+    totals["rows"] = int(plan.get("rows", 0) or 0) if plan else 0
+    return totals
+
+
+def recording_key(text: str, params: Dict[str, Any]) -> str:
+    payload = json.dumps([" ".join(text.split()), params], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class Neo4jRunner:
+    """Profiles against a live database (e.g. a local Neo4j container); optionally records the responses."""
+
+    def __init__(self, client: KGClient, record_path: Optional[str] = None):
+        self.client = client
+        self.record_path = record_path
+        self.recording: Dict[str, Dict[str, Any]] = {}
+
+    def profile(self, text: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        response = self.client.profile(text, params)
+        if self.record_path:
+            self.recording.setdefault(recording_key(text, params), {"responses": []})["responses"].append(response)
+        return response
+
+    def save(self) -> None:
+        if not self.record_path:
+            return
+        os.makedirs(os.path.dirname(self.record_path) or ".", exist_ok=True)
+        with open(self.record_path, "w") as f:
+            json.dump(self.recording, f, indent=2, default=str)
+
+
+class RecordedRunner:
+    """Replays responses saved by ``Neo4jRunner(record_path=...)``; no database needed."""
+
+    def __init__(self, path: str):
+        with open(path) as f:
+            self.recording: Dict[str, Dict[str, Any]] = json.load(f)
+        self._cursor: Dict[str, int] = {}
+
+    def profile(self, text: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        key = recording_key(text, params)
+        if key not in self.recording:
+            raise KeyError(f"No recorded response for query {key}; re-record against a database")
+        responses = self.recording[key]["responses"]
+        i = self._cursor.get(key, 0)
+        self._cursor[key] = i + 1
+        return responses[i % len(responses)]
+
+    def save(self) -> None:
+        pass
+
+
+def profile_library(
+    runner: Any,
+    repeat: int = 3,
+    intents: Optional[List[str]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    PROFILE every (intent, binding) pair ``repeat`` times.
+
+    Counters come from the last run (the first warms the page cache);
+    ``wall_ms`` is the median over all runs.
+
+    Returns:
+        ``{"intent/binding": ProfileSample as dict}``.
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    for intent in intents or list(QUERY_LIBRARY):
+        seen: Dict[str, str] = {}
+        for binding, entities in REPRESENTATIVE_ENTITIES.items():
+            query = build_query(intent, entities)
+            if query is None:
+                continue
+            text = query["text"]
+            if text in seen:
+                continue
+            seen[text] = binding
+            responses = [runner.profile(text, query["params"]) for _ in range(max(1, repeat))]
+            counters = sum_profile(responses[-1]["profile"])
+            sample = ProfileSample(
+                db_hits=counters["db_hits"],
+                rows=counters["rows"] or int(responses[-1].get("records", 0)),
+                page_cache_hits=counters["page_cache_hits"],
+                page_cache_misses=counters["page_cache_misses"],
+                wall_ms=statistics.median(float(r["wall_sec"]) for r in responses) * 1000.0,
+            )
+            results[f"{intent}/{binding}"] = asdict(sample)
+    return results
+
+
+def compare(
+    baseline: Dict[str, Dict[str, Any]],
+    current: Dict[str, Dict[str, Any]],
+    db_hits_threshold: float = 0.10,
+    latency_threshold: float = 0.50,
+    latency_floor_ms: float = 5.0,
+) -> List[str]:
+    """
+    Regressions of ``current`` against ``baseline``.
+
+    Db hits regress when they grow by more than ``db_hits_threshold`` (relative);
+    latency when it grows by more than ``latency_threshold`` and by more than
+    ``latency_floor_ms``, so sub-millisecond queries don't flap on noise.
+
+    Returns:
+        One message per regression; empty when everything is within thresholds.
+    """
+    regressions = []
+    for name, base in sorted(baseline.items()):
+        now = current.get(name)
+        if now is None:
+            continue
+        if now["db_hits"] > base["db_hits"] * (1 + db_hits_threshold):
+            regressions.append(f"{name}: db hits {base['db_hits']} -> {now['db_hits']}")
+        grew = now["wall_ms"] - base["wall_ms"]
+        if now["wall_ms"] > base["wall_ms"] * (1 + latency_threshold) and grew > latency_floor_ms:
+            regressions.append(f"{name}: wall {base['wall_ms']:.1f}ms -> {now['wall_ms']:.1f}ms")
+    return regressions
+
+
+def format_report(results: Dict[str, Dict[str, Any]]) -> str:
+    header = f"{'template/binding':<48} {'db hits':>10} {'rows':>7} {'pc hits':>9} {'pc miss':>8} {'wall ms':>9}"
+    lines = [header, "-" * len(header)]
+    for name, r in sorted(results.items(), key=lambda item: -item[1]["db_hits"]):
+        lines.append(
+            f"{name:<48} {r['db_hits']:>10} {r['rows']:>7} {r['page_cache_hits']:>9} "
+            f"{r['page_cache_misses']:>8} {r['wall_ms']:>9.1f}"
+        )
+    return "\n".join(lines)
+
+
+def _runner(args: argparse.Namespace) -> Any:
+    if args.replay:
+        return RecordedRunner(args.replay)
+    return Neo4jRunner(get_client(get_settings()), record_path=args.record)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="PROFILE the Cypher templates and check for cost regressions.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("run", "Profile and save a JSON baseline"), ("check", "Profile and compare with a baseline")):
+        cmd = sub.add_parser(name, help=help_text)
+        cmd.add_argument("--baseline", default="benchmarks/query_profile.json")
+        cmd.add_argument("--repeat", type=int, default=3)
+        cmd.add_argument("--intent", action="append", choices=sorted(QUERY_LIBRARY), help="Limit to these intents")
+        cmd.add_argument("--record", default=None, help="Save raw responses for later --replay")
+        cmd.add_argument("--replay", default=None, help="Use recorded responses instead of a database")
+    check = sub.choices["check"]
+    check.add_argument("--db-hits-threshold", type=float, default=0.10)
+    check.add_argument("--latency-threshold", type=float, default=0.50)
+    check.add_argument("--latency-floor-ms", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    runner = _runner(args)
+    results = profile_library(runner, repeat=args.repeat, intents=args.intent)
+    runner.save()
+    print(format_report(results))
+
+    if args.command == "run":
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({"results": results}, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(
+        baseline,
+        results,
+        db_hits_threshold=args.db_hits_threshold,
+        latency_threshold=args.latency_threshold,
+        latency_floor_ms=args.latency_floor_ms,
+    )
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+import re
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Optional
 
 from .entities import EntityResult
 
@@ -194,21 +196,292 @@ QUERY_LIBRARY: Dict[str, str] = {
 }
 
 
-def build_query(intent: str, entities: EntityResult) -> Optional[Query]:
+# Variants of QUERY_LIBRARY templates for graphs normalized by ``app.migrations``:
+# dates are typed Date properties, delay_days / on_time / review_score are
+# materialized on Order and OrderItem.seller_id is the only seller key.
+# Order.review_score_canonical is the average of the order's Review scores,
+# else its own score: the Review-first precedence the legacy templates use,
+# except legacy delivery_delay, which reads only the order's own score. The
+# loader's Order.review_score is left as is.
+# Templates without an entry here run unchanged on both layouts.
+CANONICAL_QUERY_LIBRARY: Dict[str, str] = {
+    "seller_count": """
+    MATCH (oi:OrderItem)
+    WHERE oi.seller_id IS NOT NULL
+    RETURN count(distinct oi.seller_id) AS seller_count
+    """,
+    "product_search": """
+    MATCH (p:Product)
+    OPTIONAL MATCH (oi:OrderItem)-[:REFERS_TO]->(p)
+    OPTIONAL MATCH (o:Order)-[:CONTAINS]->(oi)
+    OPTIONAL MATCH (o)<-[:PLACED]-(c:Customer)
+    WITH p, c, avg(o.review_score_canonical) AS rating
+    WHERE ($category IS NULL OR p.product_category_name CONTAINS $category OR p.category CONTAINS $category)
+      AND ($state IS NULL OR c.customer_state = $state)
+      AND ($city IS NULL OR c.customer_city IS NOT NULL AND toLower(c.customer_city) CONTAINS toLower($city))
+      AND ($min_rating IS NULL OR rating IS NOT NULL AND rating >= $min_rating)
+    RETURN p.product_id AS id, coalesce(p.name, p.product_id) AS name, p.product_category_name AS category,
+           p.price AS price, rating AS rating, c.customer_state AS customer_state, c.customer_city AS customer_city
+    ORDER BY (rating IS NULL) ASC, rating DESC, price ASC
+    LIMIT 15
+    """,
+    "delivery_delay": """
+    MATCH (o:Order)<-[:PLACED]-(c:Customer)
+    WHERE ($state IS NULL OR c.customer_state = $state)
+      AND ($start_date IS NULL OR o.purchase_date >= date($start_date))
+      AND ($end_date IS NULL OR o.purchase_date <= date($end_date))
+    WITH o, c, coalesce(o.delay_days, 0) AS delay_days
+    RETURN o.id AS order_id, c.customer_state AS state,
+           o.review_score_canonical AS review_score, delay_days,
+           CASE WHEN delay_days > 0 THEN 'late' ELSE 'on_time' END AS status
+    ORDER BY delay_days DESC
+    LIMIT 20
+    """,
+    "seller_performance": """
+    MATCH (oi:OrderItem)
+    WHERE oi.seller_id IS NOT NULL
+    OPTIONAL MATCH (o:Order)-[:CONTAINS]->(oi)
+    OPTIONAL MATCH (o)<-[:PLACED]-(c:Customer)
+    WITH oi.seller_id AS seller_id,
+         collect(distinct oi.product_id) AS products,
+         avg(coalesce(o.review_score_canonical, 0)) AS avg_score,
+         avg(CASE WHEN o.on_time THEN 1.0 ELSE 0 END) AS on_time_rate,
+         collect(distinct c.customer_state) AS states
+    WHERE ($state IS NULL OR $state IN states)
+      AND ($min_reliability IS NULL OR on_time_rate >= $min_reliability)
+    RETURN seller_id AS seller, avg_score, on_time_rate, products
+    ORDER BY on_time_rate DESC, avg_score DESC
+    LIMIT 15
+    """,
+    "recommendation": """
+    MATCH (p:Product)
+    OPTIONAL MATCH (oi:OrderItem)-[:REFERS_TO]->(p)
+    OPTIONAL MATCH (o:Order)-[:CONTAINS]->(oi)
+    OPTIONAL MATCH (o)<-[:PLACED]-(c:Customer)
+    WITH p, c, avg(o.review_score_canonical) AS rating
+    WHERE ($category IS NULL OR p.product_category_name CONTAINS $category OR p.category CONTAINS $category)
+      AND ($state IS NULL OR c.customer_state = $state)
+      AND ($min_rating IS NULL OR rating IS NOT NULL AND rating >= $min_rating)
+    RETURN p.product_id AS id, coalesce(p.name, p.product_id) AS name,
+           p.product_category_name AS category, p.price AS price, rating AS rating
+    ORDER BY rating DESC, price ASC
+    LIMIT 10
+    """,
+    "delivery_impact_rule": """
+    MATCH (p:Product)<-[:REFERS_TO]-(oi:OrderItem)
+    WHERE p.product_category_name IS NOT NULL
+    MATCH (o:Order)-[:CONTAINS]->(oi)
+    WHERE o.delay_days IS NOT NULL AND o.review_score_canonical IS NOT NULL
+    WITH p.product_category_name AS category, o.delay_days AS delay_days, o.review_score_canonical AS review_score
+    WITH category,
+         avg(delay_days) AS avg_delay,
+         avg(review_score) AS avg_score,
+         corr(delay_days, review_score) AS delay_review_corr
+    RETURN category,
+           avg_delay,
+           avg_score,
+           CASE WHEN delay_review_corr IS NaN THEN 0 ELSE delay_review_corr END AS delay_review_corr
+    ORDER BY abs(CASE WHEN delay_review_corr IS NaN THEN 0 ELSE delay_review_corr END) DESC
+    LIMIT 10
+    """,
+    "seller_reliability": """
+    MATCH (oi:OrderItem)
+    WHERE oi.seller_id IS NOT NULL
+    OPTIONAL MATCH (o:Order)-[:CONTAINS]->(oi)
+    OPTIONAL MATCH (o)<-[:PLACED]-(c:Customer)
+    WITH oi.seller_id AS seller_id,
+         avg(CASE WHEN o.on_time THEN 1.0 ELSE 0 END) AS on_time_rate,
+         avg(coalesce(o.review_score_canonical, 0)) AS avg_score,
+         collect(distinct c.customer_state) AS states
+    WHERE ($state IS NULL OR $state IN states)
+    RETURN seller_id AS seller, on_time_rate, avg_score
+    ORDER BY on_time_rate DESC, avg_score DESC
+    LIMIT 10
+    """,
+}
+
+
+# Variants that read the SellerStats / CategoryStats rollups maintained by
+# ``app.rollups`` instead of scanning orders. Partition sums are added up per
+# seller/category; results reflect the last rollup refresh.
+#
+# category_insight differs from the QUERY_LIBRARY template. Partitions are
+# built from ordered items only, so:
+# - $category is matched against product_category_name alone (not Product.category);
+# - products without orders, and products without a product_category_name, are not counted;
+# - orders/avg_score/avg_price are per ordered item, not per (item, review) row.
+ROLLUP_QUERY_LIBRARY: Dict[str, str] = {
+    "seller_performance": """
+    MATCH (s:SellerStats)
+    WITH s.seller_id AS seller_id,
+         sum(s.items) AS items,
+         sum(s.review_sum) AS review_sum,
+         sum(s.on_time_sum) AS on_time_sum,
+         collect(s.products) AS product_lists,
+         [state IN collect(distinct s.state) WHERE state <> ''] AS states
+    WITH seller_id, product_lists, states,
+         review_sum / items AS avg_score,
+         toFloat(on_time_sum) / items AS on_time_rate
+    WHERE ($state IS NULL OR $state IN states)
+      AND ($min_reliability IS NULL OR on_time_rate >= $min_reliability)
+    WITH seller_id, avg_score, on_time_rate, product_lists
+    ORDER BY on_time_rate DESC, avg_score DESC
+    LIMIT 15
+    RETURN seller_id AS seller, avg_score, on_time_rate,
+           reduce(acc = [], ps IN product_lists | acc + [pid IN ps WHERE NOT pid IN acc]) AS products
+    ORDER BY on_time_rate DESC, avg_score DESC
+    """,
+    "seller_reliability": """
+    MATCH (s:SellerStats)
+    WITH s.seller_id AS seller_id,
+         sum(s.items) AS items,
+         sum(s.review_sum) AS review_sum,
+         sum(s.on_time_sum) AS on_time_sum,
+         [state IN collect(distinct s.state) WHERE state <> ''] AS states
+    WITH seller_id, states,
+         toFloat(on_time_sum) / items AS on_time_rate,
+         review_sum / items AS avg_score
+    WHERE ($state IS NULL OR $state IN states)
+    RETURN seller_id AS seller, on_time_rate, avg_score
+    ORDER BY on_time_rate DESC, avg_score DESC
+    LIMIT 10
+    """,
+    "category_insight": """
+    MATCH (s:CategoryStats)
+    WHERE ($category IS NULL OR s.category CONTAINS $category)
+    WITH s.category AS category,
+         sum(s.items) AS orders,
+         sum(s.review_sum) AS review_sum,
+         sum(s.price_sum) AS price_sum,
+         sum(s.price_count) AS price_count,
+         collect(s.products) AS product_lists
+    WITH category, orders, product_lists,
+         review_sum / orders AS avg_score,
+         CASE WHEN price_count > 0 THEN price_sum / price_count END AS avg_price
+    ORDER BY orders DESC
+    LIMIT 10
+    RETURN category,
+           size(reduce(acc = [], ps IN product_lists | acc + [pid IN ps WHERE NOT pid IN acc])) AS products,
+           orders, avg_score, avg_price
+    ORDER BY orders DESC
+    """,
+    "delivery_impact_rule": """
+    MATCH (s:CategoryStats)
+    WITH s.category AS category,
+         sum(s.pair_n) AS n,
+         sum(s.delay_sum) AS sx,
+         sum(s.review_pair_sum) AS sy,
+         sum(s.delay_sq_sum) AS sxx,
+         sum(s.review_sq_sum) AS syy,
+         sum(s.cross_sum) AS sxy
+    WHERE n > 0
+    WITH category, sx / n AS avg_delay, sy / n AS avg_score,
+         n * sxy - sx * sy AS cov,
+         (n * sxx - sx * sx) * (n * syy - sy * sy) AS var_product
+    WITH category, avg_delay, avg_score,
+         CASE WHEN var_product > 0 THEN cov / sqrt(var_product) ELSE 0 END AS delay_review_corr
+    RETURN category, avg_delay, avg_score, delay_review_corr
+    ORDER BY abs(delay_review_corr) DESC
+    LIMIT 10
+    """,
+}
+
+
+# "($param IS NULL OR <predicate>)" catch-all filters.
+_NULL_GUARD = re.compile(r"\(\s*\$(\w+)\s+IS\s+NULL\s+OR\s+")
+
+
+def _closing_paren(text: str, start: int) -> int:
+    """Index of the parenthesis closing the one at ``start`` (string literals skipped)."""
+    depth = 0
+    quote: Optional[str] = None
+    for i in range(start, len(text)):
+        ch = text[i]
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in ("'", '"'):
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+    raise ValueError(f"Unbalanced parentheses in template at offset {start}")
+
+
+@lru_cache(maxsize=512)
+def specialize_template(template: str, present: FrozenSet[str]) -> str:
+    """
+    Rewrite catch-all filters for a known set of non-null parameters.
+
+    ``($p IS NULL OR <predicate>)`` becomes ``(<predicate>)`` when ``p`` is in
+    ``present`` and is dropped otherwise, so the planner sees only the filters
+    that apply and can use indexes for them. The output depends only on which
+    guarded parameters are present, so a template with k guards yields at most
+    2**k distinct query strings and the server plan cache keeps hitting.
+
+    Args:
+        template: Cypher template text.
+        present: Names of the parameters whose value is not null.
+
+    Returns:
+        The specialized Cypher text.
+    """
+    parts = []
+    pos = 0
+    for match in _NULL_GUARD.finditer(template):
+        if match.start() < pos:
+            continue
+        end = _closing_paren(template, match.start())
+        parts.append(template[pos:match.start()])
+        if match.group(1) in present:
+            parts.append("(" + template[match.end():end].strip() + ")")
+        else:
+            parts.append("true")
+        pos = end + 1
+    parts.append(template[pos:])
+    text = "".join(parts)
+    # Drop the always-true clauses left behind by absent parameters.
+    text = re.sub(r"\s+AND\s+true\b", "", text)
+    text = re.sub(r"\bWHERE\s+true\s+AND\s+", "WHERE ", text)
+    text = re.sub(r"\n[ \t]*WHERE\s+true[ \t]*(?=\n)", "", text)
+    return text
+
+
+def build_query(
+    intent: str,
+    entities: EntityResult,
+    canonical: bool = False,
+    rollups: bool = False,
+    specialize: bool = True,
+) -> Optional[Query]:
     """
     Build a Cypher query from an intent and extracted entities.
     
     Args:
         intent: The classified intent (should match a key in QUERY_LIBRARY).
         entities: Extracted entities from the user's question.
+        canonical: Prefer the CANONICAL_QUERY_LIBRARY variant (graph has been migrated).
+        rollups: Prefer the ROLLUP_QUERY_LIBRARY variant (rollup nodes have been built).
+        specialize: Drop/unwrap "$param IS NULL OR ..." filters for the entities
+            that are set (see ``specialize_template``); False returns the generic text.
         
     Returns:
         A dict with 'text' (Cypher) and 'params' (parameter dict), or None if intent not found.
     """
     template = QUERY_LIBRARY.get(intent)
+    if canonical:
+        template = CANONICAL_QUERY_LIBRARY.get(intent, template)
+    if rollups:
+        template = ROLLUP_QUERY_LIBRARY.get(intent, template)
     if not template:
         return None
     params = entities.to_params()
+    if specialize:
+        present = frozenset(name for name, value in params.items() if value is not None)
+        template = specialize_template(template, present)
     return {"text": template, "params": params}
 
 
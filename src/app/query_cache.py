@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import asyncio
+import copy
+import datetime
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from neo4j.time import Date, DateTime, Duration, Time
+
+from .cache import LRUCache, SQLiteStore, TieredCache
+from .config import Settings
+
+
+Rows = List[Dict[str, Any]]
+
+# Marks a temporal value encoded for the SQLite tier.
+_TEMPORAL = "__temporal__"
+
+# (tag, type, parser) in isinstance order: datetime.datetime subclasses datetime.date.
+_ISO_TYPES = [
+    ("DateTime", DateTime, DateTime.from_iso_format),
+    ("Date", Date, Date.from_iso_format),
+    ("Time", Time, Time.from_iso_format),
+    ("datetime", datetime.datetime, datetime.datetime.fromisoformat),
+    ("date", datetime.date, datetime.date.fromisoformat),
+    ("time", datetime.time, datetime.time.fromisoformat),
+]
+
+
+def encode_value(value: Any) -> Any:
+    """
+    JSON-ready copy of a result value: temporal values become tagged objects.
+
+    Neo4j ``Date``/``DateTime``/``Time``/``Duration`` (and the ``datetime``
+    types) then come back from a disk hit as the same types a memory hit or
+    a fresh query returns. Named time zones are kept as their UTC offset.
+    Lists and dicts are walked; other values are left to ``json.dumps``.
+    """
+    # Duration is a tuple, so it must be matched before lists/tuples.
+    if isinstance(value, Duration):
+        return {
+            _TEMPORAL: "Duration",
+            "months": value.months,
+            "days": value.days,
+            "seconds": value.seconds,
+            "nanoseconds": value.nanoseconds,
+        }
+    for tag, kind, _ in _ISO_TYPES:
+        if isinstance(value, kind):
+            iso = value.iso_format() if hasattr(value, "iso_format") else value.isoformat()
+            return {_TEMPORAL: tag, "iso": iso}
+    if isinstance(value, dict):
+        return {key: encode_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_value(item) for item in value]
+    return value
+
+
+def decode_value(obj: Dict[str, Any]) -> Any:
+    """``json.loads`` object hook reversing ``encode_value``."""
+    tag = obj.get(_TEMPORAL)
+    if tag is None:
+        return obj
+    if tag == "Duration":
+        return Duration(months=obj["months"], days=obj["days"], seconds=obj["seconds"], nanoseconds=obj["nanoseconds"])
+    parsers = {name: parse for name, _, parse in _ISO_TYPES}
+    return parsers[tag](obj["iso"])
+
+
+def normalize_params(params: Dict[str, Any] | None) -> Dict[str, Any]:
+    """Canonical form of bound parameters so equivalent questions share a cache key."""
+    normalized: Dict[str, Any] = {}
+    for key, value in sorted((params or {}).items()):
+        if isinstance(value, str):
+            value = value.strip()
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = float(value)
+        normalized[key] = value
+    return normalized
+
+
+class QueryCache:
+    """
+    Result cache for QUERY_LIBRARY templates.
+
+    Entries are keyed on (intent, normalized params, database, data version)
+    plus a digest of the query text, so specialized variants of one intent
+    never collide. Bumping the graph data version (``:GraphMeta`` node, see
+    ``KGClient.bump_data_version``) makes every older entry unreachable.
+
+    Callers get their own copy of the rows, so mutating a result never
+    changes what later requests see.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 512,
+        ttl: Optional[float] = 600.0,
+        path: Optional[str] = None,
+        version_loader: Optional[Callable[[], int]] = None,
+        version_check_interval: float = 30.0,
+    ):
+        disk = (
+            SQLiteStore(path, table="query_cache", encode=encode_value, object_hook=decode_value)
+            if path
+            else None
+        )
+        self.store = TieredCache(LRUCache(maxsize=maxsize, ttl=ttl), disk)
+        self.version_loader = version_loader
+        self.version_check_interval = version_check_interval
+        self._data_version = 0
+        self._last_version_check: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self):
+        return self.store.stats
+
+    @property
+    def data_version(self) -> int:
+        self._refresh_version()
+        return self._data_version
+
+    def _version_check_due(self) -> bool:
+        with self._lock:
+            return self.version_loader is not None and (
+                self._last_version_check is None
+                or time.monotonic() - self._last_version_check >= self.version_check_interval
+            )
+
+    def _refresh_version(self) -> None:
+        if self.version_loader is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if (
+                self._last_version_check is not None
+                and now - self._last_version_check < self.version_check_interval
+            ):
+                return
+            self._last_version_check = now
+        try:
+            version = int(self.version_loader() or 0)
+        except Exception as e:
+            print(f"Warning: could not read graph data version: {e}")
+            return
+        if version != self._data_version:
+            self.invalidate(version)
+
+    def invalidate(self, version: Optional[int] = None) -> None:
+        """Move to a new data version (default: current + 1) and drop in-memory entries."""
+        with self._lock:
+            self._data_version = self._data_version + 1 if version is None else version
+        self.store.memory.clear()
+
+    def key(self, intent: str, query: str, params: Dict[str, Any] | None, database: str) -> str:
+        payload = json.dumps(
+            {
+                "intent": intent,
+                "params": normalize_params(params),
+                "database": database,
+                "version": self.data_version,
+                "query": hashlib.sha1(query.encode("utf-8")).hexdigest(),
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_or_run(
+        self,
+        intent: str,
+        query: str,
+        params: Dict[str, Any] | None,
+        database: str,
+        runner: Callable[[], Rows],
+    ) -> Rows:
+        key = self.key(intent, query, params, database)
+        rows = self.store.get(key)
+        if rows is not None:
+            return copy.deepcopy(rows)
+        rows = runner()
+        self.store.set(key, copy.deepcopy(rows))
+        return rows
+
+    async def aget_or_run(
+        self,
+        intent: str,
+        query: str,
+        params: Dict[str, Any] | None,
+        database: str,
+        runner: Callable[[], Awaitable[Rows]],
+    ) -> Rows:
+        """``get_or_run`` for a coroutine ``runner``; the periodic data-version read runs on a worker thread."""
+        if self._version_check_due():
+            await asyncio.get_running_loop().run_in_executor(None, self._refresh_version)
+        key = self.key(intent, query, params, database)
+        rows = self.store.get(key)
+        if rows is not None:
+            return copy.deepcopy(rows)
+        rows = await runner()
+        self.store.set(key, copy.deepcopy(rows))
+        return rows
+
+
+def build_query_cache(
+    settings: Settings, version_loader: Optional[Callable[[], int]] = None
+) -> Optional[QueryCache]:
+    if not settings.query_cache_enabled:
+        return None
+    return QueryCache(
+        maxsize=settings.query_cache_size,
+        ttl=settings.query_cache_ttl or None,
+        path=settings.query_cache_path or None,
+        version_loader=version_loader,
+        version_check_interval=settings.query_cache_version_check,
+    )
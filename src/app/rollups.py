@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import argparse
+import time
+import uuid
+from datetime import date
+from typing import Dict, List, Optional
+
+from .config import get_settings
+from .kg_client import KGClient, get_client
+from .migrations import CANONICAL_SCHEMA_VERSION, canonical_schema_version, rederive_orders
+
+
+# Bumped whenever the rollup node layout changes; stored on :GraphMeta.
+ROLLUP_SCHEMA_VERSION = 1
+
+# Orders, order items and reviews stamped (``updated_at = timestamp()``, epoch ms)
+# this long before the last refresh started are read again, for write
+# transactions that were still open when it ran.
+WATERMARK_OVERLAP_MS = 60_000
+
+# Partition key for orders without a purchase date.
+UNKNOWN_MONTH = "unknown"
+
+ROLLUP_INDEXES = [
+    "CREATE INDEX seller_stats_key IF NOT EXISTS FOR (s:SellerStats) ON (s.seller_id, s.state, s.month)",
+    "CREATE INDEX seller_stats_month IF NOT EXISTS FOR (s:SellerStats) ON (s.month)",
+    "CREATE INDEX category_stats_key IF NOT EXISTS FOR (s:CategoryStats) ON (s.category, s.state, s.month)",
+    "CREATE INDEX category_stats_month IF NOT EXISTS FOR (s:CategoryStats) ON (s.month)",
+    "CREATE INDEX order_purchase_date IF NOT EXISTS FOR (o:Order) ON (o.purchase_date)",
+    "CREATE INDEX order_updated_at IF NOT EXISTS FOR (o:Order) ON (o.updated_at)",
+    "CREATE INDEX order_item_updated_at IF NOT EXISTS FOR (oi:OrderItem) ON (oi.updated_at)",
+    "CREATE INDEX review_updated_at IF NOT EXISTS FOR (r:Review) ON (r.updated_at)",
+]
+
+# Partition month of ``o``.
+ORDER_MONTH = """CASE WHEN o.purchase_date IS NULL THEN $unknown
+     ELSE toString(o.purchase_date.year) + '-' + right('0' + toString(o.purchase_date.month), 2) END"""
+
+MONTH_FILTER = "o.purchase_date >= date($start) AND o.purchase_date < date($end)"
+UNKNOWN_FILTER = "o.purchase_date IS NULL"
+
+# Partitions are (seller, customer state, purchase month). Sums, not averages,
+# are stored so partitions can be added up at query time.
+SELLER_ROLLUP = """
+MATCH (o:Order)
+WHERE {filter}
+MATCH (o)-[:CONTAINS]->(oi:OrderItem)
+WHERE oi.seller_id IS NOT NULL
+OPTIONAL MATCH (o)<-[:PLACED]-(c:Customer)
+WITH oi.seller_id AS seller_id, coalesce(c.customer_state, '') AS state,
+     count(*) AS items,
+     sum(toFloat(coalesce(o.review_score_canonical, 0))) AS review_sum,
+     sum(CASE WHEN o.on_time THEN 1 ELSE 0 END) AS on_time_sum,
+     collect(distinct oi.product_id) AS products
+MERGE (s:SellerStats {seller_id: seller_id, state: state, month: $month})
+SET s.items = items, s.review_sum = review_sum, s.on_time_sum = on_time_sum,
+    s.products = products, s.refresh_id = $refresh_id
+"""
+
+# Besides plain sums, keeps the moments of (delay_days, review_score) pairs so
+# the Pearson correlation can be recomputed from any set of partitions.
+CATEGORY_ROLLUP = """
+MATCH (o:Order)
+WHERE {filter}
+MATCH (o)-[:CONTAINS]->(oi:OrderItem)-[:REFERS_TO]->(p:Product)
+WHERE p.product_category_name IS NOT NULL
+OPTIONAL MATCH (o)<-[:PLACED]-(c:Customer)
+WITH p, oi, o, coalesce(c.customer_state, '') AS state,
+     CASE WHEN o.delay_days IS NOT NULL AND o.review_score_canonical IS NOT NULL
+          THEN toFloat(o.delay_days) END AS x,
+     CASE WHEN o.delay_days IS NOT NULL AND o.review_score_canonical IS NOT NULL
+          THEN toFloat(o.review_score_canonical) END AS y
+WITH p.product_category_name AS category, state,
+     count(*) AS items,
+     collect(distinct p.product_id) AS products,
+     sum(toFloat(coalesce(o.review_score_canonical, 0))) AS review_sum,
+     sum(toFloat(coalesce(oi.price, p.price, 0))) AS price_sum,
+     count(coalesce(oi.price, p.price)) AS price_count,
+     count(x) AS pair_n,
+     sum(coalesce(x, 0.0)) AS delay_sum,
+     sum(coalesce(y, 0.0)) AS review_pair_sum,
+     sum(coalesce(x * x, 0.0)) AS delay_sq_sum,
+     sum(coalesce(y * y, 0.0)) AS review_sq_sum,
+     sum(coalesce(x * y, 0.0)) AS cross_sum
+MERGE (s:CategoryStats {category: category, state: state, month: $month})
+SET s.items = items, s.products = products, s.review_sum = review_sum,
+    s.price_sum = price_sum, s.price_count = price_count,
+    s.pair_n = pair_n, s.delay_sum = delay_sum, s.review_pair_sum = review_pair_sum,
+    s.delay_sq_sum = delay_sq_sum, s.review_sq_sum = review_sq_sum, s.cross_sum = cross_sum,
+    s.refresh_id = $refresh_id
+"""
+
+# Partitions of a rebuilt month that no longer have any orders.
+DELETE_STALE = """
+MATCH (s:{label} {{month: $month}})
+WHERE s.refresh_id <> $refresh_id
+DETACH DELETE s
+"""
+
+
+def month_range(month: str) -> Dict[str, Optional[str]]:
+    """``"2018-02"`` -> ``{"start": "2018-02-01", "end": "2018-03-01"}``."""
+    if month == UNKNOWN_MONTH:
+        return {"start": None, "end": None}
+    year, mon = (int(part) for part in month.split("-"))
+    start = date(year, mon, 1)
+    end = date(year + mon // 12, mon % 12 + 1, 1)
+    return {"start": start.isoformat(), "end": end.isoformat()}
+
+
+class RollupRefresher:
+    """
+    Maintain ``SellerStats`` / ``CategoryStats`` rollup nodes.
+
+    Partitions are keyed by (seller or category, customer state, purchase
+    month). A refresh rebuilds only the months of orders written since the
+    stored watermark: orders whose own ``updated_at`` stamp, or that of one
+    of their order items or reviews, is newer. That catches late reviews,
+    delivery dates and late-loaded rows of old orders, not only new
+    purchases. Their canonical properties are re-derived first. Loaders
+    must stamp ``updated_at = timestamp()`` on the nodes they write; the
+    first refresh (and ``--full``) rebuilds every month and requires
+    ``app.migrations``.
+    """
+
+    def __init__(self, client: KGClient):
+        self.client = client
+
+    def ensure_schema(self) -> None:
+        for statement in ROLLUP_INDEXES:
+            self.client.run_query(statement)
+
+    def watermark(self) -> Optional[int]:
+        """Database time (epoch ms) the last refresh started at."""
+        value = self.client.graph_meta().get("rollup_watermark_ms")
+        return int(value) if value is not None else None
+
+    def all_months(self) -> List[str]:
+        rows = self.client.run_query(
+            f"""
+            MATCH (o:Order)
+            WITH DISTINCT {ORDER_MONTH} AS month
+            RETURN month ORDER BY month
+            """,
+            {"unknown": UNKNOWN_MONTH},
+        )
+        return [row["month"] for row in rows]
+
+    def touched_orders(self, since: int) -> Dict[str, str]:
+        """``{order element id: current partition month}`` of orders written at or after ``since`` (epoch ms)."""
+        rows = self.client.run_query(
+            f"""
+            CALL {{
+                MATCH (o:Order) WHERE o.updated_at >= $since RETURN o
+                UNION
+                MATCH (o:Order)-[:CONTAINS]->(oi:OrderItem) WHERE oi.updated_at >= $since RETURN o
+                UNION
+                MATCH (r:Review)-[:REFERS_TO]->(o:Order) WHERE r.updated_at >= $since RETURN o
+            }}
+            RETURN elementId(o) AS id, {ORDER_MONTH} AS month
+            """,
+            {"since": since, "unknown": UNKNOWN_MONTH},
+        )
+        return {row["id"]: row["month"] for row in rows}
+
+    def order_months(self, order_ids: List[str]) -> List[str]:
+        rows = self.client.run_query(
+            f"""
+            MATCH (o:Order) WHERE elementId(o) IN $ids
+            WITH DISTINCT {ORDER_MONTH} AS month
+            RETURN month ORDER BY month
+            """,
+            {"ids": order_ids, "unknown": UNKNOWN_MONTH},
+        )
+        return [row["month"] for row in rows]
+
+    def touched_months(self, since: int) -> List[str]:
+        """
+        Re-derive the orders written since ``since`` and return the months to rebuild.
+
+        Both the month an order was in and the month it is in after
+        re-deriving are returned, so an order whose purchase date moved is
+        removed from its old partition.
+        """
+        orders = self.touched_orders(since)
+        if not orders:
+            return []
+        ids = list(orders)
+        rederive_orders(self.client, ids)
+        print(f"[rollups] {len(ids)} touched order(s) re-derived")
+        return sorted(set(orders.values()) | set(self.order_months(ids)))
+
+    def rebuild_month(self, month: str) -> None:
+        refresh_id = uuid.uuid4().hex
+        params = {"month": month, "refresh_id": refresh_id, **month_range(month)}
+        where = UNKNOWN_FILTER if month == UNKNOWN_MONTH else MONTH_FILTER
+        for label, template in (("SellerStats", SELLER_ROLLUP), ("CategoryStats", CATEGORY_ROLLUP)):
+            self.client.run_query(template.replace("{filter}", where), params)
+            self.client.run_query(DELETE_STALE.format(label=label), {"month": month, "refresh_id": refresh_id})
+
+    def refresh(self, full: bool = False) -> Dict[str, float]:
+        """
+        Rebuild touched (or, with ``full`` / no watermark yet, all) month partitions.
+
+        Returns:
+            Dict with the number of months rebuilt and elapsed seconds.
+        """
+        if canonical_schema_version(self.client) < CANONICAL_SCHEMA_VERSION:
+            raise RuntimeError("Rollups read canonical properties; run `python -m app.migrations` first")
+        start = time.perf_counter()
+        # Taken before reading, so writes made during the refresh are read again next time.
+        started_ms = self.client.run_query("RETURN timestamp() AS now")[0]["now"]
+        since = None if full else self.watermark()
+        months = self.all_months() if since is None else self.touched_months(since - WATERMARK_OVERLAP_MS)
+        for month in months:
+            self.rebuild_month(month)
+            print(f"[rollups] {month} rebuilt")
+        self.client.run_query(
+            """
+            MERGE (m:GraphMeta {key: 'graph'})
+            SET m.rollup_schema = $version, m.rollup_watermark_ms = $watermark
+            """,
+            {"version": ROLLUP_SCHEMA_VERSION, "watermark": started_ms},
+        )
+        if months:
+            self.client.bump_data_version()
+        elapsed = time.perf_counter() - start
+        print(f"[rollups] {len(months)} month(s) rebuilt in {elapsed:.1f}s, watermark {started_ms}")
+        return {"months": len(months), "seconds": elapsed}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Refresh the SellerStats/CategoryStats rollup nodes.")
+    parser.add_argument("--full", action="store_true", help="Rebuild every month, ignoring the watermark")
+    parser.add_argument("--skip-schema", action="store_true", help="Don't create the rollup indexes")
+    args = parser.parse_args()
+
+    refresher = RollupRefresher(get_client(get_settings()))
+    if not args.skip_schema:
+        refresher.ensure_schema()
+    refresher.refresh(full=args.full)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,532 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from .config import get_settings
+from .llm_scheduler import SchedulerRejected
+from .pipeline import Pipeline, RetrievalResult
+from .tracing import LatencyRecorder, get_recorder
+
+RETRIEVAL_MODES = ("baseline", "embeddings", "hybrid")
+# Largest accepted request body (bytes).
+MAX_BODY_BYTES = 64 * 1024
+
+
+class BadRequest(ValueError):
+    """Invalid request body; answered with 400."""
+
+
+@dataclass
+class AskRequest:
+    question: str
+    retrieval: str = "hybrid"
+    model_key: Optional[str] = None
+    embed_model_key: Optional[str] = None
+    persona: Optional[str] = None
+    task: Optional[str] = None
+
+    @classmethod
+    def from_json(cls, payload: Any, pipeline: Pipeline) -> "AskRequest":
+        """Validate a decoded request body against the pipeline's models."""
+        if not isinstance(payload, dict):
+            raise BadRequest("request body must be a JSON object")
+        question = payload.get("question")
+        if not isinstance(question, str) or not question.strip():
+            raise BadRequest("'question' is required")
+        retrieval = payload.get("retrieval", "hybrid")
+        if retrieval not in RETRIEVAL_MODES:
+            raise BadRequest(f"'retrieval' must be one of {', '.join(RETRIEVAL_MODES)}")
+        for name in ("model", "embed_model", "persona", "task"):
+            if payload.get(name) is not None and not isinstance(payload[name], str):
+                raise BadRequest(f"'{name}' must be a string")
+        model_key = payload.get("model")
+        if model_key is not None and model_key not in pipeline.llm_registry.options():
+            raise BadRequest(f"unknown model '{model_key}'")
+        embed_model_key = payload.get("embed_model")
+        if embed_model_key is not None and embed_model_key not in pipeline.settings.get_embedding_models():
+            raise BadRequest(f"unknown embedding model '{embed_model_key}'")
+        return cls(
+            question=question.strip(),
+            retrieval=retrieval,
+            model_key=model_key,
+            embed_model_key=embed_model_key,
+            persona=payload.get("persona"),
+            task=payload.get("task"),
+        )
+
+    def key(self) -> str:
+        """Coalescing key: requests with equal keys get the same answer."""
+        return json.dumps(
+            [self.question, self.retrieval, self.model_key, self.embed_model_key, self.persona, self.task]
+        )
+
+    def kwargs(self) -> Dict[str, Any]:
+        return {
+            "question": self.question,
+            "retrieval": self.retrieval,
+            "model_key": self.model_key,
+            "embed_model_key": self.embed_model_key,
+            "persona": self.persona,
+            "task": self.task,
+        }
+
+
+class _Flight:
+    """One in-flight execution and its outcome."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SharedStream:
+    """
+    Chunks of one streaming execution, replayable by any number of readers.
+
+    Every reader starts from the first chunk, so a request that joins late
+    still receives the whole answer.
+    """
+
+    def __init__(self) -> None:
+        self.chunks: List[str] = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.result: Optional[RetrievalResult] = None
+        self._cond = threading.Condition()
+
+    def publish(self, chunk: str) -> None:
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, result: Optional[RetrievalResult]) -> None:
+        with self._cond:
+            self.result = result
+            self.finished = True
+            self._cond.notify_all()
+
+    def fail(self, error: BaseException) -> None:
+        with self._cond:
+            self.error = error
+            self.finished = True
+            self._cond.notify_all()
+
+    def __iter__(self) -> Iterator[str]:
+        index = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: index < len(self.chunks) or self.finished)
+                if index < len(self.chunks):
+                    chunk = self.chunks[index]
+                elif self.error is not None:
+                    raise self.error
+                else:
+                    return
+            index += 1
+            yield chunk
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+
+    Only in-flight work is shared: once an execution finishes, the next call
+    with its key runs again (repeat answers are the answer cache's job).
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[str, _Flight] = {}
+        self._streams: Dict[str, SharedStream] = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run ``fn`` unless a call with ``key`` is already running, then wait for that one.
+
+        Returns:
+            (value, shared): ``shared`` is True when another caller's execution was reused.
+            An error raised by the execution is raised to every caller.
+        """
+        with self._lock:
+            flight = self._calls.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._calls[key] = _Flight()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, True
+        try:
+            flight.value = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            flight.done.set()
+        return flight.value, False
+
+    def stream(
+        self, key: str, produce: Callable[[SharedStream], None], executor: ThreadPoolExecutor
+    ) -> Tuple[SharedStream, bool]:
+        """
+        Join the stream running under ``key``, or start ``produce`` on ``executor``.
+
+        The producer runs apart from any reader, so a client disconnecting
+        does not cut the answer short for the others.
+
+        Returns:
+            (stream, shared): ``shared`` is True when joining an existing stream.
+        """
+        with self._lock:
+            stream = self._streams.get(key)
+            if stream is not None:
+                self.coalesced += 1
+                return stream, True
+            stream = self._streams[key] = SharedStream()
+            self.executions += 1
+
+        def run() -> None:
+            try:
+                produce(stream)
+            except BaseException as e:
+                stream.fail(e)
+            finally:
+                with self._lock:
+                    del self._streams[key]
+
+        try:
+            executor.submit(run)
+        except BaseException as e:
+            with self._lock:
+                del self._streams[key]
+            stream.fail(e)
+        return stream, False
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls) + len(self._streams),
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+            }
+
+
+@dataclass
+class ServerMetrics:
+    """Request counts by route and status, in-flight gauge, and per-route latency."""
+    latency: LatencyRecorder = field(default_factory=lambda: LatencyRecorder(maxlen=4096))
+    started: float = field(default_factory=time.time)
+    in_flight: int = 0
+    responses: Dict[str, int] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def begin(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def end(self, route: str, status: int, duration_sec: float) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            label = f"{route} {status}"
+            self.responses[label] = self.responses.get(label, 0) + 1
+        self.latency.observe(route, duration_sec * 1000.0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            payload: Dict[str, Any] = {
+                "uptime_sec": round(time.time() - self.started, 1),
+                "in_flight": self.in_flight,
+                "responses": dict(sorted(self.responses.items())),
+            }
+        payload["latency_ms"] = self.latency.summary()
+        return payload
+
+
+class AnswerHandler(BaseHTTPRequestHandler):
+    """
+    Routes:
+        POST /v1/answer         JSON body -> result JSON (``pipeline.to_dict`` + "coalesced")
+        POST /v1/answer/stream  JSON body -> NDJSON: {"token": ...} lines, then {"done": true, "result": ...}
+        GET  /health            liveness; ``?deep=1`` also checks Neo4j connectivity
+        GET  /metrics           request latency percentiles, stage latencies, scheduler/cache stats
+    """
+
+    protocol_version = "HTTP/1.1"
+    server_version = "GraphRAG"
+    # Idle keep-alive connections give their worker back after this many seconds.
+    timeout = 30
+
+    @property
+    def app(self) -> "AnswerServer":
+        return self.server.app  # type: ignore[attr-defined]
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.app.access_log:
+            super().log_message(format, *args)
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        if url.path == "/health":
+            self._timed("GET /health", lambda: self._health(parse_qs(url.query)))
+        elif url.path == "/metrics":
+            self._timed("GET /metrics", lambda: self._send_json(HTTPStatus.OK, self.app.metrics_payload()))
+        else:
+            self._send_error(HTTPStatus.NOT_FOUND, f"no route for GET {url.path}")
+
+    def do_POST(self) -> None:
+        path = urlparse(self.path).path
+        if path == "/v1/answer":
+            self._timed("POST /v1/answer", self._answer)
+        elif path == "/v1/answer/stream":
+            self._timed("POST /v1/answer/stream", self._answer_stream)
+        else:
+            self.close_connection = True
+            self._send_error(HTTPStatus.NOT_FOUND, f"no route for POST {path}")
+
+    def _timed(self, route: str, handle: Callable[[], int]) -> None:
+        metrics = self.app.metrics
+        metrics.begin()
+        start = time.perf_counter()
+        status = HTTPStatus.INTERNAL_SERVER_ERROR
+        try:
+            status = handle()
+        except BadRequest as e:
+            status = self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+        except SchedulerRejected as e:
+            status = self._send_error(HTTPStatus.TOO_MANY_REQUESTS, str(e))
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away mid-response (nginx's "client closed request").
+            status = 499
+            self.close_connection = True
+        except Exception as e:
+            print(f"Warning: {route} failed: {e}")
+            status = self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, str(e))
+        finally:
+            metrics.end(route, int(status), time.perf_counter() - start)
+
+    def _read_body(self) -> bytes:
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            raise BadRequest("invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            raise BadRequest(f"request body over {MAX_BODY_BYTES} bytes")
+        return self.rfile.read(length) if length else b""
+
+    def _read_request(self) -> AskRequest:
+        body = self._read_body()
+        try:
+            payload = json.loads(body or b"null")
+        except ValueError as e:
+            raise BadRequest(f"invalid JSON: {e}")
+        return AskRequest.from_json(payload, self.app.pipeline)
+
+    def _send_json(self, status: int, payload: Any) -> int:
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return status
+
+    def _send_error(self, status: int, message: str) -> int:
+        return self._send_json(status, {"error": message})
+
+    def _health(self, query: Dict[str, List[str]]) -> int:
+        payload: Dict[str, Any] = {"status": "ok", "models": list(self.app.pipeline.llm_registry.options())}
+        status = HTTPStatus.OK
+        if query.get("deep", ["0"])[0].lower() in ("1", "true", "yes"):
+            payload["neo4j"] = bool(self.app.pipeline.client.warm_up())
+            if not payload["neo4j"]:
+                payload["status"] = "degraded"
+                status = HTTPStatus.SERVICE_UNAVAILABLE
+        return self._send_json(status, payload)
+
+    def _answer(self) -> int:
+        request = self._read_request()
+        result, shared = self.app.flight.do(request.key(), lambda: self.app.pipeline.run(**request.kwargs()))
+        payload = self.app.pipeline.to_dict(result)
+        payload["coalesced"] = shared
+        return self._send_json(HTTPStatus.OK, payload)
+
+    def _answer_stream(self) -> int:
+        request = self._read_request()
+        pipeline = self.app.pipeline
+
+        def produce(shared: "SharedStream") -> None:
+            stream = pipeline.run_stream(**request.kwargs())
+            for token in stream:
+                shared.publish(token)
+            shared.finish(stream.result)
+
+        stream, shared = self.app.flight.stream(request.key(), produce, self.app.producers)
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for token in stream:
+                self._write_chunk({"token": token})
+            final: Dict[str, Any] = {"done": True, "coalesced": shared}
+            if stream.result is not None:
+                final["result"] = pipeline.to_dict(stream.result)
+            self._write_chunk(final)
+            status = HTTPStatus.OK
+        except SchedulerRejected as e:
+            # Headers are already sent: report the failure in-band.
+            self._write_chunk({"error": str(e), "status": int(HTTPStatus.TOO_MANY_REQUESTS)})
+            status = HTTPStatus.TOO_MANY_REQUESTS
+        except (BrokenPipeError, ConnectionResetError):
+            raise
+        except Exception as e:
+            print(f"Warning: streamed answer failed: {e}")
+            self._write_chunk({"error": str(e), "status": int(HTTPStatus.INTERNAL_SERVER_ERROR)})
+            status = HTTPStatus.INTERNAL_SERVER_ERROR
+        self.wfile.write(b"0\r\n\r\n")
+        return status
+
+    def _write_chunk(self, payload: Dict[str, Any]) -> None:
+        line = (json.dumps(payload, default=str) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(line):X}\r\n".encode("ascii") + line + b"\r\n")
+        self.wfile.flush()
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that handles connections on a fixed-size worker pool instead of a thread each."""
+
+    def __init__(self, address: Tuple[str, int], handler: type, workers: int):
+        super().__init__(address, handler)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="http")
+
+    def process_request(self, request: Any, client_address: Any) -> None:
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request: Any, client_address: Any) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
+
+class AnswerServer:
+    """
+    HTTP API around a ``Pipeline``.
+
+    Connections are served by ``workers`` threads; concurrent identical
+    requests (same question, retrieval, models, persona and task) share one
+    pipeline execution. Streams run on a separate producer pool of the
+    same size so readers never wait on a busy connection worker.
+    """
+
+    def __init__(
+        self,
+        pipeline: Optional[Pipeline] = None,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        workers: Optional[int] = None,
+        access_log: bool = True,
+    ):
+        settings = get_settings()
+        self.pipeline = pipeline or Pipeline()
+        self.flight = SingleFlight()
+        self.metrics = ServerMetrics()
+        self.access_log = access_log
+        workers = workers or settings.server_workers
+        self.producers = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="http-stream")
+        self.httpd = PooledHTTPServer(
+            (host if host is not None else settings.server_host, port if port is not None else settings.server_port),
+            AnswerHandler,
+            workers,
+        )
+        self.httpd.app = self  # type: ignore[attr-defined]
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def metrics_payload(self) -> Dict[str, Any]:
+        pipeline = self.pipeline
+        payload: Dict[str, Any] = {
+            "server": self.metrics.snapshot(),
+            "coalescing": self.flight.stats(),
+            "stages": get_recorder().summary(),
+            "scheduler": pipeline.scheduler.stats(),
+        }
+        if pipeline.hedger is not None:
+            payload["hedging"] = pipeline.hedger.stats()
+        if pipeline.answer_cache is not None:
+            payload["answer_cache"] = pipeline.answer_cache.stats()
+        return payload
+
+    def serve_forever(self) -> None:
+        self.httpd.serve_forever()
+
+    def start(self) -> "AnswerServer":
+        """Serve on a background thread (embedding in another process, tests)."""
+        self._thread = threading.Thread(target=self.serve_forever, name="http-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self.httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.httpd.server_close()
+        self.producers.shutdown(wait=False)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Serve the Graph-RAG pipeline over HTTP.")
+    parser.add_argument("--host", default=settings.server_host)
+    parser.add_argument("--port", type=int, default=settings.server_port)
+    parser.add_argument("--workers", type=int, default=settings.server_workers, help="Connection worker threads")
+    parser.add_argument("--quiet", action="store_true", help="No per-request access log")
+    args = parser.parse_args(argv)
+
+    server = AnswerServer(host=args.host, port=args.port, workers=args.workers, access_log=not args.quiet)
+    print(f"Serving on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
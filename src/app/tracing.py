@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, asdict, field
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (``q`` in 0..100); 0.0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start_ns: int = 0
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: str = "ok"
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def as_dict(self) -> Dict[str, Any]:
+        payload = asdict(self)
+        payload["duration_ms"] = round(self.duration_ms, 3)
+        return payload
+
+
+class LatencyRecorder:
+    """Keeps the last ``maxlen`` durations per stage and reports p50/p95/p99."""
+
+    def __init__(self, maxlen: int = 2048):
+        self.maxlen = maxlen
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, duration_ms: float) -> None:
+        with self._lock:
+            self._samples.setdefault(stage, deque(maxlen=self.maxlen)).append(duration_ms)
+
+    def quantile(self, stage: str, q: float, min_count: int = 1) -> Optional[float]:
+        """Percentile ``q`` of a stage's recent durations (ms), or None with fewer than ``min_count`` samples."""
+        with self._lock:
+            values = list(self._samples.get(stage, ()))
+        if len(values) < max(1, min_count):
+            return None
+        return percentile(values, q)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self._samples.items()}
+        return {
+            stage: {
+                "count": len(values),
+                "p50_ms": percentile(values, 50),
+                "p95_ms": percentile(values, 95),
+                "p99_ms": percentile(values, 99),
+                "max_ms": max(values),
+            }
+            for stage, values in sorted(samples.items())
+            if values
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+
+_recorder = LatencyRecorder()
+
+
+def get_recorder() -> LatencyRecorder:
+    """Process-wide per-stage latency histograms fed by every finished span."""
+    return _recorder
+
+
+# Open spans of the current thread or asyncio task, innermost last, as (trace, span) pairs.
+_open_spans: contextvars.ContextVar[Tuple[Tuple["Trace", Span], ...]] = contextvars.ContextVar(
+    "open_spans", default=()
+)
+
+
+class Trace:
+    """
+    Collects the spans of one question.
+
+    ``span()`` nests automatically within a thread or asyncio task (each task
+    starts from the spans open where it was created); work handed to a thread
+    pool passes ``parent=`` explicitly or runs in a copied context. Finished
+    spans are also recorded in the stage histograms.
+    """
+
+    def __init__(self, trace_id: Optional[str] = None, recorder: Optional[LatencyRecorder] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.recorder = recorder or _recorder
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[Span]:
+        """Innermost open span of this trace in the current thread or task."""
+        return next((span for trace, span in reversed(_open_spans.get()) if trace is self), None)
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[Span] = None, **attributes: Any) -> Iterator[Span]:
+        if parent is None:
+            parent = self.current()
+        span = Span(
+            name=name,
+            trace_id=self.trace_id,
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent.span_id if parent else None,
+            start_ns=time.time_ns(),
+            attributes=dict(attributes),
+        )
+        _open_spans.set(_open_spans.get() + ((self, span),))
+        try:
+            yield span
+        except Exception as e:
+            span.status = "error"
+            span.set(error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _open_spans.set(tuple(entry for entry in _open_spans.get() if entry[1] is not span))
+            with self._lock:
+                self.spans.append(span)
+            self.recorder.observe(name, span.duration_ms)
+
+    def to_jsonl(self) -> str:
+        return "".join(json.dumps(span.as_dict(), default=str) + "\n" for span in self.spans)
+
+
+def optional_span(
+    trace: Optional[Trace], name: str, parent: Optional[Span] = None, **attributes: Any
+) -> Any:
+    """``trace.span(...)``, or a detached span that is not recorded when ``trace`` is None."""
+    if trace is None:
+        return nullcontext(Span(name=name, trace_id="", span_id="", attributes=dict(attributes)))
+    return trace.span(name, parent=parent, **attributes)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: Iterable[Span], service_name: str = "graph-rag-assistant") -> Dict[str, Any]:
+    """Spans as an OTLP/JSON ``ExportTraceServiceRequest`` (POSTable to ``/v1/traces``)."""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "app.tracing"},
+                        "spans": [
+                            {
+                                "traceId": span.trace_id,
+                                "spanId": span.span_id,
+                                "parentSpanId": span.parent_id or "",
+                                "name": span.name,
+                                "kind": 1,
+                                "startTimeUnixNano": str(span.start_ns),
+                                "endTimeUnixNano": str(span.end_ns),
+                                "attributes": [
+                                    {"key": key, "value": _otlp_value(value)}
+                                    for key, value in span.attributes.items()
+                                ],
+                                "status": {"code": 2 if span.status == "error" else 1},
+                            }
+                            for span in spans
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+_export_lock = threading.Lock()
+
+
+def export_spans(spans: List[Span], path: str, fmt: str = "jsonl") -> None:
+    """
+    Append spans to ``path``: one span per line (``jsonl``) or one OTLP request per line (``otlp``).
+    """
+    if not spans:
+        return
+    if fmt == "otlp":
+        payload = json.dumps(to_otlp(spans), default=str) + "\n"
+    else:
+        payload = "".join(json.dumps(span.as_dict(), default=str) + "\n" for span in spans)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with _export_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(payload)
+
+
+def payload_bytes(rows: Any) -> int:
+    """Approximate size of retrieved rows, as they would appear in the prompt."""
+    return len(str(rows).encode("utf-8"))
@@ -12,11 +12,20 @@ import streamlit as st  # noqa: E402
 
 from app.config import get_settings  # noqa: E402
 from app.pipeline import Pipeline  # noqa: E402
+from app.tracing import get_recorder  # noqa: E402
 
 
 st.set_page_config(page_title="Graph-RAG Ecommerce Assistant", layout="wide")
+
+
+@st.cache_resource
+def load_pipeline() -> Pipeline:
+    # One pipeline (executors, classifiers, LLM scheduler) for every session and rerun.
+    return Pipeline()
+
+
 settings = get_settings()
-pipeline = Pipeline()
+pipeline = load_pipeline()
 
 st.title("Graph-RAG Ecommerce Assistant")
 st.markdown(
@@ -70,6 +79,11 @@ with st.sidebar:
 
     persona = st.text_area("Persona", settings.persona, height=100)
     task = st.text_area("Task", settings.default_task, height=80)
+    stream_answers = st.checkbox(
+        "Stream answer",
+        value=True,
+        help="Render the primary model's answer token by token while comparison models run.",
+    )
     st.write("Environment")
     env_text = f"""NEO4J_URI={settings.neo4j_uri}
 DB={settings.neo4j_database}
@@ -78,6 +92,23 @@ EMBED_MODEL={settings.embed_model}"""
     if settings.embed_model_2:
         env_text += f"\nVECTOR_INDEX_2={settings.vector_index_2}\nEMBED_MODEL_2={settings.embed_model_2}"
     st.code(env_text, language="bash")
+    with st.expander("Neo4j connection pool", expanded=False):
+        st.json(pipeline.client.pool_metrics())
+    if pipeline.client.query_cache is not None:
+        with st.expander("Cypher result cache", expanded=False):
+            st.json(pipeline.client.query_cache.stats.as_dict())
+    with st.expander("LLM connections", expanded=False):
+        st.json(pipeline.llm_registry.connection_stats())
+    with st.expander("LLM scheduler", expanded=False):
+        st.json(pipeline.scheduler.stats())
+    if pipeline.hedger is not None:
+        with st.expander("LLM hedging", expanded=False):
+            st.json(pipeline.hedger.stats())
+    if pipeline.answer_cache is not None:
+        with st.expander("LLM answer cache", expanded=False):
+            st.json(pipeline.answer_cache.stats())
+    with st.expander("Stage latency (ms)", expanded=False):
+        st.json(get_recorder().summary())
     if st.button("Clear results"):
         st.session_state["runs"] = []
         st.experimental_rerun()
@@ -88,36 +119,74 @@ run = st.button("Run")
 if run and question:
     new_runs = []
     for r_choice in retrieval_choices:
-        for m_choice in model_choices:
-            start = time.time()
-            try:
-                result = pipeline.run(
-                    question=question,
-                    retrieval=r_choice,
-                    model_key=m_choice,
-                    embed_model_key=embed_model_key,
-                    persona=persona,
-                    task=task,
-                )
-                duration = time.time() - start
+        # Retrieve once per strategy, then answer with every selected LLM in parallel.
+        start = time.time()
+        try:
+            context = pipeline.retrieve(
+                question=question,
+                retrieval=r_choice,
+                embed_model_key=embed_model_key,
+            )
+        except Exception as e:
+            duration = time.time() - start
+            for m_choice in model_choices:
                 new_runs.append(
                     {
                         "retrieval": r_choice,
                         "model": m_choice,
-                        "result": result,
+                        "result": None,
                         "duration": duration,
-                        "error": None,
+                        "error": str(e),
                     }
                 )
+            continue
+        if stream_answers:
+            # Comparison models run in the background while the primary one streams.
+            primary, others = model_choices[0], model_choices[1:]
+            futures = {
+                m: pipeline.llm_executor.submit(pipeline.generate, context, m, persona, task)
+                for m in others
+            }
+            outcomes = {}
+            st.caption(f"{r_choice} | {primary}")
+            placeholder = st.empty()
+            try:
+                answer_stream = pipeline.generate_stream(context, primary, persona=persona, task=task)
+                text = ""
+                for token in answer_stream:
+                    text += token
+                    placeholder.markdown(text + "▌")
+                placeholder.markdown(text)
+                outcomes[primary] = answer_stream.result
             except Exception as e:
-                duration = time.time() - start
+                outcomes[primary] = e
+            for m, future in futures.items():
+                try:
+                    outcomes[m] = future.result()
+                except Exception as e:
+                    outcomes[m] = e
+        else:
+            outcomes = pipeline.generate_many(context, model_choices, persona=persona, task=task)
+        total = time.time() - start
+        for m_choice, outcome in outcomes.items():
+            if isinstance(outcome, Exception):
                 new_runs.append(
                     {
                         "retrieval": r_choice,
                         "model": m_choice,
                         "result": None,
-                        "duration": duration,
-                        "error": str(e),
+                        "duration": total,
+                        "error": str(outcome),
+                    }
+                )
+            else:
+                new_runs.append(
+                    {
+                        "retrieval": r_choice,
+                        "model": m_choice,
+                        "result": outcome,
+                        "duration": outcome.metrics["retrieval_sec"] + outcome.metrics["generation_sec"],
+                        "error": None,
                     }
                 )
     st.session_state["runs"] = new_runs
@@ -129,13 +198,22 @@ if st.session_state.get("runs"):
     for idx, (tab, run_info) in enumerate(zip(tabs, st.session_state["runs"])):
         with tab:
             st.subheader("Run stats")
-            st.write(
-                {
-                    "retrieval": run_info["retrieval"],
-                    "model": run_info["model"],
-                    "duration_sec": round(run_info["duration"], 3),
-                }
-            )
+            stats = {
+                "retrieval": run_info["retrieval"],
+                "model": run_info["model"],
+                "duration_sec": round(run_info["duration"], 3),
+            }
+            if run_info["result"] and "time_to_first_token_sec" in run_info["result"].metrics:
+                stats["time_to_first_token_sec"] = round(run_info["result"].metrics["time_to_first_token_sec"], 3)
+            if run_info["result"] and "llm_connect_sec" in run_info["result"].metrics:
+                stats["llm_connect_sec"] = round(run_info["result"].metrics["llm_connect_sec"], 3)
+            if run_info["result"]:
+                stats["answer_cache"] = run_info["result"].cache_status
+                if run_info["result"].dropped_rows:
+                    stats["dropped_rows"] = run_info["result"].dropped_rows
+                if run_info["result"].hedged:
+                    stats["answered_by"] = run_info["result"].answered_by
+            st.write(stats)
             if run_info["error"]:
                 st.error(f"Run failed: {run_info['error']}")
                 continue
@@ -166,6 +244,20 @@ if st.session_state.get("runs"):
                 with st.expander("View embedding hits", expanded=False):
                     st.json(result.embed_rows or [])
 
+            if result.spans:
+                with st.expander("Trace", expanded=False):
+                    st.table(
+                        [
+                            {
+                                "stage": span.name,
+                                "ms": round(span.duration_ms, 1),
+                                "status": span.status,
+                                "attributes": str(span.attributes),
+                            }
+                            for span in sorted(result.spans, key=lambda s: s.start_ns)
+                        ]
+                    )
+
             st.subheader("Graph preview")
             if result.baseline_rows:
                 headers = list(result.baseline_rows[0].keys())
@@ -0,0 +1,433 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+
+from .config import EmbeddingModelConfig, Settings, get_settings
+from .kg_client import KGClient, check_identifier, get_client
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _kmeans(data: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means (cosine) on unit vectors; returns unit-norm centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(data @ centroids.T, axis=1)
+        for c in range(k):
+            members = data[assignment == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+            else:
+                centroids[c] = data[rng.integers(len(data))]
+        centroids = _normalize(centroids)
+    return centroids
+
+
+@dataclass(frozen=True)
+class IndexSnapshot:
+    """One consistent generation of a loaded index; never mutated once built."""
+    meta: Dict[str, Any] = field(default_factory=dict)
+    keys: List[Any] = field(default_factory=list)
+    items: List[Dict[str, Any]] = field(default_factory=list)
+    vectors: Optional[np.ndarray] = None
+    centroids: Optional[np.ndarray] = None
+    lists: List[np.ndarray] = field(default_factory=list)
+    mtime: Optional[float] = None
+
+
+class LocalVectorIndex:
+    """
+    In-process replacement for ``db.index.vector.queryNodes``.
+
+    Node embeddings are exported once into ``<directory>/vectors.npy`` (unit-norm
+    float32 or float16, opened memory-mapped) with ``keys.json``/``items.json``
+    mapping rows back to nodes. ``search`` returns the same ``{item, score}``
+    rows as the Neo4j cosine index, score being ``(1 + cosine) / 2``.
+
+    Modes:
+        exact: brute-force matrix-vector product over all rows.
+        ivf:   k-means cluster pruning; only the ``nprobe`` closest clusters are scored.
+
+    Loaded state is an ``IndexSnapshot`` swapped in with one assignment, so a
+    search running while another thread reloads sees either the old or the
+    new index, never the new ids over the old matrix.
+    """
+
+    CHUNK_ROWS = 65536
+
+    def __init__(self, directory: str, mode: str = "exact", nprobe: int = 8):
+        if mode not in ("exact", "ivf"):
+            raise ValueError(f"Unknown local index mode: {mode}")
+        self.directory = directory
+        self.mode = mode
+        self.nprobe = nprobe
+        self._state = IndexSnapshot()
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        return self._state.meta
+
+    @property
+    def keys(self) -> List[Any]:
+        return self._state.keys
+
+    @property
+    def items(self) -> List[Dict[str, Any]]:
+        return self._state.items
+
+    @property
+    def vectors(self) -> Optional[np.ndarray]:
+        return self._state.vectors
+
+    # -- persistence -------------------------------------------------------
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def exists(self) -> bool:
+        return os.path.exists(self._path("meta.json"))
+
+    def load(self) -> "LocalVectorIndex":
+        mtime = os.path.getmtime(self._path("meta.json"))
+        with open(self._path("meta.json")) as f:
+            meta = json.load(f)
+        with open(self._path("keys.json")) as f:
+            keys = json.load(f)
+        with open(self._path("items.json")) as f:
+            items = json.load(f)
+        vectors = np.load(self._path("vectors.npy"), mmap_mode="r")
+        if not len(keys) == len(items) == len(vectors) == meta.get("count", len(keys)):
+            # Another process is between replacing vectors.npy and meta.json.
+            raise ValueError(f"Local index at '{self.directory}' is mid-refresh: row counts differ")
+        centroids = None
+        lists: List[np.ndarray] = []
+        if os.path.exists(self._path("ivf.npz")):
+            ivf = np.load(self._path("ivf.npz"))
+            centroids = ivf["centroids"]
+            assignment = ivf["assignment"]
+            lists = [np.flatnonzero(assignment == c) for c in range(len(centroids))]
+        self._state = IndexSnapshot(meta, keys, items, vectors, centroids, lists, mtime)
+        return self
+
+    def reload_if_changed(self) -> None:
+        """Pick up a refresh written by another process (meta.json is replaced last)."""
+        if self.exists() and os.path.getmtime(self._path("meta.json")) != self._state.mtime:
+            try:
+                self.load()
+            except (OSError, ValueError) as e:
+                # Keep serving the current snapshot; the next call retries.
+                print(f"Warning: local index reload failed: {e}")
+
+    def _write(
+        self, vectors: np.ndarray, keys: List[Any], items: List[Dict[str, Any]], meta: Dict[str, Any]
+    ) -> None:
+        nlist = meta.get("nlist", 0)
+        os.makedirs(self.directory, exist_ok=True)
+        # Write to temp files and rename so readers never see a half-written index.
+        tmp = self._path("vectors.tmp.npy")
+        np.save(tmp, vectors)
+        os.replace(tmp, self._path("vectors.npy"))
+        if nlist and len(vectors) >= nlist:
+            sample = np.asarray(vectors[: min(len(vectors), 50000)], dtype=np.float32)
+            centroids = _kmeans(sample, nlist)
+            assignment = np.concatenate([
+                np.argmax(np.asarray(vectors[i:i + self.CHUNK_ROWS], dtype=np.float32) @ centroids.T, axis=1)
+                for i in range(0, len(vectors), self.CHUNK_ROWS)
+            ])
+            np.savez(self._path("ivf.tmp.npz"), centroids=centroids, assignment=assignment)
+            os.replace(self._path("ivf.tmp.npz"), self._path("ivf.npz"))
+        elif os.path.exists(self._path("ivf.npz")):
+            os.remove(self._path("ivf.npz"))
+        for name, payload in (("keys.json", keys), ("items.json", items), ("meta.json", meta)):
+            with open(self._path(name + ".tmp"), "w") as f:
+                json.dump(payload, f, default=str)
+            os.replace(self._path(name + ".tmp"), self._path(name))
+        self.load()
+
+    def build(
+        self,
+        keys: List[Any],
+        vectors: np.ndarray,
+        items: List[Dict[str, Any]],
+        dtype: str = "float32",
+        nlist: int = 0,
+        watermark: Any = None,
+    ) -> "LocalVectorIndex":
+        """Replace the index contents with the given rows."""
+        if len(keys) != len(vectors) or len(keys) != len(items):
+            raise ValueError("keys, vectors and items must have the same length")
+        matrix = _normalize(np.asarray(vectors, dtype=np.float32)).astype(dtype)
+        meta = {
+            "count": len(keys),
+            "dimensions": int(matrix.shape[1]) if len(matrix) else 0,
+            "dtype": dtype,
+            "nlist": nlist,
+            "watermark": watermark,
+        }
+        self._write(matrix, list(keys), list(items), meta)
+        return self
+
+    def upsert(
+        self,
+        keys: List[Any],
+        vectors: np.ndarray,
+        items: List[Dict[str, Any]],
+        watermark: Any = None,
+    ) -> int:
+        """Replace rows for known keys, append new ones, then persist. Returns rows touched."""
+        if not keys:
+            return 0
+        if self.vectors is None:
+            self.build(keys, vectors, items, watermark=watermark)
+            return len(keys)
+        # Work on copies: searches keep reading the current snapshot until the new one is loaded.
+        state = self._state
+        dtype = state.meta.get("dtype", "float32")
+        matrix = np.array(state.vectors, dtype=dtype)  # copy out of the memory map
+        new_keys = list(state.keys)
+        new_items = list(state.items)
+        incoming = _normalize(np.asarray(vectors, dtype=np.float32)).astype(dtype)
+        positions = {key: i for i, key in enumerate(new_keys)}
+        appended = []
+        for key, vector, item in zip(keys, incoming, items):
+            row = positions.get(key)
+            if row is None:
+                positions[key] = len(new_keys)
+                new_keys.append(key)
+                new_items.append(item)
+                appended.append(vector)
+            else:
+                matrix[row] = vector
+                new_items[row] = item
+        if appended:
+            matrix = np.vstack([matrix, np.stack(appended)])
+        meta = dict(state.meta, count=len(new_keys))
+        if watermark is not None:
+            meta["watermark"] = watermark
+        self._write(matrix, new_keys, new_items, meta)
+        return len(keys)
+
+    def remove(self, keys: List[Any]) -> int:
+        """Drop the rows of the given keys, then persist. Returns rows removed."""
+        state = self._state
+        drop = set(keys)
+        rows = [i for i, key in enumerate(state.keys) if key not in drop]
+        removed = len(state.keys) - len(rows)
+        if not removed:
+            return 0
+        dtype = state.meta.get("dtype", "float32")
+        matrix = np.array(state.vectors[rows], dtype=dtype)
+        if not len(rows):
+            matrix = matrix.reshape(0, state.meta.get("dimensions", 0))
+        meta = dict(state.meta, count=len(rows))
+        self._write(matrix, [state.keys[i] for i in rows], [state.items[i] for i in rows], meta)
+        return removed
+
+    # -- search ------------------------------------------------------------
+
+    def search(self, vector: List[float], top_k: int = 10) -> List[Dict[str, Any]]:
+        if not vector:
+            raise ValueError("Vector cannot be empty")
+        if top_k < 1:
+            raise ValueError("top_k must be at least 1")
+        # One snapshot for the whole search, whatever another thread loads meanwhile.
+        state = self._state
+        if state.vectors is None or not len(state.vectors):
+            return []
+        query = _normalize(np.asarray(vector, dtype=np.float32))
+        if self.mode == "ivf" and state.centroids is not None:
+            probe = np.argsort(-(state.centroids @ query))[: self.nprobe]
+            candidates = np.sort(np.concatenate([state.lists[c] for c in probe]))
+            scores = np.asarray(state.vectors[candidates], dtype=np.float32) @ query
+        else:
+            candidates = None
+            scores = np.concatenate([
+                np.asarray(state.vectors[i:i + self.CHUNK_ROWS], dtype=np.float32) @ query
+                for i in range(0, len(state.vectors), self.CHUNK_ROWS)
+            ])
+        k = min(top_k, len(scores))
+        if not k:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        rows = top if candidates is None else candidates[top]
+        return [
+            {"item": state.items[int(row)], "score": float((1.0 + scores[i]) / 2.0)}
+            for row, i in zip(rows, top)
+        ]
+
+
+def index_directory(settings: Settings, config: EmbeddingModelConfig) -> str:
+    return os.path.join(settings.local_index_dir, config.vector_index)
+
+
+def _fetch_page(
+    client: KGClient,
+    config: EmbeddingModelConfig,
+    label: str,
+    key_property: str,
+    after: Any,
+    batch_size: int,
+    watermark: Any = None,
+) -> List[Dict[str, Any]]:
+    prop = check_identifier(config.embed_property)
+    stamp = f"{prop}_updated_at"
+    cypher = f"""
+    MATCH (n:`{check_identifier(label)}`)
+    WHERE n.`{prop}` IS NOT NULL
+      AND n.`{key_property}` IS NOT NULL
+      AND ($after IS NULL OR n.`{key_property}` > $after)
+      AND ($watermark IS NULL OR n.`{stamp}` > $watermark)
+    RETURN n.`{key_property}` AS key, n.`{prop}` AS vector,
+           n{{.*, `{prop}`: null}} AS item, n.`{stamp}` AS stamp
+    ORDER BY n.`{key_property}`
+    LIMIT $batch_size
+    """
+    return client.run_query(cypher, {"after": after, "watermark": watermark, "batch_size": batch_size})
+
+
+def _live_keys(
+    client: KGClient, config: EmbeddingModelConfig, label: str, key_property: str, batch_size: int
+) -> Set[Any]:
+    """Keys of every node that currently has an embedding (keys only, keyset-paginated)."""
+    prop = check_identifier(config.embed_property)
+    cypher = f"""
+    MATCH (n:`{check_identifier(label)}`)
+    WHERE n.`{prop}` IS NOT NULL
+      AND n.`{key_property}` IS NOT NULL
+      AND ($after IS NULL OR n.`{key_property}` > $after)
+    RETURN n.`{key_property}` AS key
+    ORDER BY n.`{key_property}`
+    LIMIT $batch_size
+    """
+    keys: Set[Any] = set()
+    after = None
+    while True:
+        page = client.run_query(cypher, {"after": after, "batch_size": batch_size})
+        if not page:
+            return keys
+        keys.update(row["key"] for row in page)
+        after = page[-1]["key"]
+
+
+def export_index(
+    client: KGClient,
+    settings: Settings,
+    config: EmbeddingModelConfig,
+    incremental: bool = False,
+    batch_size: int = 5000,
+) -> LocalVectorIndex:
+    """
+    Export node embeddings from Neo4j into the local index.
+
+    Pages through nodes by key (keyset pagination; nodes without a key are
+    skipped). With ``incremental=True`` only nodes whose
+    ``<embed_property>_updated_at`` stamp is newer than the stored watermark
+    are fetched and upserted. The stamp can't show deletions, so the refresh
+    also lists the keys of every embedded node and drops index rows whose
+    node was deleted or lost its embedding.
+    """
+    key_property = check_identifier(settings.vector_key_property)
+    index = LocalVectorIndex(index_directory(settings, config), mode=settings.local_index_mode,
+                             nprobe=settings.local_index_nprobe)
+    watermark = None
+    if incremental and index.exists():
+        index.load()
+        watermark = index.meta.get("watermark")
+
+    keys: List[Any] = []
+    vectors: List[List[float]] = []
+    items: List[Dict[str, Any]] = []
+    newest = watermark
+    after = None
+    while True:
+        page = _fetch_page(client, config, settings.vector_label, key_property, after, batch_size, watermark)
+        if not page:
+            break
+        for row in page:
+            item = dict(row["item"])
+            item.pop(config.embed_property, None)
+            keys.append(row["key"])
+            vectors.append(row["vector"])
+            items.append(item)
+            if row.get("stamp") is not None and (newest is None or row["stamp"] > newest):
+                newest = row["stamp"]
+        after = page[-1]["key"]
+
+    if incremental and index.vectors is not None:
+        if keys:
+            index.upsert(keys, np.asarray(vectors, dtype=np.float32), items, watermark=newest)
+        live = _live_keys(client, config, settings.vector_label, key_property, batch_size)
+        index.remove([key for key in index.keys if key not in live])
+        return index
+    if not keys:
+        return index
+    nlist = settings.local_index_nlist or (int(np.sqrt(len(keys))) if settings.local_index_mode == "ivf" else 0)
+    return index.build(
+        keys,
+        np.asarray(vectors, dtype=np.float32),
+        items,
+        dtype=settings.local_index_dtype,
+        nlist=nlist,
+        watermark=newest,
+    )
+
+
+_indexes: Dict[str, LocalVectorIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_local_index(settings: Settings, config: EmbeddingModelConfig) -> LocalVectorIndex:
+    """Process-wide, lazily loaded local index for an embedding model."""
+    directory = index_directory(settings, config)
+    with _indexes_lock:
+        index = _indexes.get(directory)
+        if index is None:
+            index = LocalVectorIndex(directory, mode=settings.local_index_mode, nprobe=settings.local_index_nprobe)
+            if not index.exists():
+                raise RuntimeError(
+                    f"Local vector index not found at '{directory}'. "
+                    "Run `python -m app.vector_index export` first."
+                )
+            index.load()
+            _indexes[directory] = index
+        else:
+            index.reload_if_changed()
+        return index
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export/refresh the local in-process vector index.")
+    parser.add_argument("command", choices=["export", "refresh"])
+    parser.add_argument("--model-key", default=None, help="Embedding model key (default: all configured)")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    settings = get_settings()
+    client = get_client(settings)
+    models = settings.get_embedding_models()
+    for key in [args.model_key] if args.model_key else list(models):
+        index = export_index(
+            client,
+            settings,
+            models[key],
+            incremental=args.command == "refresh",
+            batch_size=args.batch_size,
+        )
+        print(f"{key}: {index.meta.get('count', 0)} vectors in {index.directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+import pathlib
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parents[1] / "src"
+sys.path.append(str(ROOT))
+
+import pytest
+import app.answer_cache
+import app.llm
+import app.llm_hedge
+import app.llm_scheduler
+
+
+@pytest.fixture(autouse=True)
+def fresh_process_state(monkeypatch):
+    """Process-wide LLM resources start empty in every test; tests mutate their limits and counters."""
+    monkeypatch.setattr(app.llm_scheduler, "_shared_scheduler", None)
+    monkeypatch.setattr(app.answer_cache, "_shared_answer_cache", None)
+    monkeypatch.setattr(app.llm, "_shared_registry", None)
+    monkeypatch.setattr(app.llm_hedge, "_shared_hedger", None)
+    yield
+    app.answer_cache.close_answer_cache()
+    app.llm.close_registry()
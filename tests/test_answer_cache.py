@@ -0,0 +1,162 @@
+import pathlib
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parents[1] / "src"
+sys.path.append(str(ROOT))
+sys.path.append(str(pathlib.Path(__file__).resolve().parent))
+
+from unittest.mock import MagicMock, patch
+from app.answer_cache import AnswerCache, normalize_answer_question
+from app.cache import LRUCache
+
+VECTORS = {
+    "best perfumes in sp": [1.0, 0.0, 0.0],
+    "top perfumes in sao paulo": [0.98, 0.1, 0.0],
+    "how many sellers are there": [0.0, 1.0, 0.0],
+}
+
+
+def embed(question):
+    return VECTORS[normalize_answer_question(question)]
+
+
+def lookup(cache, question, context="ctx", model="m1", embed_fn=embed):
+    return cache.lookup(model, "persona", "task", context, question, embed_model="e1", embed=embed_fn)
+
+
+def store(cache, question, answer, context="ctx", model="m1"):
+    cache.store(model, "persona", "task", context, question, answer, embed_model="e1", embed=embed)
+
+
+class TestExactTier:
+    """Test exact-key answer reuse."""
+
+    def test_normalized_question_hits(self):
+        cache = AnswerCache()
+        store(cache, "Best perfumes in SP?", "Perfume A")
+
+        hit = lookup(cache, "  best perfumes in sp ", embed_fn=None)
+        assert hit.answer == "Perfume A" and hit.status == "hit"
+
+    def test_key_includes_model_prompt_and_context(self):
+        cache = AnswerCache(semantic=False)
+        store(cache, "Best perfumes in SP?", "Perfume A")
+
+        assert lookup(cache, "Best perfumes in SP?", model="m2") is None
+        assert lookup(cache, "Best perfumes in SP?", context="other rows") is None
+        assert cache.lookup("m1", "other persona", "task", "ctx", "Best perfumes in SP?") is None
+
+    def test_ttl_and_persistence(self, tmp_path):
+        path = str(tmp_path / "answers.sqlite")
+        store(AnswerCache(path=path), "Best perfumes in SP?", "Perfume A")
+
+        reopened = AnswerCache(path=path)
+        assert lookup(reopened, "Best perfumes in SP?").answer == "Perfume A"
+        assert lookup(reopened, "Top perfumes in Sao Paulo").status == "semantic_hit"
+
+        now = [0.0]
+        expiring = AnswerCache(ttl=10)
+        expiring.exact.memory = LRUCache(ttl=10, clock=lambda: now[0])
+        store(expiring, "How many sellers are there?", "12")
+        now[0] = 11.0
+        assert expiring.exact.get(expiring.exact_key("m1", "persona", "task", "ctx", "How many sellers are there?")) is None
+
+
+class TestSemanticTier:
+    """Test near-duplicate reuse gated on the context hash."""
+
+    def test_near_duplicate_reuses_answer(self):
+        cache = AnswerCache(threshold=0.9)
+        store(cache, "Best perfumes in SP?", "Perfume A")
+        hit = lookup(cache, "Top perfumes in Sao Paulo")
+
+        assert hit.status == "semantic_hit" and hit.answer == "Perfume A"
+        assert hit.similarity > 0.9
+        assert cache.stats()["semantic_hits"] == 1
+
+    def test_dissimilar_question_misses(self):
+        cache = AnswerCache(threshold=0.9)
+        store(cache, "Best perfumes in SP?", "Perfume A")
+        assert lookup(cache, "How many sellers are there?") is None
+
+    def test_different_context_never_matches(self):
+        cache = AnswerCache(threshold=0.9)
+        store(cache, "Best perfumes in SP?", "Perfume A")
+        calls = []
+
+        def counting_embed(question):
+            calls.append(question)
+            return embed(question)
+
+        assert lookup(cache, "Top perfumes in Sao Paulo", context="new rows", embed_fn=counting_embed) is None
+        assert calls == []
+
+
+class TestPipelineCache:
+    """Test cache status reporting through Pipeline.generate."""
+
+    def make_pipeline(self):
+        from test_pipeline import SlowEmbeddingService
+        from app.pipeline import Pipeline
+
+        client = MagicMock()
+        client.run_query.return_value = [{"id": "p1", "rating": 4.5}]
+        client.graph_meta.return_value = {}
+        with patch("app.pipeline.get_client", return_value=client):
+            pipe = Pipeline()
+        pipe.answer_cache = AnswerCache()
+        pipe.llm_registry.get = MagicMock(return_value=MagicMock())
+        return pipe, SlowEmbeddingService
+
+    def test_repeat_question_skips_llm(self):
+        pipe, embedding = self.make_pipeline()
+        with patch("app.pipeline.EmbeddingService", embedding), \
+             patch("app.pipeline.run_llm", return_value="answer") as run_llm:
+            first = pipe.run("Top electronics in SP?", retrieval="baseline", model_key="ollama-llama2")
+            second = pipe.run("top electronics in SP", retrieval="baseline", model_key="ollama-llama2")
+            other_model = pipe.run("Top electronics in SP?", retrieval="baseline", model_key="ollama-mistral")
+
+        assert first.cache_status == "miss"
+        assert second.cache_status == "hit" and second.answer == "answer"
+        assert other_model.cache_status == "miss"
+        assert run_llm.call_count == 2
+
+    def test_streaming_hit_yields_cached_answer(self):
+        pipe, embedding = self.make_pipeline()
+        with patch("app.pipeline.EmbeddingService", embedding), \
+             patch("app.pipeline.run_llm", return_value="cached answer"):
+            pipe.run("Top electronics in SP?", retrieval="baseline", model_key="ollama-llama2")
+            stream = pipe.run_stream("Top electronics in SP?", retrieval="baseline", model_key="ollama-llama2")
+            assert "".join(stream) == "cached answer"
+
+        assert stream.result.cache_status == "hit"
+
+    def test_pipelines_share_the_process_cache(self):
+        from test_pipeline import SlowEmbeddingService
+        from app.pipeline import Pipeline
+
+        client = MagicMock()
+        client.run_query.return_value = [{"id": "p1", "rating": 4.5}]
+        client.graph_meta.return_value = {}
+        with patch("app.pipeline.get_client", return_value=client):
+            # e.g. two Streamlit reruns
+            first, second = Pipeline(), Pipeline()
+        for pipe in (first, second):
+            pipe.llm_registry.get = MagicMock(return_value=MagicMock())
+
+        with patch("app.pipeline.EmbeddingService", SlowEmbeddingService), \
+             patch("app.pipeline.run_llm", return_value="answer") as run_llm:
+            first.run("Top electronics in SP?", retrieval="baseline", model_key="ollama-llama2")
+            repeat = second.run("Top electronics in SP?", retrieval="baseline", model_key="ollama-llama2")
+
+        assert first.answer_cache is second.answer_cache is not None
+        assert repeat.cache_status == "hit"
+        assert run_llm.call_count == 1
+
+    def test_disabled_cache_reports_off(self):
+        pipe, embedding = self.make_pipeline()
+        pipe.answer_cache = None
+        with patch("app.pipeline.EmbeddingService", embedding), \
+             patch("app.pipeline.run_llm", return_value="answer"):
+            result = pipe.run("Top electronics in SP?", retrieval="baseline", model_key="ollama-llama2")
+        assert result.cache_status == "off"
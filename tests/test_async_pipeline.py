@@ -0,0 +1,177 @@
+import asyncio
+import pathlib
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1] / "src"
+sys.path.append(str(ROOT))
+
+import pytest
+from unittest.mock import MagicMock, patch
+from langchain_core.language_models import FakeListChatModel
+from app.async_pipeline import AsyncPipeline
+from app.llm import run_llm
+from test_pipeline import SlowEmbeddingService, pipeline  # noqa: F401  (fixture)
+
+
+class FakeAsyncClient:
+    """AsyncKGClient stand-in returning the same rows as the sync fixture client."""
+
+    def __init__(self, settings, query_cache=None, delay=0.2):
+        self.delay = delay
+        self.queries = 0
+        self.closed = False
+
+    async def run_query(self, query, params=None, intent=None):
+        self.queries += 1
+        await asyncio.sleep(self.delay)
+        return [{"id": "p1", "rating": 4.5}]
+
+    async def vector_query(self, vector, top_k=10, index_name=None, embed_property=None):
+        await asyncio.sleep(self.delay)
+        return [{"item": {"id": "p1"}, "score": 0.9}]
+
+    async def close(self):
+        self.closed = True
+
+
+class AsyncEmbeddingService(SlowEmbeddingService):
+    async def asearch_vector(self, client, vector, top_k=10, executor=None):
+        return await client.vector_query(vector, top_k)
+
+
+@pytest.fixture
+def async_pipeline(pipeline):
+    with patch("app.async_pipeline.AsyncKGClient", FakeAsyncClient), \
+         patch("app.async_pipeline.EmbeddingService", AsyncEmbeddingService):
+        yield AsyncPipeline(pipeline)
+
+
+def comparable(payload):
+    """A result dict without timings and trace ids."""
+    payload = dict(payload)
+    payload.pop("metrics")
+    payload.pop("spans")
+    return payload
+
+
+class TestAsyncPipeline:
+    """Test the asyncio pipeline against the sync one."""
+
+    @pytest.mark.parametrize("retrieval", ["baseline", "embeddings", "hybrid"])
+    def test_results_match_sync_pipeline(self, pipeline, async_pipeline, retrieval):
+        model = FakeListChatModel(responses=["SP leads."])
+        pipeline.llm_registry.get = MagicMock(return_value=model)
+        question = "Top electronics in SP with rating > 4?"
+
+        with patch("app.pipeline.run_llm", run_llm):
+            sync_result = pipeline.run(question, retrieval=retrieval, model_key="ollama-llama2")
+        async_result = asyncio.run(async_pipeline.run(question, retrieval=retrieval, model_key="ollama-llama2"))
+
+        assert async_result.answer == "SP leads."
+        assert comparable(async_pipeline.to_dict(async_result)) == comparable(pipeline.to_dict(sync_result))
+        assert set(async_result.metrics) == set(sync_result.metrics)
+
+    def test_hybrid_branches_run_concurrently(self, async_pipeline):
+        start = time.perf_counter()
+        context = asyncio.run(async_pipeline.retrieve("Top electronics in SP?", retrieval="hybrid"))
+        elapsed = time.perf_counter() - start
+
+        assert context.baseline_rows and context.embed_rows
+        # Baseline 0.2s and embed 0.1s + vector 0.2s: about 0.3s when overlapped, 0.5s in sequence.
+        assert elapsed < 0.45
+
+    def test_many_questions_share_one_loop(self, async_pipeline):
+        async def run_all():
+            return await asyncio.gather(
+                *(async_pipeline.retrieve(f"Top electronics in SP? {i}", retrieval="baseline") for i in range(20))
+            )
+
+        start = time.perf_counter()
+        contexts = asyncio.run(run_all())
+        elapsed = time.perf_counter() - start
+
+        assert len(contexts) == 20
+        assert async_pipeline.client.queries == 20
+        # 20 x 0.2s of graph I/O overlapped on one thread.
+        assert elapsed < 1.0
+
+    def test_slow_branch_times_out(self, async_pipeline):
+        async_pipeline.settings.baseline_timeout = 0.05
+
+        context = asyncio.run(async_pipeline.retrieve("Top electronics in SP?", retrieval="baseline"))
+
+        assert context.baseline_rows == []
+
+    def test_spans_nest_under_retrieve(self, async_pipeline):
+        context = asyncio.run(async_pipeline.retrieve("Top electronics in SP?", retrieval="hybrid"))
+
+        spans = {span.name: span for span in context.spans}
+        root = spans["retrieve"]
+        for name in ("baseline_query", "embedding_encode", "vector_query", "context_assembly"):
+            assert spans[name].parent_id == root.span_id
+        assert {span.trace_id for span in context.spans} == {context.trace_id}
+
+    def test_stream_yields_tokens(self, pipeline, async_pipeline):
+        pipeline.llm_registry.get = MagicMock(return_value=FakeListChatModel(responses=["SP leads."]))
+
+        async def consume():
+            stream = await async_pipeline.run_stream(
+                "Top electronics in SP?", retrieval="baseline", model_key="ollama-llama2"
+            )
+            return stream, [token async for token in stream]
+
+        stream, tokens = asyncio.run(consume())
+
+        assert len(tokens) > 1
+        assert "".join(tokens) == "SP leads."
+        assert stream.result.answer == "SP leads."
+        assert "time_to_first_token_sec" in stream.result.metrics
+        assert "queue_wait_sec" in stream.result.metrics
+
+    def test_aclose_closes_driver(self, async_pipeline):
+        asyncio.run(async_pipeline.aclose())
+
+        assert async_pipeline.client.closed
+
+
+class TestBenchmark:
+    """Test the sync vs async throughput benchmark helpers."""
+
+    def test_summarize(self):
+        from app.benchmark import summarize
+
+        stats = summarize([0.1, 0.2, 0.3, 0.4], errors=1, wall_sec=2.0)
+
+        assert stats["requests"] == 5 and stats["errors"] == 1
+        assert stats["throughput_qps"] == 2.0
+        assert stats["max_ms"] == 400.0
+
+    def test_sleepy_model_sync_and_async(self):
+        from app.benchmark import SleepyChatModel
+
+        model = SleepyChatModel(delay=0.01)
+
+        assert model.invoke("hi").content == "Benchmark answer."
+        assert asyncio.run(model.ainvoke("hi")).content == "Benchmark answer."
+
+    def test_async_run_overlaps_llm_calls(self, pipeline, async_pipeline):
+        from app.benchmark import SleepyChatModel, bench_async
+
+        pipeline.llm_registry.get = MagicMock(return_value=SleepyChatModel(delay=0.2))
+        questions = ["Top electronics in SP?"] * 8
+
+        stats = asyncio.run(bench_async(async_pipeline, questions, 8, "baseline", "ollama-mistral", llm=True))
+
+        assert stats["errors"] == 0
+        # 8 x (0.2s graph + 0.2s LLM) would take 3.2s one at a time.
+        assert stats["wall_sec"] < 1.5
+
+    def test_caches_are_off_for_both_modes(self, pipeline):
+        from app.benchmark import disable_caches
+
+        pipeline.client.query_cache = MagicMock()
+        disable_caches(pipeline)
+
+        assert pipeline.answer_cache is None and pipeline.client.query_cache is None
+        assert pipeline.settings.embed_cache_size == 0
@@ -0,0 +1,103 @@
+import pathlib
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parents[1] / "src"
+sys.path.append(str(ROOT))
+
+import pytest
+from unittest.mock import MagicMock
+from app.backfill import Checkpoint, EmbeddingBackfill, feature_text
+from app.config import EmbeddingModelConfig
+
+
+class FakeGraph:
+    """Serves keyset pages from an in-memory product list and records UNWIND writes."""
+
+    def __init__(self, keys, fail_after_writes=None):
+        self.keys = sorted(keys)
+        self.writes = []
+        self.fail_after_writes = fail_after_writes
+        self.session_obj = MagicMock()
+        self.session_obj.execute_write.side_effect = self._execute_write
+
+    def run_query(self, cypher, params):
+        after, size = params["after"], params["batch_size"]
+        remaining = [k for k in self.keys if after is None or k > after]
+        return [{"key": k, "props": {"name": k, "price": 1.0}} for k in remaining[:size]]
+
+    def _execute_write(self, fn):
+        if self.fail_after_writes is not None and len(self.writes) >= self.fail_after_writes:
+            raise RuntimeError("connection lost")
+        tx = MagicMock()
+        fn(tx)
+        self.writes.append(tx.run.call_args.kwargs["rows"])
+
+    def session(self):
+        ctx = MagicMock()
+        ctx.__enter__.return_value = self.session_obj
+        return ctx
+
+
+class FakeService:
+    def __init__(self):
+        self.batches = []
+
+    def encode_batch(self, texts, batch_size=32):
+        self.batches.append(len(texts))
+        return [[float(len(t))] for t in texts]
+
+
+CONFIG = EmbeddingModelConfig("m", "model", "idx", "embedding")
+
+
+class TestEmbeddingBackfill:
+    """Test paging, batched writes and checkpoint resume."""
+
+    def test_feature_text(self):
+        assert feature_text({"name": "X", "price": 9.5, "category": None}) == "name: X | price: 9.5"
+        assert feature_text({"product_id": "p1"}) == "p1"
+
+    def test_writes_every_node_in_pages(self):
+        graph = FakeGraph([f"p{i:02d}" for i in range(25)])
+        service = FakeService()
+        stats = EmbeddingBackfill(graph, service, CONFIG, batch_size=10, writers=2).run()
+
+        assert stats["written"] == 25
+        assert service.batches == [10, 10, 5]
+        written_keys = sorted(row["key"] for rows in graph.writes for row in rows)
+        assert written_keys == graph.keys
+
+    def test_resumes_from_checkpoint(self, tmp_path):
+        path = str(tmp_path / "ckpt.json")
+        keys = [f"p{i:02d}" for i in range(30)]
+
+        graph = FakeGraph(keys, fail_after_writes=2)
+        with pytest.raises(RuntimeError, match="connection lost"):
+            EmbeddingBackfill(graph, FakeService(), CONFIG, batch_size=10, writers=1,
+                              checkpoint=Checkpoint(path)).run()
+
+        resumed = FakeGraph(keys)
+        checkpoint = Checkpoint(path)
+        assert checkpoint.get("model:Product.embedding")["after"] == "p19"
+        stats = EmbeddingBackfill(resumed, FakeService(), CONFIG, batch_size=10, writers=1,
+                                  checkpoint=checkpoint).run()
+
+        assert [row["key"] for rows in resumed.writes for row in rows] == keys[20:]
+        assert stats["written"] == 30
+
+    def test_completed_run_clears_checkpoint(self, tmp_path):
+        path = str(tmp_path / "ckpt.json")
+        EmbeddingBackfill(FakeGraph(["b1", "c1"]), FakeService(), CONFIG, batch_size=10,
+                          checkpoint=Checkpoint(path)).run()
+        assert Checkpoint(path).get("model:Product.embedding")["after"] is None
+
+        # A product whose hash key sorts below the previous last key.
+        graph = FakeGraph(["a9", "b1", "c1"])
+        EmbeddingBackfill(graph, FakeService(), CONFIG, batch_size=10, checkpoint=Checkpoint(path)).run()
+
+        assert "a9" in [row["key"] for rows in graph.writes for row in rows]
+
+    def test_rejects_unsafe_property_names(self):
+        bad = EmbeddingModelConfig("m", "model", "idx", "embedding` = 1 //")
+        with pytest.raises(ValueError, match="Invalid label/property name"):
+            EmbeddingBackfill(FakeGraph([]), FakeService(), bad)
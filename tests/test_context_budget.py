@@ -0,0 +1,135 @@
+import pathlib
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parents[1] / "src"
+sys.path.append(str(ROOT))
+
+from unittest.mock import patch
+from app.context_budget import CACHE_MAX_CHARS, TokenCounter, estimate_tokens, fit_context
+
+
+class WordCounter:
+    """Exact counter stand-in: one token per whitespace-separated word."""
+
+    exact = True
+
+    def __init__(self):
+        self.calls = 0
+
+    def count(self, text):
+        self.calls += 1
+        return len(text.split())
+
+
+BASELINE = [{"order_id": f"o{i}", "state": "SP", "delay_days": i, "status": "late"} for i in range(30)]
+HITS = [{"item": {"product_id": f"p{i}", "category": "perfumaria"}, "score": 1 - i / 100} for i in range(8)]
+
+
+class TestEstimator:
+    """Test the tokenizer-free estimate."""
+
+    def test_words_numbers_and_punctuation(self):
+        assert estimate_tokens("delivery") == 2
+        assert estimate_tokens("2018-06-30") == 2 + 1 + 1 + 1 + 1
+        assert estimate_tokens("") == 0
+
+    def test_unknown_tokenizer_falls_back(self):
+        counter = TokenCounter("nope:whatever")
+        assert counter.count("late orders") == estimate_tokens("late orders")
+        assert not counter.exact
+
+    def test_no_tokenizer_is_an_estimate(self):
+        assert not TokenCounter(None).exact
+
+    def test_only_short_strings_are_memoized(self):
+        counter = TokenCounter(None)
+        before = counter.count.cache_info().currsize
+
+        counter.count("SP | late | 3")
+        counter.count("x " * CACHE_MAX_CHARS)
+
+        assert counter.count.cache_info().currsize == before + 1
+        assert counter.count("x " * CACHE_MAX_CHARS) == estimate_tokens("x " * CACHE_MAX_CHARS)
+
+
+class TestFitContext:
+    """Test whole-row budgeting."""
+
+    def test_small_context_skips_the_tokenizer(self):
+        counter = WordCounter()
+        result = fit_context(BASELINE[:3], HITS[:2], counter, max_context_tokens=4000)
+
+        assert counter.calls == 0
+        assert result.dropped_baseline == result.dropped_embed == 0
+        assert "o2" in result.context and "p1" in result.context
+
+    def test_rows_are_dropped_whole_by_priority(self):
+        counter = WordCounter()
+        result = fit_context(
+            BASELINE, HITS, counter, max_context_tokens=250, prompt_overhead="persona task question", answer_tokens=50
+        )
+
+        assert result.tokens <= result.budget == 250 - 50 - 3
+        assert result.dropped_baseline > 0
+        assert "Baseline rows" in result.context and "more dropped to fit the context" in result.context
+        lines = result.context.splitlines()
+        assert lines[2].startswith("o0 |")
+        assert any(line.startswith("p0 |") for line in lines)
+        assert all(line.count("|") in (0, 3, 2) for line in lines)
+        kept = sum(line.split(" |")[0] in {r["order_id"] for r in BASELINE} for line in lines)
+        assert kept + result.dropped_baseline == len(BASELINE)
+
+    def test_estimate_keeps_a_margin(self):
+        counter = TokenCounter(None)
+        result = fit_context(BASELINE, [], counter, max_context_tokens=300, answer_tokens=0)
+
+        assert result.budget == int(300 * 0.9)
+        assert result.tokens <= result.budget
+        assert not result.exact
+
+    def test_repr_format_is_budgeted_too(self):
+        result = fit_context(BASELINE, [], WordCounter(), max_context_tokens=120, answer_tokens=0, fmt="repr")
+
+        assert result.context.startswith("Baseline rows: [{")
+        assert result.tokens <= 120
+        assert result.dropped_baseline > 0
+
+
+def test_pipeline_reports_dropped_rows():
+    sys.path.append(str(pathlib.Path(__file__).resolve().parent))
+    from unittest.mock import MagicMock
+    from test_pipeline import SlowEmbeddingService
+
+    client = MagicMock()
+    client.run_query.return_value = [
+        {"id": f"p{i}", "name": f"product {i}", "rating": 4.5, "price": 10.0 + i} for i in range(400)
+    ]
+    client.graph_meta.return_value = {}
+    with patch("app.pipeline.get_client", return_value=client), \
+         patch("app.pipeline.EmbeddingService", SlowEmbeddingService), \
+         patch("app.pipeline.get_counter", return_value=TokenCounter(None)), \
+         patch("app.pipeline.run_llm", return_value="answer") as run_llm:
+        from app.pipeline import Pipeline
+
+        pipe = Pipeline()
+        pipe.llm_registry.get = MagicMock(return_value=MagicMock())
+        result = pipe.run("Top electronics in SP?", retrieval="baseline", model_key="ollama-llama2")
+
+    assert result.dropped_rows["baseline"] > 0
+    assert result.metrics["context_tokens"] <= result.metrics["context_budget"] < 4000
+    assert run_llm.call_args.kwargs["max_context_tokens"] is None
+    assert "more dropped to fit the context" in run_llm.call_args.kwargs["context"]
+
+
+def test_budgeted_context_is_not_cut_again():
+    from langchain_core.language_models import FakeListChatModel
+    from app.llm import run_llm
+    from app.tracing import Trace
+
+    context = "".join(f"| o{i} | SP | late |\n" for i in range(2000))
+    for max_context_tokens, truncated in ((None, False), (1000, True)):
+        trace = Trace()
+        run_llm(FakeListChatModel(responses=["ok"]), context, "analyst", "task", "q",
+                max_context_tokens=max_context_tokens, trace=trace)
+        span = next(s for s in trace.spans if s.name == "prompt_build")
+        assert span.attributes["truncated"] is truncated
@@ -0,0 +1,76 @@
+import pathlib
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parents[1] / "src"
+sys.path.append(str(ROOT))
+
+from app.context_format import (
+    NO_RESULTS,
+    build_context,
+    compact_context,
+    flatten_row,
+    format_table,
+    format_value,
+)
+
+DELAY_ROWS = [
+    {"order_id": f"o{i}", "state": "SP", "review_score": 3.6666666666666665, "delay_days": i, "status": "late"}
+    for i in range(20)
+]
+
+
+class TestFormatting:
+    """Test value and table rendering."""
+
+    def test_floats_are_rounded(self):
+        assert format_value(3.6666666666666665) == "3.67"
+        assert format_value(4.0) == "4"
+        assert format_value(0.5, float_digits=3) == "0.5"
+        assert format_value(float("nan")) == ""
+
+    def test_separators_and_newlines_are_escaped(self):
+        assert format_value("a|b\nc") == "a/b c"
+
+    def test_header_once_and_one_line_per_row(self):
+        text = format_table("Baseline rows", DELAY_ROWS)
+        lines = text.splitlines()
+
+        assert lines[0] == "Baseline rows (20 rows):"
+        assert lines[1] == "order_id | state | review_score | delay_days | status"
+        assert lines[2] == "o0 | SP | 3.67 | 0 | late"
+        assert len(lines) == 22
+        assert text.count("review_score") == 1
+
+    def test_all_null_columns_are_dropped(self):
+        rows = [{"name": "a", "city": None}, {"name": "b", "city": None}]
+        assert format_table("Rows", rows).splitlines()[1] == "name"
+
+    def test_flatten_embedding_hit(self):
+        row = {"item": {"product_id": "p1", "score": 1}, "score": 0.9}
+        assert flatten_row(row) == {"product_id": "p1", "item.score": 1, "score": 0.9}
+
+
+class TestContext:
+    """Test the assembled prompt context."""
+
+    def test_duplicate_products_are_removed(self):
+        baseline = [{"id": "p1", "name": "phone"}, {"id": "p2", "name": "lamp"}]
+        hits = [
+            {"item": {"product_id": "p1"}, "score": 0.9},
+            {"item": {"product_id": "p3"}, "score": 0.8},
+        ]
+        text = compact_context(baseline, hits)
+
+        assert "Embedding hits (1 rows, 1 already in baseline rows omitted):" in text
+        assert "p3" in text and text.count("p1") == 1
+
+    def test_token_savings_are_reported(self):
+        context, stats = build_context(DELAY_ROWS, [])
+        legacy, legacy_stats = build_context(DELAY_ROWS, [], fmt="repr")
+
+        assert legacy.startswith("Baseline rows: [{")
+        assert stats["context_tokens"] < legacy_stats["context_tokens"] / 2
+        assert stats["context_tokens_saved"] == legacy_stats["context_tokens"] - stats["context_tokens"]
+
+    def test_empty(self):
+        assert build_context([], [])[0] == NO_RESULTS
@@ -80,7 +80,7 @@ class TestCypherTemplates:
             city=None,
             min_rating=None
         )
-        query = build_query("product_search", entities)
+        query = build_query("product_search", entities, specialize=False)
         
         assert query is not None
         cypher = query["text"]
@@ -98,7 +98,7 @@ class TestCypherTemplates:
             start_date=None,
             end_date=None
         )
-        query = build_query("delivery_delay", entities)
+        query = build_query("delivery_delay", entities, specialize=False)
         
         assert query is not None
         cypher = query["text"]
@@ -118,7 +118,7 @@ class TestCypherTemplates:
             state=None,
             min_reliability=None
         )
-        query = build_query("seller_performance", entities)
+        query = build_query("seller_performance", entities, specialize=False)
         
         assert query is not None
         cypher = query["text"]
@@ -131,7 +131,7 @@ class TestCypherTemplates:
     def test_state_trend_null_params(self):
         """Test state_trend template with NULL parameters."""
         entities = EntityResult(state=None)
-        query = build_query("state_trend", entities)
+        query = build_query("state_trend", entities, specialize=False)
         
         assert query is not None
         cypher = query["text"]
@@ -143,7 +143,7 @@ class TestCypherTemplates:
     def test_category_insight_null_params(self):
         """Test category_insight template with NULL parameters."""
         entities = EntityResult(category=None)
-        query = build_query("category_insight", entities)
+        query = build_query("category_insight", entities, specialize=False)
         
         assert query is not None
         cypher = query["text"]
@@ -158,7 +158,7 @@ class TestCypherTemplates:
             product=None,
             category=None
         )
-        query = build_query("review_sentiment", entities)
+        query = build_query("review_sentiment", entities, specialize=False)
         
         assert query is not None
         cypher = query["text"]
@@ -184,7 +184,7 @@ class TestCypherTemplates:
     def test_seller_reliability_null_params(self):
         """Test seller_reliability template with NULL parameters."""
         entities = EntityResult(state=None)
-        query = build_query("seller_reliability", entities)
+        query = build_query("seller_reliability", entities, specialize=False)
         
         assert query is not None
         cypher = query["text"]
@@ -211,7 +211,7 @@ class TestCypherTemplates:
             state=None,
             min_rating=None
         )
-        query = build_query("recommendation", entities)
+        query = build_query("recommendation", entities, specialize=False)
         
         assert query is not None
         cypher = query["text"]
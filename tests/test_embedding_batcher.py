@@ -0,0 +1,75 @@
+import pathlib
+import sys
+import threading
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1] / "src"
+sys.path.append(str(ROOT))
+
+import numpy as np
+import pytest
+from app.embedding import EmbeddingBatcher
+
+
+class SlowModel:
+    """Fake encoder whose cost is dominated by a fixed per-call overhead."""
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.batch_sizes = []
+        self.lock = threading.Lock()
+
+    def encode(self, texts, convert_to_numpy=True):
+        time.sleep(self.delay)
+        with self.lock:
+            self.batch_sizes.append(len(texts))
+        return np.array([[float(len(t)), 0.0] for t in texts], dtype=np.float32)
+
+
+class TestEmbeddingBatcher:
+    """Test coalescing of concurrent encode requests."""
+
+    def test_concurrent_requests_share_batches(self):
+        model = SlowModel()
+        batcher = EmbeddingBatcher(model, max_delay_ms=20, max_batch_size=16)
+        results = {}
+
+        def worker(i):
+            results[i] = batcher.embed([f"question {i}"])[0]
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(12)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(results) == 12
+        assert results[3] == [float(len("question 3")), 0.0]
+        assert len(model.batch_sizes) < 12
+        assert sum(model.batch_sizes) == 12
+
+    def test_respects_max_batch_size(self):
+        model = SlowModel(delay=0)
+        batcher = EmbeddingBatcher(model, max_delay_ms=50, max_batch_size=4)
+        vectors = batcher.embed([f"t{i}" for i in range(10)])
+
+        assert len(vectors) == 10
+        assert max(model.batch_sizes) <= 4
+
+    def test_encode_error_propagates(self):
+        class Broken:
+            def encode(self, texts, convert_to_numpy=True):
+                raise RuntimeError("cuda oom")
+
+        batcher = EmbeddingBatcher(Broken(), max_delay_ms=1)
+        with pytest.raises(RuntimeError, match="cuda oom"):
+            batcher.embed(["x"])
+
+    def test_stats(self):
+        batcher = EmbeddingBatcher(SlowModel(delay=0.001), max_delay_ms=1)
+        batcher.embed(["a", "b"])
+        stats = batcher.stats()
+
+        assert stats["items"] == 2
+        assert stats["batches"] >= 1
+        assert stats["latency_p95_ms"] > 0
@@ -0,0 +1,111 @@
+import pathlib
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parents[1] / "src"
+sys.path.append(str(ROOT))
+
+import numpy as np
+import pytest
+from unittest.mock import MagicMock, patch
+from app import embedding
+from app.config import Settings
+from app.embedding import EmbeddingService, normalize_question, read_question_log
+
+
+class CountingModel:
+    """Fake SentenceTransformer that records every encode call."""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, convert_to_numpy=True, **kwargs):
+        self.calls.append(list(texts))
+        return np.array([[float(len(t)), 1.0, 0.0] for t in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def model():
+    fake = CountingModel()
+    embedding._query_caches.clear()
+    with patch("app.embedding._load_model", return_value=fake):
+        yield fake
+    embedding._query_caches.clear()
+
+
+def make_settings(**overrides):
+    settings = Settings()
+    settings.embed_cache_size = 16
+    settings.embed_cache_path = None
+    settings.embed_batching = False
+    for key, value in overrides.items():
+        setattr(settings, key, value)
+    return settings
+
+
+class TestQueryEmbeddingCache:
+    """Test the question -> vector cache in EmbeddingService."""
+
+    def test_normalize_question(self):
+        assert normalize_question("  Best   perfumes\tin SP ") == "Best perfumes in SP"
+
+    def test_repeat_question_encodes_once(self, model):
+        service = EmbeddingService(make_settings())
+        first = service.embed_query("Best perfumes in SP?")
+        second = service.embed_query("Best  perfumes in SP? ")
+
+        assert first == second
+        assert len(model.calls) == 1
+        assert service.cache_stats()["hits"] == 1
+
+    def test_cache_is_per_model_id(self, model):
+        settings = make_settings(embed_model_2="other/model")
+        EmbeddingService(settings, model_key="model_1").embed_query("q")
+        EmbeddingService(settings, model_key="model_2").embed_query("q")
+
+        assert len(model.calls) == 2
+
+    def test_disabled_cache_always_encodes(self, model):
+        service = EmbeddingService(make_settings(embed_cache_size=0))
+        service.embed_query("q")
+        service.embed_query("q")
+
+        assert len(model.calls) == 2
+        assert service.cache_stats() == {}
+
+    def test_warm_from_log_and_persist(self, model, tmp_path):
+        log = tmp_path / "questions.log"
+        log.write_text('Best perfumes in SP?\n{"question": "How many sellers?"}\n\nBest perfumes in SP?\n')
+        settings = make_settings(embed_cache_path=str(tmp_path / "emb.sqlite"))
+        questions = read_question_log(str(log))
+
+        service = EmbeddingService(settings)
+        assert service.warm_cache(questions) == 2
+        assert len(model.calls) == 1  # one batched encode
+
+        # A fresh process (empty memory tier) is served from SQLite.
+        embedding._query_caches.clear()
+        service = EmbeddingService(settings)
+        assert service.warm_cache(questions) == 0
+        service.embed_query("How many sellers?")
+        assert len(model.calls) == 1
+        assert service.cache_stats()["disk_hits"] == 1
+
+    def test_semantic_search_uses_cached_vector(self, model):
+        service = EmbeddingService(make_settings())
+        client = MagicMock()
+        client.vector_query.return_value = [{"item": {"id": "1"}, "score": 0.9}]
+
+        service.semantic_search(client, "q", top_k=3)
+        service.semantic_search(client, "q", top_k=3)
+
+        assert len(model.calls) == 1
+        assert client.vector_query.call_count == 2
+
+    def test_embed_queries_single_encode_in_order(self, model):
+        service = EmbeddingService(make_settings())
+        service.embed_query("cached")
+        vectors = service.embed_queries(["a", "cached", "bb", "a"])
+
+        assert len(model.calls) == 2
+        assert model.calls[1] == ["a", "bb"]
+        assert [v[0] for v in vectors] == [1.0, 6.0, 2.0, 1.0]
@@ -0,0 +1,145 @@
+import pathlib
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parents[1] / "src"
+sys.path.append(str(ROOT))
+
+from unittest.mock import MagicMock
+from app.index_advisor import (
+    IndexAdvisor,
+    Predicate,
+    existing_indexes,
+    match_filters,
+    parse_predicates,
+    plan_operators,
+    suggest_indexes,
+    template_library,
+)
+from app.queries import QUERY_LIBRARY
+
+SCAN_PLAN = {
+    "operatorType": "ProduceResults@neo4j",
+    "children": [{"operatorType": "Filter@neo4j", "children": [{"operatorType": "NodeByLabelScan@neo4j"}]}],
+}
+SEEK_PLAN = {
+    "operatorType": "ProduceResults@neo4j",
+    "children": [{"operatorType": "NodeIndexSeek@neo4j", "children": []}],
+}
+
+
+def show_index_row(index_type, label, prop, constraint=None):
+    return {
+        "type": index_type,
+        "entityType": "NODE",
+        "labelsOrTypes": [label],
+        "properties": [prop],
+        "owningConstraint": constraint,
+    }
+
+
+class TestPredicateParsing:
+    """Test extraction of indexable predicates from templates."""
+
+    def test_match_filter_predicates(self):
+        predicates = parse_predicates(QUERY_LIBRARY["category_insight"])
+
+        assert Predicate("Product", "product_category_name", "CONTAINS") in predicates
+        assert Predicate("Customer", "customer_state", "=") in parse_predicates(QUERY_LIBRARY["state_trend"])
+
+    def test_filters_after_with_are_ignored(self):
+        for name in ("product_search", "recommendation"):
+            assert parse_predicates(QUERY_LIBRARY[name]) == set()
+
+    def test_match_filters(self):
+        template = """
+        MATCH (p:Product) WHERE p.name STARTS WITH $prefix
+        WITH p, count(*) AS n
+        WHERE p.category CONTAINS $category
+        RETURN p
+        """
+        assert [f.strip() for f in match_filters(template)] == ["p.name STARTS WITH $prefix"]
+
+    def test_wrapped_properties_are_ignored(self):
+        predicates = parse_predicates(QUERY_LIBRARY["delivery_delay"])
+
+        assert {p.label for p in predicates} == {"Customer"}
+
+    def test_null_guards_of_wrapped_properties_are_ignored(self):
+        predicates = parse_predicates(QUERY_LIBRARY["review_sentiment"])
+
+        assert Predicate("Product", "name", "IS NOT NULL") not in predicates
+        assert Predicate("Product", "product_category_name", "CONTAINS") in predicates
+        assert "product_name_range" not in {s.name for s in suggest_indexes(QUERY_LIBRARY, set())}
+
+    def test_sole_null_check_is_kept(self):
+        template = "MATCH (oi:OrderItem) WHERE oi.seller_id IS NOT NULL RETURN count(*)"
+        assert parse_predicates(template) == {Predicate("OrderItem", "seller_id", "IS NOT NULL")}
+
+    def test_projections_are_not_predicates(self):
+        assert parse_predicates(QUERY_LIBRARY["customer_behavior"]) == set()
+
+    def test_index_types(self):
+        assert Predicate("Product", "product_category_name", "CONTAINS").index_type == "TEXT"
+        assert Predicate("Customer", "customer_state", "=").index_type == "RANGE"
+
+
+class TestSuggestions:
+    """Test the comparison with SHOW INDEXES."""
+
+    def test_existing_indexes_cover_suggestions(self):
+        existing = existing_indexes([
+            show_index_row("RANGE", "Customer", "customer_state"),
+            show_index_row("LOOKUP", None, None),
+        ])
+        names = {s.name for s in suggest_indexes(QUERY_LIBRARY, existing)}
+
+        assert "customer_customer_state_range" not in names
+        assert "product_product_category_name_text" in names
+
+    def test_statements(self):
+        suggestion = next(
+            s for s in suggest_indexes(QUERY_LIBRARY, set()) if s.name == "product_product_category_name_text"
+        )
+        assert suggestion.statement() == (
+            "CREATE TEXT INDEX product_product_category_name_text IF NOT EXISTS "
+            "FOR (n:Product) ON (n.product_category_name)"
+        )
+        assert "category_insight" in suggestion.templates
+
+    def test_plan_operators_strip_runtime_suffix(self):
+        assert plan_operators(SCAN_PLAN) == ["ProduceResults", "Filter", "NodeByLabelScan"]
+
+
+class TestApply:
+    """Test the create-and-compare flow against a mock client."""
+
+    def test_reports_templates_switching_to_seeks(self):
+        client = MagicMock()
+        client.run_query.return_value = []
+        plans = iter([SCAN_PLAN] * len(QUERY_LIBRARY) + [SEEK_PLAN] + [SCAN_PLAN] * (len(QUERY_LIBRARY) - 1))
+        client.explain.side_effect = lambda text, params: next(plans)
+        result = IndexAdvisor(client, library=dict(QUERY_LIBRARY)).apply()
+
+        assert result["switched_to_index_seek"] == [next(iter(QUERY_LIBRARY))]
+        statements = [c.args[0] for c in client.run_query.call_args_list]
+        assert any(s.startswith("CREATE CONSTRAINT product_product_id_unique") for s in statements)
+        assert any("db.awaitIndexes" in s for s in statements)
+
+    def test_constraint_failure_is_reported_not_raised(self):
+        client = MagicMock()
+
+        def run_query(query, params=None):
+            if query.startswith("CREATE CONSTRAINT"):
+                raise Exception("duplicate keys")
+            return []
+
+        client.run_query.side_effect = run_query
+        client.explain.return_value = SCAN_PLAN
+        result = IndexAdvisor(client, library=dict(QUERY_LIBRARY)).apply()
+
+        assert not any(s.startswith("CREATE CONSTRAINT") for s in result["created"])
+        assert result["created"]
+
+    def test_library_includes_variants(self):
+        library = template_library()
+        assert "canonical:delivery_delay" in library and "rollup:seller_performance" in library
@@ -0,0 +1,104 @@
+import pathlib
+import sys
+import threading
+
+ROOT = pathlib.Path(__file__).resolve().parents[1] / "src"
+sys.path.append(str(ROOT))
+
+import pytest
+from unittest.mock import MagicMock
+from app.ingest import DATASETS, BulkLoader, chunked, iter_rows, partition_of
+
+DATA = pathlib.Path(__file__).resolve().parents[1] / "data"
+
+
+class RecordingClient:
+    """Records every UNWIND batch and the thread that wrote it."""
+
+    def __init__(self):
+        self.batches = []
+        self.lock = threading.Lock()
+        self.queries = []
+
+    def run_query(self, query, params=None):
+        self.queries.append((query, params))
+        return []
+
+    def session(self):
+        session = MagicMock()
+
+        def execute_write(fn):
+            tx = MagicMock()
+            fn(tx)
+            with self.lock:
+                self.batches.append((threading.current_thread().name, tx.run.call_args.kwargs["rows"]))
+
+        session.execute_write.side_effect = execute_write
+        ctx = MagicMock()
+        ctx.__enter__.return_value = session
+        return ctx
+
+
+def dataset(name):
+    return next(d for d in DATASETS if d.name == name)
+
+
+class TestIngestReaders:
+    """Test streaming and typing of the data/ artifacts."""
+
+    def test_csv_rows_are_typed(self):
+        rows = iter_rows(str(DATA / "product_state_exceeds_expectations.csv"), dataset("exceeds_expectations"))
+        first = next(rows)
+
+        assert first["product_id"] == "0009406fd7479715e4bef61dd91f2462"
+        assert first["customer_state"] == "SP"
+        assert first["props"]["exceeds"] is False
+        assert isinstance(first["props"]["expected_score"], float)
+
+    def test_json_variant_matches_csv(self):
+        ds = dataset("normalized_delay")
+        from_json = next(iter_rows(str(DATA / "product_state_normalized_delay.json"), ds))
+        from_csv = next(iter_rows(str(DATA / "product_state_normalized_delay.csv"), ds))
+
+        assert from_json["product_id"] == from_csv["product_id"]
+        assert from_json["props"]["normalized_delay"] == pytest.approx(from_csv["props"]["normalized_delay"])
+
+    def test_chunked(self):
+        assert [len(c) for c in chunked(iter(range(7)), 3)] == [3, 3, 1]
+
+
+class TestBulkLoader:
+    def test_loads_every_row_in_batches(self, tmp_path):
+        path = tmp_path / "delays.csv"
+        path.write_text("product_id,customer_state,avg_delay_days\n" + "".join(
+            f"p{i},SP,{i}.0\n" for i in range(25)
+        ))
+        client = RecordingClient()
+        stats = BulkLoader(client, batch_size=10).load(str(path), dataset("delivery_delays"))
+
+        assert stats["rows"] == 25
+        assert [len(rows) for _, rows in client.batches] == [10, 10, 5]
+
+    def test_parallel_writers_partition_by_product(self, tmp_path):
+        path = tmp_path / "delays.csv"
+        path.write_text("product_id,customer_state,avg_delay_days\n" + "".join(
+            f"p{i % 12},{state},1.0\n" for i, state in enumerate(["SP", "RJ", "MG"] * 12)
+        ))
+        client = RecordingClient()
+        stats = BulkLoader(client, batch_size=8, writers=3).load(str(path), dataset("delivery_delays"))
+
+        assert stats["rows"] == 36
+        writer_of = {}
+        for thread, rows in client.batches:
+            for row in rows:
+                writer_of.setdefault(row["product_id"], set()).add(thread)
+                assert partition_of(row["product_id"], 3) == partition_of(rows[0]["product_id"], 3)
+        assert all(len(threads) == 1 for threads in writer_of.values())
+
+    def test_ensure_schema_creates_constraints(self):
+        client = RecordingClient()
+        BulkLoader(client).ensure_schema()
+        statements = " ".join(q for q, _ in client.queries)
+
+        assert "REQUIRE p.product_id IS UNIQUE" in statements
+        assert "MERGE (:State {code: code})" in statements
@@ -0,0 +1,70 @@
+import pathlib
+import sys
+import threading
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1] / "src"
+sys.path.append(str(ROOT))
+
+import pytest
+from unittest.mock import patch
+from app import kg_client
+from app.config import Settings
+from app.kg_client import PoolGauge, get_client, close_client
+
+
+class TestPoolGauge:
+    """Test the client-side pool gauge used by the shared driver."""
+
+    def test_tracks_in_use_and_idle(self):
+        gauge = PoolGauge(limit=2, timeout=1)
+        with gauge.hold():
+            snap = gauge.snapshot()
+            assert snap["in_use"] == 1
+            assert snap["idle"] == 1
+        snap = gauge.snapshot()
+        assert snap["in_use"] == 0
+        assert snap["acquired"] == 1
+
+    def test_times_out_when_pool_exhausted(self):
+        gauge = PoolGauge(limit=1, timeout=0.05)
+        with gauge.hold():
+            with pytest.raises(RuntimeError, match="Timed out"):
+                with gauge.hold():
+                    pass
+        assert gauge.snapshot()["timeouts"] == 1
+
+    def test_waiter_records_wait_time(self):
+        gauge = PoolGauge(limit=1, timeout=2)
+        released = threading.Event()
+
+        def holder():
+            with gauge.hold():
+                released.wait(1)
+                time.sleep(0.05)
+
+        t = threading.Thread(target=holder)
+        t.start()
+        time.sleep(0.01)
+        released.set()
+        with gauge.hold():
+            pass
+        t.join()
+        assert gauge.snapshot()["max_wait_ms"] > 0
+
+
+class TestSharedClient:
+    def test_get_client_returns_single_instance(self):
+        settings = Settings()
+        settings.neo4j_warm_up = False
+        with patch("app.kg_client.GraphDatabase") as mock_db:
+            try:
+                first = get_client(settings)
+                second = get_client(settings)
+                assert first is second
+                assert mock_db.driver.call_count == 1
+                kwargs = mock_db.driver.call_args.kwargs
+                assert kwargs["max_connection_pool_size"] == settings.neo4j_max_pool_size
+            finally:
+                close_client()
+        assert kg_client._shared_client is None
@@ -0,0 +1,164 @@
+import asyncio
+import pathlib
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = pathlib.Path(__file__).resolve().parents[1] / "src"
+sys.path.append(str(ROOT))
+
+import pytest
+from unittest.mock import MagicMock, patch
+from app.config import Settings
+from app.llm import LLMConfig, LLMRegistry
+from app.llm_clients import ConnectionTimer, http_clients
+
+
+class OkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"{}"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), OkHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+class TestConnectionTimer:
+    """Test connect-time accounting on keep-alive httpx clients."""
+
+    def test_second_request_reuses_the_connection(self, server_url):
+        timer = ConnectionTimer()
+        client = http_clients("ollama", timer, pool_size=2, keepalive_expiry=30)["sync"]
+        with timer.call() as first:
+            client.get(server_url)
+        with timer.call() as second:
+            client.get(server_url)
+        client.close()
+
+        assert first.new_connections == 1 and first.connect_ms > 0
+        assert second.new_connections == 0 and second.connect_ms == 0
+        stats = timer.snapshot()["ollama"]
+        assert stats["requests"] == 2 and stats["new_connections"] == 1
+        assert stats["reuse_rate"] == 0.5
+
+    def test_async_client(self, server_url):
+        timer = ConnectionTimer()
+        client = http_clients("openai", timer, pool_size=2, keepalive_expiry=30)["async"]
+
+        async def run():
+            timings = []
+            for _ in range(2):
+                with timer.call() as timing:
+                    await client.get(server_url)
+                timings.append(timing)
+            await client.aclose()
+            return timings
+
+        first, second = asyncio.run(run())
+        assert first.new_connections == 1 and second.new_connections == 0
+
+
+class TestRegistryInstances:
+    """Test client instance reuse and warm-up."""
+
+    def make_registry(self, warm_up=None):
+        registry = LLMRegistry(Settings())
+        constructor = MagicMock(side_effect=lambda: MagicMock())
+        registry.options()["fake"] = LLMConfig(name="fake", constructor=constructor, warm_up=warm_up)
+        return registry, constructor
+
+    def test_get_constructs_once(self):
+        registry, constructor = self.make_registry()
+        assert registry.get("fake") is registry.get("fake")
+        assert constructor.call_count == 1
+
+    def test_get_is_thread_safe(self):
+        registry, constructor = self.make_registry()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(registry.get("fake"))) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len({id(r) for r in results}) == 1
+
+    def test_warm_up_reports_times_and_errors(self):
+        warmed = []
+        registry, _ = self.make_registry(warm_up=warmed.append)
+
+        def broken():
+            raise ConnectionError("ollama not running")
+
+        registry.options()["broken"] = LLMConfig(name="broken", constructor=broken)
+        result = registry.warm_up(["fake", "broken"])
+
+        assert isinstance(result["fake"], float) and len(warmed) == 1
+        assert "ollama not running" in result["broken"]
+
+    def test_close_closes_sync_and_async_pools(self):
+        registry = LLMRegistry(Settings())
+        clients = registry._http_clients("openai")
+
+        registry.close()
+
+        assert clients["sync"].is_closed and clients["async"].is_closed
+        assert registry._http == {}
+
+    def test_registry_is_shared_and_warmed_up_once(self):
+        from app.llm import get_registry
+
+        settings = Settings()
+        settings.llm_warm_up = True
+        warmed = threading.Event()
+        with patch.object(LLMRegistry, "warm_up", side_effect=warmed.set) as warm_up:
+            first, second = get_registry(settings), get_registry(settings)
+            assert warmed.wait(1.0)
+
+        assert first is second
+        assert warm_up.call_count == 1
+
+    def test_ollama_models_use_pooled_kwargs(self):
+        registry = LLMRegistry(Settings())
+        kwargs = registry._ollama_client_kwargs()
+
+        assert kwargs["client_kwargs"]["limits"].max_keepalive_connections == registry.settings.ollama_pool_size
+        assert "event_hooks" in kwargs["sync_client_kwargs"] and "event_hooks" in kwargs["async_client_kwargs"]
+
+    def test_openai_warm_up_opens_the_shared_pool(self, server_url):
+        settings = Settings()
+        settings.openai_api_key = "sk-test"
+        registry = LLMRegistry(settings)
+
+        registry._warm_up_openai(MagicMock(openai_api_base=server_url))
+
+        stats = registry.connection_stats()["openai"]
+        assert stats["requests"] == 1 and stats["new_connections"] == 1
+        registry.close()
+
+    def test_ollama_warm_up_generates_one_token(self):
+        from app.llm import _warm_up_ollama
+
+        model = MagicMock()
+        _warm_up_ollama(model)
+
+        model.invoke.assert_called_once_with("ping", options={"num_predict": 1})
+
+    def test_huggingface_has_no_shared_pool(self):
+        with pytest.raises(ValueError, match="no shared HTTP pool"):
+            LLMRegistry(Settings())._http_clients("huggingface")
@@ -0,0 +1,200 @@
+import pathlib
+import sys
+import threading
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1] / "src"
+sys.path.append(str(ROOT))
+
+import pytest
+from unittest.mock import MagicMock, patch
+from langchain_core.language_models import FakeListChatModel
+from app.config import Settings
+from app.llm_hedge import COMPLETE, FIRST_TOKEN, Attempt, HedgePolicy, Hedger, build_hedger
+from test_pipeline import pipeline  # noqa: F401  (fixture)
+
+
+def fake_stream(model):
+    """Attempt body that streams a FakeListChatModel's next response."""
+    return lambda: (chunk.content for chunk in model.stream("question"))
+
+
+class Tracked:
+    """Attempt body that records whether it was started and whether its stream was closed."""
+
+    def __init__(self, chunks, delay=0.0, error=None):
+        self.chunks = chunks
+        self.delay = delay
+        self.error = error
+        self.started = threading.Event()
+        self.closed = threading.Event()
+
+    def __call__(self):
+        self.started.set()
+        return self._run()
+
+    def _run(self):
+        try:
+            for chunk in self.chunks:
+                time.sleep(self.delay)
+                if self.error is not None:
+                    raise self.error
+                yield chunk
+        finally:
+            self.closed.set()
+
+
+class TestHedger:
+    """Test racing a primary model against a delayed hedge model."""
+
+    def test_slow_primary_is_hedged_and_cancelled(self):
+        hedger = Hedger(HedgePolicy(secondary="fast", initial_delay=0.05))
+        slow = Tracked(["slow ", "answer"], delay=0.3)
+        start = time.perf_counter()
+
+        call = hedger.call(
+            Attempt("slow", slow), Attempt("fast", fake_stream(FakeListChatModel(responses=["ok"], sleep=0.01)))
+        )
+        answer = "".join(call)
+
+        assert answer == "ok"
+        assert call.winner == "fast" and call.hedged
+        assert time.perf_counter() - start < 0.3
+        assert slow.closed.wait(1.0)
+        assert hedger.stats()["wins"] == {"fast": 1}
+
+    def test_fast_primary_does_not_hedge(self):
+        hedger = Hedger(HedgePolicy(secondary="backup", initial_delay=0.2))
+        backup = Tracked(["backup"])
+
+        call = hedger.call(
+            Attempt("main", fake_stream(FakeListChatModel(responses=["main answer"], sleep=0.01))),
+            Attempt("backup", backup),
+        )
+
+        assert "".join(call) == "main answer"
+        assert call.winner == "main" and not call.hedged
+        time.sleep(0.3)
+        assert not backup.started.is_set()
+        assert hedger.stats()["hedges"] == 0
+
+    def test_primary_failure_falls_back_immediately(self):
+        hedger = Hedger(HedgePolicy(secondary="backup", initial_delay=5.0))
+        start = time.perf_counter()
+
+        call = hedger.call(
+            Attempt("main", Tracked(["x"], error=RuntimeError("connection refused"))),
+            Attempt("backup", Tracked(["backup answer"])),
+        )
+
+        assert "".join(call) == "backup answer"
+        assert call.winner == "backup" and call.hedged
+        assert isinstance(call.errors["main"], RuntimeError)
+        assert time.perf_counter() - start < 1.0
+
+    def test_both_failing_raises_primary_error(self):
+        hedger = Hedger(HedgePolicy(secondary="backup", initial_delay=0.01))
+
+        call = hedger.call(
+            Attempt("main", Tracked(["x"], delay=0.05, error=RuntimeError("main down"))),
+            Attempt("backup", Tracked(["x"], error=ValueError("backup down"))),
+        )
+
+        with pytest.raises(RuntimeError, match="main down"):
+            list(call)
+
+    def test_complete_mode_takes_first_to_finish(self):
+        hedger = Hedger(HedgePolicy(secondary="backup", initial_delay=0.05))
+        backup = Tracked(["b"] * 20, delay=0.05)
+
+        # The primary starts late but finishes long before the hedge does.
+        call = hedger.call(
+            Attempt("main", Tracked(["a", "b", "c"], delay=0.1)), Attempt("backup", backup), wait_for=COMPLETE
+        )
+
+        assert list(call) == ["abc"]
+        assert call.winner == "main" and call.hedged
+        assert backup.closed.wait(1.0)
+
+    def test_delay_follows_first_token_percentile(self):
+        hedger = Hedger(HedgePolicy(secondary="backup", percentile=95, initial_delay=2.0, min_samples=5))
+        assert hedger.delay("main") == 2.0
+
+        for sec in (0.1, 0.2, 0.3, 0.4, 1.0):
+            hedger.observe("main", sec)
+
+        assert hedger.delay("main") == pytest.approx(1.0)
+        assert hedger.delay("other") == 2.0
+
+    def test_first_token_latency_is_recorded(self):
+        hedger = Hedger(HedgePolicy(secondary="backup"))
+
+        list(hedger.call(Attempt("main", Tracked(["a", "b"], delay=0.02)), wait_for=FIRST_TOKEN))
+
+        assert hedger.stats()["first_token_ms"]["main"]["count"] == 1
+
+    def test_build_hedger_from_settings(self):
+        settings = Settings()
+        settings.llm_hedge_model = ""
+        assert build_hedger(settings) is None
+
+        settings.llm_hedge_model = "ollama-mistral"
+        settings.llm_hedge_percentile = 90
+        hedger = build_hedger(settings)
+        assert hedger.policy.secondary == "ollama-mistral"
+        assert hedger.policy.percentile == 90
+
+    def test_latency_history_outlives_pipelines(self, pipeline):
+        from app.pipeline import Pipeline
+
+        pipeline.settings.llm_hedge_model = "ollama-mistral"
+        with patch("app.pipeline.get_settings", return_value=pipeline.settings):
+            first, second = Pipeline(), Pipeline()
+        first.hedger.observe("ollama-llama2", 0.5)
+
+        assert first.hedger is second.hedger
+        assert second.hedger.latency.quantile("ollama-llama2", 50) == 500.0
+
+
+class TestPipelineHedging:
+    """Test hedged generation through the pipeline."""
+
+    @pytest.fixture
+    def hedged(self, pipeline):
+        models = {
+            "ollama-llama2": FakeListChatModel(responses=["slow answer"], sleep=0.2),
+            "ollama-mistral": FakeListChatModel(responses=["fast answer"], sleep=0.01),
+        }
+        pipeline.llm_registry.get = MagicMock(side_effect=models.get)
+        pipeline.hedger = Hedger(HedgePolicy(secondary="ollama-mistral", initial_delay=0.05))
+        return pipeline
+
+    def test_generate_records_winning_model(self, hedged):
+        context = hedged.retrieve("Top electronics in SP?", retrieval="baseline")
+
+        result = hedged.generate(context, "ollama-llama2")
+
+        assert result.answer == "fast answer"
+        assert result.answered_by == "ollama-mistral"
+        assert result.hedged
+        assert result.metrics["hedge_delay_sec"] == pytest.approx(0.05)
+        assert "queue_wait_sec" in result.metrics
+        assert "llm_attempt" in [span.name for span in result.spans]
+
+    def test_stream_records_winning_model(self, hedged):
+        context = hedged.retrieve("Top electronics in SP?", retrieval="baseline")
+
+        stream = hedged.generate_stream(context, "ollama-llama2")
+        answer = "".join(stream)
+
+        assert answer == "fast answer"
+        assert stream.result.answered_by == "ollama-mistral"
+        assert stream.result.hedged
+
+    def test_hedge_model_itself_is_not_hedged(self, hedged):
+        context = hedged.retrieve("Top electronics in SP?", retrieval="baseline")
+
+        result = hedged.generate(context, "ollama-mistral")
+
+        assert result.answered_by == "ollama-mistral"
+        assert not result.hedged
@@ -0,0 +1,207 @@
+import pathlib
+import sys
+import threading
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1] / "src"
+sys.path.append(str(ROOT))
+
+import pytest
+from app.config import Settings
+from app.llm_scheduler import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    BackendLimits,
+    BackendScheduler,
+    LLMScheduler,
+    SchedulerRejected,
+    TokenBucket,
+    build_scheduler,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def wait_until(predicate, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < end, "condition not reached"
+        time.sleep(0.005)
+
+
+class TestTokenBucket:
+    """Test the request-rate limiter."""
+
+    def test_burst_then_wait(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2.0, burst=2, clock=clock)
+
+        assert bucket.reserve() == 0.0
+        assert bucket.reserve() == 0.0
+        assert bucket.reserve() == pytest.approx(0.5)
+        assert bucket.reserve() == pytest.approx(1.0)
+
+    def test_refills_over_time(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1.0, burst=1, clock=clock)
+        bucket.reserve()
+
+        assert bucket.wait_for() == pytest.approx(1.0)
+        clock.now = 1.0
+        assert bucket.wait_for() == 0.0
+        clock.now = 10.0
+        assert bucket.tokens <= 1
+
+
+class TestBackendScheduler:
+    """Test concurrency limits, priority order and deadlines."""
+
+    def test_concurrency_is_bounded(self):
+        scheduler = BackendScheduler("ollama", BackendLimits(max_concurrency=2))
+        lock = threading.Lock()
+        active = [0]
+        peak = [0]
+
+        def call():
+            with scheduler.slot(priority=PRIORITY_BATCH):
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                time.sleep(0.05)
+                with lock:
+                    active[0] -= 1
+
+        threads = [threading.Thread(target=call) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert peak[0] == 2
+        stats = scheduler.stats()
+        assert stats["admitted"] == 6
+        assert stats["running"] == 0 and stats["queued"] == 0
+        assert stats["wait_max_ms"] > 0
+
+    def test_interactive_runs_before_queued_batch(self):
+        scheduler = BackendScheduler("openai", BackendLimits(max_concurrency=1))
+        release = threading.Event()
+        order = []
+
+        def holder():
+            with scheduler.slot(priority=PRIORITY_BATCH):
+                release.wait(2)
+
+        def call(name, priority):
+            with scheduler.slot(priority=priority):
+                order.append(name)
+
+        threads = [threading.Thread(target=holder)]
+        threads[0].start()
+        wait_until(lambda: scheduler.running == 1)
+        for i in range(3):
+            threads.append(threading.Thread(target=call, args=(f"batch-{i}", PRIORITY_BATCH)))
+            threads[-1].start()
+        wait_until(lambda: scheduler.stats()["queued"] == 3)
+        threads.append(threading.Thread(target=call, args=("interactive", PRIORITY_INTERACTIVE)))
+        threads[-1].start()
+        wait_until(lambda: scheduler.stats()["queued"] == 4)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert order == ["interactive", "batch-0", "batch-1", "batch-2"]
+
+    def test_rejects_when_estimated_wait_exceeds_deadline(self):
+        scheduler = BackendScheduler("openai", BackendLimits(max_concurrency=1))
+        scheduler.service_sec = 5.0
+
+        with scheduler.slot():
+            start = time.perf_counter()
+            with pytest.raises(SchedulerRejected):
+                with scheduler.slot(deadline=1.0):
+                    pass
+            assert time.perf_counter() - start < 0.5
+
+        assert scheduler.stats()["rejected"] == 1
+
+    def test_rejects_after_waiting_past_deadline(self):
+        scheduler = BackendScheduler("openai", BackendLimits(max_concurrency=1))
+        # Estimate says the slot frees up quickly, but the call holding it runs long.
+        scheduler.service_sec = 0.01
+
+        with scheduler.slot():
+            with pytest.raises(SchedulerRejected):
+                with scheduler.slot(deadline=0.1):
+                    pass
+
+        assert scheduler.stats()["queued"] == 0
+        with scheduler.slot(deadline=0.1) as waited:
+            assert waited < 0.1
+
+    def test_rate_limit_delays_start(self):
+        clock = FakeClock()
+        scheduler = BackendScheduler(
+            "openai",
+            BackendLimits(max_concurrency=1, requests_per_minute=60),
+            clock=clock,
+            sleep=clock.sleep,
+        )
+
+        waits = []
+        for _ in range(3):
+            with scheduler.slot() as waited:
+                waits.append(waited)
+
+        # Burst of one (the concurrency), then one request per second.
+        assert waits == [0.0, pytest.approx(1.0), pytest.approx(1.0)]
+        assert scheduler.estimate_wait() == pytest.approx(1.0)
+
+    def test_rate_limit_estimate_rejects(self):
+        clock = FakeClock()
+        scheduler = BackendScheduler(
+            "openai", BackendLimits(max_concurrency=1, requests_per_minute=6), clock=clock, sleep=clock.sleep
+        )
+        with scheduler.slot():
+            pass
+
+        with pytest.raises(SchedulerRejected):
+            with scheduler.slot(deadline=5.0):
+                pass
+        with scheduler.slot(priority=PRIORITY_BATCH) as waited:
+            assert waited == pytest.approx(10.0)
+
+
+class TestLLMScheduler:
+    """Test per-backend scheduler setup."""
+
+    def test_backends_are_independent(self):
+        scheduler = LLMScheduler({"ollama": BackendLimits(max_concurrency=1)})
+
+        with scheduler.slot("ollama"):
+            with scheduler.slot("openai", deadline=0.1) as waited:
+                assert waited < 0.1
+
+        stats = scheduler.stats()
+        assert stats["ollama"]["max_concurrency"] == 1
+        assert stats["openai"]["max_concurrency"] == BackendLimits().max_concurrency
+
+    def test_build_scheduler_uses_settings(self):
+        settings = Settings()
+        settings.ollama_max_concurrency = 1
+        settings.openai_rpm = 120
+
+        scheduler = build_scheduler(settings)
+
+        assert scheduler.backend("ollama").limits.max_concurrency == 1
+        assert scheduler.backend("openai").bucket.rate == pytest.approx(2.0)
+        assert scheduler.backend("huggingface").bucket is None
@@ -0,0 +1,188 @@
+import os
+import pathlib
+import sys
+import threading
+
+ROOT = pathlib.Path(__file__).resolve().parents[1] / "src"
+sys.path.append(str(ROOT))
+
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+from app.config import EmbeddingModelConfig, Settings
+from app.vector_index import LocalVectorIndex, export_index
+
+
+def make_catalog(n=400, dims=16, seed=1):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dims)).astype(np.float32)
+    keys = [f"p{i:04d}" for i in range(n)]
+    items = [{"product_id": k, "price": float(i)} for i, k in enumerate(keys)]
+    return keys, vectors, items
+
+
+class TestLocalVectorIndex:
+    """Test the in-process vector index against brute-force cosine."""
+
+    def test_exact_search_matches_bruteforce(self, tmp_path):
+        keys, vectors, items = make_catalog()
+        index = LocalVectorIndex(str(tmp_path)).build(keys, vectors, items)
+        query = vectors[7] + 0.01
+
+        rows = index.search(query.tolist(), top_k=5)
+
+        normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        cos = normed @ (query / np.linalg.norm(query))
+        expected = [keys[i] for i in np.argsort(-cos)[:5]]
+        assert [r["item"]["product_id"] for r in rows] == expected
+        assert rows[0]["score"] == pytest.approx((1 + cos.max()) / 2, rel=1e-5)
+        assert set(rows[0]) == {"item", "score"}
+
+    def test_index_is_memory_mapped_and_reloadable(self, tmp_path):
+        keys, vectors, items = make_catalog(n=50)
+        LocalVectorIndex(str(tmp_path)).build(keys, vectors, items, dtype="float16")
+
+        reloaded = LocalVectorIndex(str(tmp_path)).load()
+        assert isinstance(reloaded.vectors, np.memmap)
+        assert reloaded.vectors.dtype == np.float16
+        assert reloaded.search(vectors[3].tolist(), top_k=1)[0]["item"]["product_id"] == "p0003"
+
+    def test_ivf_mode_finds_nearest_neighbour(self, tmp_path):
+        keys, vectors, items = make_catalog(n=1000)
+        LocalVectorIndex(str(tmp_path)).build(keys, vectors, items, nlist=16)
+        index = LocalVectorIndex(str(tmp_path), mode="ivf", nprobe=4).load()
+
+        hits = 0
+        for i in range(0, 1000, 50):
+            top = index.search(vectors[i].tolist(), top_k=1)
+            hits += top[0]["item"]["product_id"] == keys[i]
+        assert hits == 20
+
+    def test_upsert_replaces_and_appends(self, tmp_path):
+        keys, vectors, items = make_catalog(n=10)
+        index = LocalVectorIndex(str(tmp_path)).build(keys, vectors, items)
+        new_vec = np.ones((2, vectors.shape[1]), dtype=np.float32)
+        index.upsert(["p0002", "p9999"], new_vec, [{"product_id": "p0002", "v": 2}, {"product_id": "p9999"}])
+
+        assert index.meta["count"] == 11
+        top = index.search(np.ones(vectors.shape[1]).tolist(), top_k=2)
+        assert {r["item"]["product_id"] for r in top} == {"p0002", "p9999"}
+
+    def test_remove_drops_rows(self, tmp_path):
+        keys, vectors, items = make_catalog(n=10)
+        index = LocalVectorIndex(str(tmp_path)).build(keys, vectors, items)
+
+        assert index.remove(["p0003", "nope"]) == 1
+        assert index.meta["count"] == 9 and "p0003" not in index.keys
+        assert index.search(vectors[3].tolist(), top_k=1)[0]["item"]["product_id"] != "p0003"
+        assert index.remove([]) == 0
+
+    def test_search_validation(self, tmp_path):
+        keys, vectors, items = make_catalog(n=5)
+        index = LocalVectorIndex(str(tmp_path)).build(keys, vectors, items)
+        with pytest.raises(ValueError, match="Vector cannot be empty"):
+            index.search([])
+        with pytest.raises(ValueError, match="top_k must be at least 1"):
+            index.search([0.1] * 16, top_k=0)
+
+
+    def test_search_during_reload_uses_one_generation(self, tmp_path):
+        generations = {}
+        for name, n, seed in (("small", 20, 1), ("large", 400, 2)):
+            keys, vectors, items = make_catalog(n=n, seed=seed)
+            generations[name] = (keys, vectors, [dict(item, gen=name) for item in items])
+        writer = LocalVectorIndex(str(tmp_path)).build(*generations["small"])
+        reader = LocalVectorIndex(str(tmp_path)).load()
+        query = generations["large"][1][5]
+        errors = []
+        stop = threading.Event()
+
+        def search():
+            while not stop.is_set():
+                try:
+                    for row in reader.search(query.tolist(), top_k=3):
+                        # The hit's item must be the row its score was computed on.
+                        keys, vectors, _ = generations[row["item"]["gen"]]
+                        vector = vectors[keys.index(row["item"]["product_id"])]
+                        cos = vector @ query / (np.linalg.norm(vector) * np.linalg.norm(query))
+                        assert row["score"] == pytest.approx((1 + cos) / 2, abs=1e-5)
+                except Exception as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=search) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for i in range(20):
+            writer.build(*generations["large" if i % 2 == 0 else "small"])
+            reader.load()
+        stop.set()
+        for t in threads:
+            t.join()
+
+        assert errors == []
+
+    def test_reload_keeps_snapshot_while_files_disagree(self, tmp_path):
+        keys, vectors, items = make_catalog(n=10)
+        index = LocalVectorIndex(str(tmp_path)).build(keys, vectors, items)
+        # vectors.npy already replaced by a bigger refresh, meta.json not yet.
+        np.save(tmp_path / "vectors.npy", np.ones((12, vectors.shape[1]), dtype=np.float32))
+        (tmp_path / "meta.json").touch()
+        os.utime(tmp_path / "meta.json", (0, 0))
+
+        index.reload_if_changed()
+
+        assert len(index.keys) == len(index.vectors) == 10
+
+class TestExport:
+    def test_export_pages_by_key(self, tmp_path):
+        settings = Settings()
+        settings.local_index_dir = str(tmp_path)
+        config = EmbeddingModelConfig("m", "model", "idx", "embedding")
+        pages = [
+            [{"key": "a", "vector": [1.0, 0.0], "item": {"product_id": "a", "embedding": None}, "stamp": 1},
+             {"key": "b", "vector": [0.0, 1.0], "item": {"product_id": "b", "embedding": None}, "stamp": 2}],
+            [{"key": "c", "vector": [1.0, 1.0], "item": {"product_id": "c", "embedding": None}, "stamp": 3}],
+            [],
+        ]
+        client = MagicMock()
+        client.run_query.side_effect = pages
+
+        index = export_index(client, settings, config, batch_size=2)
+
+        assert index.keys == ["a", "b", "c"]
+        assert index.meta["watermark"] == 3
+        assert "embedding" not in index.items[0]
+        assert client.run_query.call_args_list[1][0][1]["after"] == "b"
+
+    def test_pages_skip_null_keys(self, tmp_path):
+        settings = Settings()
+        settings.local_index_dir = str(tmp_path)
+        config = EmbeddingModelConfig("m", "model", "idx", "embedding")
+        client = MagicMock()
+        client.run_query.side_effect = [[], []]
+
+        export_index(client, settings, config)
+
+        assert ".`product_id` IS NOT NULL" in client.run_query.call_args_list[0][0][0]
+
+    def test_refresh_drops_nodes_that_lost_their_embedding(self, tmp_path):
+        settings = Settings()
+        settings.local_index_dir = str(tmp_path)
+        config = EmbeddingModelConfig("m", "model", "idx", "embedding")
+        client = MagicMock()
+        client.run_query.side_effect = [
+            [{"key": k, "vector": [1.0, float(i)], "item": {"product_id": k}, "stamp": 1} for i, k in enumerate("abc")],
+            [],
+        ]
+        export_index(client, settings, config)
+
+        client.run_query.side_effect = [
+            [{"key": "d", "vector": [0.0, 1.0], "item": {"product_id": "d"}, "stamp": 5}],
+            [],
+            [{"key": "a"}, {"key": "c"}, {"key": "d"}],
+            [],
+        ]
+        index = export_index(client, settings, config, incremental=True)
+
+        assert index.keys == ["a", "c", "d"]
+        assert index.meta["watermark"] == 5
@@ -0,0 +1,112 @@
+import pathlib
+import re
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parents[1] / "src"
+sys.path.append(str(ROOT))
+
+from unittest.mock import MagicMock
+from app.entities import EntityResult
+from app.migrations import (
+    CANONICAL_SCHEMA_VERSION,
+    MIGRATIONS,
+    REDERIVE_ORDERS,
+    canonical_schema_version,
+    migrate,
+    rederive_orders,
+)
+from app.queries import CANONICAL_QUERY_LIBRARY, QUERY_LIBRARY, build_query
+
+LEGACY_ALIASES = [
+    "order_purchase_timestamp",
+    "order_delivered_customer_date",
+    "order_estimated_delivery_date",
+    "reviewScore",
+    "sellerId",
+    "oi.seller)",
+    "duration.inDays",
+]
+
+
+def params_of(template):
+    return set(re.findall(r"\$(\w+)", template))
+
+
+class TestMigrationJob:
+    """Test the normalization job against a recording client."""
+
+    def test_runs_every_migration_then_records_schema(self):
+        client = MagicMock()
+        migrate(client, batch_size=500)
+
+        calls = client.run_query.call_args_list
+        assert [c.args[0] for c in calls[: len(MIGRATIONS)]] == [m.cypher for m in MIGRATIONS]
+        assert all(c.args[1] == {"batch_size": 500} for c in calls[: len(MIGRATIONS)])
+        assert calls[-1].args[1] == {"version": CANONICAL_SCHEMA_VERSION}
+        client.bump_data_version.assert_called_once()
+
+    def test_drop_legacy_removes_aliases(self):
+        client = MagicMock()
+        migrate(client, drop_legacy=True)
+
+        statements = [c.args[0] for c in client.run_query.call_args_list]
+        assert all(m.drop in statements for m in MIGRATIONS)
+
+    def test_statements_are_batched(self):
+        for migration in MIGRATIONS:
+            assert "IN TRANSACTIONS OF $batch_size ROWS" in migration.cypher
+            assert "IN TRANSACTIONS OF $batch_size ROWS" in migration.drop
+
+    def test_rederive_prefers_raw_loader_fields(self):
+        client = MagicMock()
+        assert rederive_orders(client, ["a", "b", "c"], batch_size=2) == 3
+
+        batches = [c.args[1]["ids"] for c in client.run_query.call_args_list]
+        assert batches == [["a", "b"], ["c"]]
+        assert "coalesce(o.order_delivered_customer_date, o.delivery_date)" in REDERIVE_ORDERS
+        assert "coalesce(o.delivery_date, o.order_delivered_customer_date)" in MIGRATIONS[0].cypher
+        assert "oi.seller_id = coalesce(oi.sellerId, oi.seller, oi.seller_id)" in REDERIVE_ORDERS
+
+    def test_review_score_prefers_review_nodes(self):
+        for statement in (MIGRATIONS[1].cypher, REDERIVE_ORDERS):
+            assert "avg(r.review_score) AS review_avg" in statement
+            assert "o.review_score_canonical = toFloat(coalesce(review_avg, o.review_score, o.reviewScore))" in statement
+
+    def test_loader_review_score_is_kept(self):
+        for statement in [m.cypher for m in MIGRATIONS] + [REDERIVE_ORDERS]:
+            assert not re.search(r"o\.review_score\s*=", statement)
+        assert "SET o.review_score = coalesce(o.review_score, o.reviewScore) REMOVE o.reviewScore" in MIGRATIONS[1].drop
+
+    def test_schema_version_from_graph_meta(self):
+        client = MagicMock()
+        client.graph_meta.return_value = {"canonical_schema": 2, "data_version": 7}
+        assert canonical_schema_version(client) == 2
+
+        client.graph_meta.return_value = {}
+        assert canonical_schema_version(client) == 0
+
+
+class TestCanonicalTemplates:
+    """Test the canonical template variants."""
+
+    def test_variants_do_not_touch_legacy_aliases(self):
+        for intent, template in CANONICAL_QUERY_LIBRARY.items():
+            for alias in LEGACY_ALIASES:
+                assert alias not in template, f"{intent} uses {alias}"
+
+    def test_variants_take_the_same_params(self):
+        for intent, template in CANONICAL_QUERY_LIBRARY.items():
+            assert params_of(template) <= params_of(QUERY_LIBRARY[intent]), intent
+
+    def test_variants_read_the_derived_review_score(self):
+        for intent, template in CANONICAL_QUERY_LIBRARY.items():
+            assert not re.search(r"o\.review_score\b(?!_canonical)", template), intent
+
+    def test_build_query_selects_variant(self):
+        entities = EntityResult()
+        assert build_query("seller_count", entities, canonical=True)["text"] == CANONICAL_QUERY_LIBRARY["seller_count"]
+        assert build_query("seller_count", entities)["text"] == QUERY_LIBRARY["seller_count"]
+
+    def test_intents_without_variant_fall_back(self):
+        query = build_query("customer_behavior", EntityResult(), canonical=True)
+        assert query["text"] == QUERY_LIBRARY["customer_behavior"]
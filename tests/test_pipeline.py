@@ -0,0 +1,246 @@
+import pathlib
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1] / "src"
+sys.path.append(str(ROOT))
+
+import pytest
+from unittest.mock import MagicMock, patch
+from app.pipeline import Pipeline
+
+
+class SlowEmbeddingService:
+    """Stand-in for EmbeddingService with a fixed search latency."""
+
+    delay = 0.2
+
+    def __init__(self, settings, model_key="model_1"):
+        self.model_key = model_key
+
+    def embed_query(self, query):
+        return [0.1, 0.2, 0.3]
+
+    def search_vector(self, client, vector, top_k=10):
+        time.sleep(self.delay)
+        return [{"item": {"id": "p1"}, "score": 0.9}]
+
+    def semantic_search(self, client, query, top_k=10):
+        return self.search_vector(client, self.embed_query(query), top_k)
+
+
+@pytest.fixture
+def pipeline():
+    client = MagicMock()
+
+    def slow_query(text, params=None, intent=None):
+        time.sleep(0.2)
+        return [{"id": "p1", "rating": 4.5}]
+
+    client.run_query.side_effect = slow_query
+    client.graph_meta.return_value = {}
+    with patch("app.pipeline.get_client", return_value=client), \
+         patch("app.pipeline.EmbeddingService", SlowEmbeddingService), \
+         patch("app.pipeline.run_llm", return_value="answer"):
+        pipe = Pipeline()
+        pipe.llm_registry.get = MagicMock(return_value=MagicMock())
+        # Every question gets the same rows and vector here; keep answers uncached.
+        pipe.answer_cache = None
+        yield pipe
+
+
+class TestConcurrentRetrieval:
+    """Test that baseline and vector retrieval run side by side."""
+
+    def test_hybrid_latency_is_max_not_sum(self, pipeline):
+        start = time.perf_counter()
+        result = pipeline.run("Top electronics in SP with rating > 4?", retrieval="hybrid")
+        elapsed = time.perf_counter() - start
+
+        assert result.baseline_rows and result.embed_rows
+        assert result.embed_model_used == "model_1"
+        assert elapsed < 0.35
+
+    def test_branch_timeout_degrades_to_empty(self, pipeline):
+        pipeline.settings.baseline_timeout = 0.05
+        result = pipeline.run("Top electronics in SP with rating > 4?", retrieval="hybrid")
+
+        assert result.baseline_rows == []
+        assert result.embed_rows
+
+    def test_branch_timeouts_do_not_add_up(self, pipeline):
+        futures = [
+            (pipeline.executor.submit(time.sleep, 0.3), time.perf_counter() + 0.1)
+            for _ in range(2)
+        ]
+        start = time.perf_counter()
+        rows = [Pipeline._collect(future, deadline, 0.1, "branch") for future, deadline in futures]
+
+        assert rows == [None, None]
+        assert time.perf_counter() - start < 0.18
+
+    def test_baseline_error_is_swallowed(self, pipeline):
+        pipeline.client.run_query.side_effect = Exception("boom")
+        result = pipeline.run("Top electronics in SP?", retrieval="baseline")
+
+        assert result.baseline_rows == []
+        assert result.answer == "answer"
+
+
+class TestRetrieveGenerateSplit:
+    """Test that comparison runs reuse one retrieval."""
+
+    def test_generate_many_retrieves_once(self, pipeline):
+        context = pipeline.retrieve("Top electronics in SP with rating > 4?", retrieval="hybrid")
+        results = pipeline.generate_many(context, ["ollama-llama2", "ollama-mistral"])
+
+        assert list(results) == ["ollama-llama2", "ollama-mistral"]
+        assert pipeline.client.run_query.call_count == 1
+        assert all(r.answer == "answer" for r in results.values())
+
+    def test_generate_many_reports_model_errors(self, pipeline):
+        def get(key):
+            if key == "bad":
+                raise KeyError("Model 'bad' not registered")
+            return MagicMock()
+
+        pipeline.llm_registry.get = MagicMock(side_effect=get)
+        context = pipeline.retrieve("Top electronics in SP?", retrieval="baseline")
+        results = pipeline.generate_many(context, ["ollama-llama2", "bad"])
+
+        assert results["ollama-llama2"].answer == "answer"
+        assert isinstance(results["bad"], KeyError)
+
+
+class BatchEmbeddingService(SlowEmbeddingService):
+    encode_calls = []
+
+    def embed_queries(self, queries):
+        self.encode_calls.append(list(queries))
+        return [[float(i)] for i, _ in enumerate(queries)]
+
+    def search_vector(self, client, vector, top_k=10):
+        return [{"item": {"id": f"p{int(vector[0])}"}, "score": 0.9}]
+
+
+class TestRunBatch:
+    """Test Pipeline.run_batch grouping and ordering."""
+
+    def test_groups_identical_baseline_queries(self, pipeline):
+        BatchEmbeddingService.encode_calls = []
+        questions = [
+            "How many sellers are there?",
+            "Top electronics in SP?",
+            "How many sellers are there?",
+            "Top electronics in SP?",
+        ]
+        with patch("app.pipeline.EmbeddingService", BatchEmbeddingService):
+            results = pipeline.run_batch(questions, retrieval="hybrid", max_concurrency=2)
+
+        assert len(results) == 4
+        assert [r.intent for r in results] == ["seller_count", "product_search"] * 2
+        assert pipeline.client.run_query.call_count == 2
+        assert len(BatchEmbeddingService.encode_calls) == 1
+        assert [r.embed_rows[0]["item"]["id"] for r in results] == ["p0", "p1", "p2", "p3"]
+
+    def test_errors_are_returned_in_place(self, pipeline):
+        calls = {"n": 0}
+
+        def flaky(**kwargs):
+            calls["n"] += 1
+            if "sellers" in kwargs["question"]:
+                raise RuntimeError("llm down")
+            return "answer"
+
+        with patch("app.pipeline.EmbeddingService", BatchEmbeddingService), \
+             patch("app.pipeline.run_llm", side_effect=flaky):
+            results = pipeline.run_batch(["Top electronics in SP?", "How many sellers are there?"])
+
+        assert results[0].answer == "answer"
+        assert isinstance(results[1], RuntimeError)
+
+
+class TestStreaming:
+    """Test token streaming through Pipeline.generate_stream."""
+
+    def test_stream_yields_tokens_and_records_ttft(self, pipeline):
+        from langchain_core.language_models import FakeListChatModel
+
+        pipeline.llm_registry.get = MagicMock(return_value=FakeListChatModel(responses=["SP leads."]))
+        context = pipeline.retrieve("Top electronics in SP?", retrieval="baseline")
+
+        stream = pipeline.generate_stream(context, "ollama-llama2")
+        tokens = list(stream)
+
+        assert len(tokens) > 1
+        assert "".join(tokens) == "SP leads."
+        assert stream.result.answer == "SP leads."
+        assert 0 <= stream.result.metrics["time_to_first_token_sec"] <= stream.result.metrics["generation_sec"]
+        assert stream.result.baseline_rows == context.baseline_rows
+
+
+class TestContextFormat:
+    """Test the prompt context built by retrieve."""
+
+    def test_compact_context_and_token_metrics(self, pipeline):
+        result = pipeline.run("Top electronics in SP?", retrieval="hybrid")
+        context = pipeline.retrieve("Top electronics in SP?", retrieval="hybrid")
+
+        assert context.context.startswith("Baseline rows (1 rows):\nid | rating")
+        assert "1 already in baseline rows omitted" in context.context
+        assert result.metrics["context_tokens"] > 0
+        assert "context_tokens_saved" in result.metrics
+
+
+class TestConnectionMetrics:
+    """Test LLM connection timing in results."""
+
+    def test_connection_metrics_are_reported(self, pipeline):
+        result = pipeline.run("Top electronics in SP?", retrieval="baseline")
+
+        assert result.metrics["llm_connect_sec"] == 0.0
+        assert result.metrics["llm_new_connections"] == 0
+
+
+class TestLLMScheduling:
+    """Test that LLM calls go through the backend scheduler."""
+
+    def test_queue_wait_is_reported(self, pipeline):
+        result = pipeline.run("Top electronics in SP?", retrieval="baseline")
+
+        assert result.metrics["queue_wait_sec"] >= 0.0
+        assert "llm_queue" in [span.name for span in result.spans]
+        assert sum(stats["admitted"] for stats in pipeline.scheduler.stats().values()) == 1
+
+    def test_busy_backend_rejects_interactive_call(self, pipeline):
+        from app.llm_scheduler import SchedulerRejected
+
+        model_key = next(iter(pipeline.llm_registry.options()))
+        backend = pipeline.scheduler.backend(pipeline.llm_registry.options()[model_key].backend)
+        backend.limits.max_concurrency = 1
+        backend.service_sec = 10.0 * pipeline.settings.llm_queue_deadline
+        context = pipeline.retrieve("Top electronics in SP?", retrieval="baseline")
+
+        with backend.slot():
+            with pytest.raises(SchedulerRejected):
+                pipeline.generate(context, model_key=model_key)
+
+    def test_pipelines_share_backend_limits(self, pipeline):
+        from app.llm_scheduler import SchedulerRejected
+
+        # A second session (e.g. another Streamlit user) in the same process.
+        other = Pipeline()
+        other.llm_registry.get = MagicMock(return_value=MagicMock())
+        model_key = next(iter(pipeline.llm_registry.options()))
+        backend = pipeline.scheduler.backend(pipeline.llm_registry.options()[model_key].backend)
+        backend.limits.max_concurrency = 1
+        backend.service_sec = 10.0 * pipeline.settings.llm_queue_deadline
+        context = other.retrieve("Top electronics in SP?", retrieval="baseline")
+
+        assert other.scheduler is pipeline.scheduler
+        with backend.slot():
+            with pytest.raises(SchedulerRejected):
+                other.generate(context, model_key=model_key)
+            results = pipeline.generate_many(context, [model_key])
+
+        assert isinstance(results[model_key], SchedulerRejected)
@@ -0,0 +1,93 @@
+import json
+import pathlib
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parents[1] / "src"
+sys.path.append(str(ROOT))
+
+from unittest.mock import MagicMock
+from app.profiler import Neo4jRunner, RecordedRunner, compare, main, profile_library, sum_profile
+
+PLAN = {
+    "operatorType": "ProduceResults@neo4j",
+    "rows": 3,
+    "dbHits": 0,
+    "pageCacheHits": 1,
+    "pageCacheMisses": 0,
+    "children": [{"operatorType": "NodeByLabelScan@neo4j", "rows": 3, "dbHits": 40, "pageCacheHits": 9, "pageCacheMisses": 2}],
+}
+
+
+def fake_client(db_hits=40, wall_sec=0.02):
+    client = MagicMock()
+    plan = json.loads(json.dumps(PLAN))
+    plan["children"][0]["dbHits"] = db_hits
+    client.profile.return_value = {"profile": plan, "records": 3, "wall_sec": wall_sec}
+    return client
+
+
+def sample(db_hits=100, wall_ms=20.0):
+    return {"db_hits": db_hits, "rows": 3, "page_cache_hits": 10, "page_cache_misses": 0, "wall_ms": wall_ms}
+
+
+class TestProfileCounters:
+    """Test aggregation of PROFILE output."""
+
+    def test_sum_profile(self):
+        assert sum_profile(PLAN) == {"db_hits": 40, "page_cache_hits": 10, "page_cache_misses": 2, "rows": 3}
+
+    def test_bindings_with_identical_text_run_once(self):
+        client = fake_client()
+        results = profile_library(Neo4jRunner(client), repeat=2, intents=["seller_count", "state_trend"])
+
+        # seller_count has no optional filters: one text for every binding.
+        assert [k for k in results if k.startswith("seller_count/")] == ["seller_count/unfiltered"]
+        assert {"state_trend/unfiltered", "state_trend/state"} <= set(results)
+        assert results["seller_count/unfiltered"]["db_hits"] == 40
+        assert results["seller_count/unfiltered"]["wall_ms"] == 20.0
+
+
+class TestRegressionCheck:
+    """Test threshold comparison against a baseline."""
+
+    def test_within_thresholds(self):
+        assert compare({"a/x": sample()}, {"a/x": sample(db_hits=105, wall_ms=24.0)}) == []
+
+    def test_db_hit_regression(self):
+        regressions = compare({"a/x": sample()}, {"a/x": sample(db_hits=150)})
+        assert regressions == ["a/x: db hits 100 -> 150"]
+
+    def test_latency_regression_needs_absolute_floor(self):
+        assert compare({"a/x": sample(wall_ms=1.0)}, {"a/x": sample(wall_ms=3.0)}) == []
+        assert len(compare({"a/x": sample(wall_ms=20.0)}, {"a/x": sample(wall_ms=40.0)})) == 1
+
+
+class TestRecordedStandIn:
+    """Test record/replay and the CLI exit codes."""
+
+    def test_replay_matches_live_run(self, tmp_path):
+        recording = str(tmp_path / "rec.json")
+        live = Neo4jRunner(fake_client(), record_path=recording)
+        expected = profile_library(live, repeat=1, intents=["product_search"])
+        live.save()
+
+        replayed = profile_library(RecordedRunner(recording), repeat=1, intents=["product_search"])
+        assert replayed == expected
+
+    def test_check_fails_on_regression(self, tmp_path, monkeypatch):
+        recording = str(tmp_path / "rec.json")
+        baseline = str(tmp_path / "baseline.json")
+        runner = Neo4jRunner(fake_client(), record_path=recording)
+        profile_library(runner, repeat=1, intents=["delivery_delay"])
+        runner.save()
+
+        assert main(["run", "--replay", recording, "--baseline", baseline, "--repeat", "1", "--intent", "delivery_delay"]) == 0
+        assert main(["check", "--replay", recording, "--baseline", baseline, "--repeat", "1", "--intent", "delivery_delay"]) == 0
+
+        with open(baseline) as f:
+            data = json.load(f)
+        for result in data["results"].values():
+            result["db_hits"] = 10
+        with open(baseline, "w") as f:
+            json.dump(data, f)
+        assert main(["check", "--replay", recording, "--baseline", baseline, "--repeat", "1", "--intent", "delivery_delay"]) == 1
@@ -0,0 +1,164 @@
+import datetime
+import pathlib
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parents[1] / "src"
+sys.path.append(str(ROOT))
+
+import pytest
+import pytz
+from neo4j.time import Date, DateTime, Duration
+from unittest.mock import MagicMock, Mock, patch
+from app.cache import LRUCache, SQLiteStore, TieredCache
+from app.kg_client import KGClient
+from app.query_cache import QueryCache, normalize_params
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLRUCache:
+    """Test size and TTL eviction of the in-memory tier."""
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert "a" in cache
+        assert "b" not in cache
+        assert cache.stats.evictions == 1
+
+    def test_expires_after_ttl(self):
+        clock = FakeClock()
+        cache = LRUCache(maxsize=10, ttl=5, clock=clock)
+        cache.set("a", 1)
+        clock.now = 4
+        assert cache.get("a") == 1
+        clock.now = 6
+        assert cache.get("a") is None
+        assert cache.stats.expirations == 1
+        assert cache.stats.hits == 1
+
+
+class TestTieredCache:
+    def test_disk_tier_survives_restart(self, tmp_path):
+        path = str(tmp_path / "cache.sqlite")
+        first = TieredCache(LRUCache(maxsize=10), SQLiteStore(path))
+        first.set("k", [{"seller": "s1", "avg_score": 4.2}])
+        first.disk.close()
+
+        second = TieredCache(LRUCache(maxsize=10), SQLiteStore(path))
+        assert second.get("k") == [{"seller": "s1", "avg_score": 4.2}]
+        assert second.stats.disk_hits == 1
+        assert second.stats.misses == 0
+        # Promoted to memory
+        assert second.get("k") is not None
+        assert second.stats.hits == 1
+
+
+class TestQueryCache:
+    """Test the Cypher result cache keyed by intent and bound parameters."""
+
+    def test_normalize_params(self):
+        assert normalize_params({"state": " SP ", "min_rating": 4}) == {"min_rating": 4.0, "state": "SP"}
+
+    def test_repeat_query_hits_cache(self):
+        cache = QueryCache(maxsize=10)
+        runner = Mock(return_value=[{"seller": "s1"}])
+        params = {"state": "SP", "min_reliability": None}
+
+        first = cache.get_or_run("seller_performance", "MATCH ...", params, "neo4j", runner)
+        second = cache.get_or_run("seller_performance", "MATCH ...", dict(params), "neo4j", runner)
+
+        assert first == second
+        assert runner.call_count == 1
+        assert cache.stats.hits == 1
+        assert cache.stats.misses == 1
+
+    def test_callers_get_their_own_rows(self):
+        cache = QueryCache(maxsize=10)
+        runner = Mock(return_value=[{"seller": "s1", "states": ["SP"]}])
+
+        first = cache.get_or_run("seller_performance", "MATCH ...", {}, "neo4j", runner)
+        first[0]["states"].append("RJ")
+        second = cache.get_or_run("seller_performance", "MATCH ...", {}, "neo4j", runner)
+        second.clear()
+
+        assert cache.get_or_run("seller_performance", "MATCH ...", {}, "neo4j", runner) == [
+            {"seller": "s1", "states": ["SP"]}
+        ]
+
+    def test_disk_hit_keeps_temporal_types(self, tmp_path):
+        path = str(tmp_path / "queries.db")
+        row = {
+            "purchase_date": Date(2018, 2, 1),
+            "delivered_at": DateTime(2018, 2, 8, 13, 5, 1, 123456789, tzinfo=pytz.FixedOffset(-180)),
+            "local": DateTime(2018, 2, 8, 13, 5),
+            "delay": Duration(days=2, seconds=30),
+            "loaded": datetime.date(2018, 1, 1),
+        }
+        QueryCache(path=path).get_or_run("delivery_delay", "MATCH ...", {}, "neo4j", Mock(return_value=[row]))
+        runner = Mock()
+
+        rows = QueryCache(path=path).get_or_run("delivery_delay", "MATCH ...", {}, "neo4j", runner)
+
+        runner.assert_not_called()
+        assert rows == [row]
+        assert {k: type(v) for k, v in rows[0].items()} == {k: type(v) for k, v in row.items()}
+
+    def test_different_database_or_params_miss(self):
+        cache = QueryCache(maxsize=10)
+        runner = Mock(return_value=[])
+        cache.get_or_run("state_trend", "MATCH ...", {"state": "SP"}, "neo4j", runner)
+        cache.get_or_run("state_trend", "MATCH ...", {"state": "RJ"}, "neo4j", runner)
+        cache.get_or_run("state_trend", "MATCH ...", {"state": "SP"}, "other", runner)
+
+        assert runner.call_count == 3
+
+    def test_data_version_bump_invalidates(self):
+        version = {"value": 1}
+        cache = QueryCache(maxsize=10, version_loader=lambda: version["value"], version_check_interval=0)
+        runner = Mock(return_value=[{"n": 1}])
+        cache.get_or_run("seller_count", "MATCH ...", {}, "neo4j", runner)
+        cache.get_or_run("seller_count", "MATCH ...", {}, "neo4j", runner)
+        assert runner.call_count == 1
+
+        version["value"] = 2
+        cache.get_or_run("seller_count", "MATCH ...", {}, "neo4j", runner)
+        assert runner.call_count == 2
+        assert cache.data_version == 2
+
+    def test_explicit_invalidate(self):
+        cache = QueryCache(maxsize=10)
+        runner = Mock(return_value=[])
+        cache.get_or_run("seller_count", "MATCH ...", {}, "neo4j", runner)
+        cache.invalidate()
+        cache.get_or_run("seller_count", "MATCH ...", {}, "neo4j", runner)
+        assert runner.call_count == 2
+
+
+class TestKGClientCaching:
+    def test_run_query_uses_cache_only_with_intent(self):
+        settings = Mock()
+        settings.neo4j_database = "neo4j"
+        with patch("app.kg_client.GraphDatabase") as mock_db:
+            mock_session = MagicMock()
+            mock_db.driver.return_value.session.return_value.__enter__.return_value = mock_session
+            record = MagicMock()
+            record.data.return_value = {"seller_count": 3}
+            mock_session.run.return_value = [record]
+
+            client = KGClient(settings, query_cache=QueryCache(maxsize=10))
+            client.run_query("MATCH ...", {}, intent="seller_count")
+            client.run_query("MATCH ...", {}, intent="seller_count")
+            client.run_query("MATCH ...", {})
+
+            assert mock_session.run.call_count == 2
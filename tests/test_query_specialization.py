@@ -0,0 +1,234 @@
+import dataclasses
+import itertools
+import json
+import os
+import pathlib
+import re
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parents[1] / "src"
+sys.path.append(str(ROOT))
+
+import pytest
+from app.config import get_settings
+from app.entities import EntityResult
+from app.queries import (
+    CANONICAL_QUERY_LIBRARY,
+    QUERY_LIBRARY,
+    ROLLUP_QUERY_LIBRARY,
+    build_query,
+    specialize_template,
+)
+
+ALL_TEMPLATES = {
+    **{f"base:{k}": v for k, v in QUERY_LIBRARY.items()},
+    **{f"canonical:{k}": v for k, v in CANONICAL_QUERY_LIBRARY.items()},
+    **{f"rollup:{k}": v for k, v in ROLLUP_QUERY_LIBRARY.items()},
+}
+
+# Entity values that match part of the fixture graph below.
+VALUES = {
+    "category": "eletronicos",
+    "state": "SP",
+    "city": "campinas",
+    "min_rating": 4.0,
+    "min_reliability": 0.5,
+    "start_date": "2018-01-01",
+    "end_date": "2018-06-30",
+    "product": "phone",
+}
+
+
+def guarded_params(template):
+    return sorted(set(re.findall(r"\$(\w+)\s+IS\s+NULL\s+OR", template)))
+
+
+def entity_combinations(template):
+    """Every subset of the template's optional filters set, the rest None."""
+    names = guarded_params(template)
+    for size in range(len(names) + 1):
+        for subset in itertools.combinations(names, size):
+            yield EntityResult(**{name: VALUES[name] for name in subset})
+
+
+def build(name, entities, specialize=True):
+    """``build_query`` for an ``ALL_TEMPLATES`` key."""
+    library, intent = name.split(":", 1)
+    return build_query(
+        intent, entities, canonical=library == "canonical", rollups=library == "rollup", specialize=specialize
+    )
+
+
+def guards(template):
+    """(param, predicate) of every ``($param IS NULL OR predicate)`` group."""
+    found = []
+    for match in re.finditer(r"\(\s*\$(\w+)\s+IS\s+NULL\s+OR\s+", template):
+        depth = 0
+        for end in range(match.start(), len(template)):
+            depth += {"(": 1, ")": -1}.get(template[end], 0)
+            if depth == 0:
+                break
+        found.append((match.group(1), template[match.end():end]))
+    return found
+
+
+def normalized(text):
+    return re.sub(r"\(\s+", "(", re.sub(r"\s+\)", ")", " ".join(text.split())))
+
+
+def referenced_params(text):
+    return set(re.findall(r"\$(\w+)", text))
+
+
+def clauses(text):
+    """Clause keywords in order, WHERE excluded."""
+    return re.findall(r"\b(OPTIONAL MATCH|MATCH|(?<!STARTS )(?<!ENDS )WITH|RETURN|ORDER BY|UNWIND|LIMIT)\b", text)
+
+
+class TestSpecializedText:
+    """Test the text of predicate-specialized queries."""
+
+    def test_no_catch_all_predicates_remain(self):
+        for name, template in ALL_TEMPLATES.items():
+            for entities in entity_combinations(template):
+                present = frozenset(k for k, v in entities.to_params().items() if v is not None)
+                text = specialize_template(template, present)
+                assert "IS NULL OR" not in text, name
+                assert not re.search(r"\bWHERE\s+true\b|\bAND\s+true\b", text), name
+
+    def test_only_present_params_are_referenced(self):
+        entities = EntityResult(category="eletronicos", min_rating=4.0)
+        text = build_query("product_search", entities)["text"]
+
+        assert "$category" in text and "$min_rating" in text
+        assert "$state" not in text and "$city" not in text
+
+    def test_all_null_drops_the_where_clause(self):
+        text = build_query("recommendation", EntityResult())["text"]
+        _, _, after = text.partition("WITH p, c, avg(")
+        assert "WHERE" not in after.split("RETURN")[0]
+
+    def test_first_clause_absent_keeps_following_ones(self):
+        text = build_query("delivery_delay", EntityResult(end_date="2018-06-30"))["text"]
+        assert re.search(r"WHERE \(coalesce\(o\.purchase_date", text)
+        assert "$start_date" not in text
+
+    def test_variant_count_is_bounded(self):
+        for name, template in ALL_TEMPLATES.items():
+            texts = {build(name, entities)["text"] for entities in entity_combinations(template)}
+            assert len(texts) <= 2 ** len(guarded_params(template)), name
+
+    def test_same_inputs_reuse_the_cached_text(self):
+        entities = EntityResult(state="SP")
+        first = build_query("state_trend", entities)["text"]
+        assert build_query("state_trend", EntityResult(state="RJ"))["text"] is first
+
+    def test_specialize_false_returns_generic_text(self):
+        assert build_query("product_search", EntityResult(), specialize=False)["text"] == QUERY_LIBRARY["product_search"]
+
+
+class TestSpecializedStructure:
+    """Specialized text keeps the generic query's shape; runs without a database."""
+
+    @pytest.mark.parametrize("name", sorted(ALL_TEMPLATES))
+    def test_structure_matches_generic(self, name):
+        template = ALL_TEMPLATES[name]
+        guarded = {param for param, _ in guards(template)}
+        unguarded = referenced_params(
+            re.sub(r"\$(\w+)\s+IS\s+NULL\s+OR", "", template)
+        ) - guarded
+        for entities in entity_combinations(template):
+            present = {k for k, v in entities.to_params().items() if v is not None}
+            text = build(name, entities)["text"]
+
+            assert clauses(text) == clauses(template), (name, present)
+            assert referenced_params(text) == unguarded | (guarded & present), (name, present)
+            for param, predicate in guards(template):
+                if param in present:
+                    assert "(" + normalized(predicate) + ")" in normalized(text), (name, param)
+
+    @pytest.mark.parametrize("name", sorted(ALL_TEMPLATES))
+    def test_all_present_only_drops_the_null_checks(self, name):
+        template = ALL_TEMPLATES[name]
+        entities = EntityResult(**{param: VALUES[param] for param in guarded_params(template)})
+
+        expected = re.sub(r"\$\w+\s+IS\s+NULL\s+OR\s+", "", template)
+        assert normalized(build(name, entities)["text"]) == normalized(expected)
+
+
+FIXTURE = """
+CREATE (p1:Product {product_id: 'p1', name: 'phone x', product_category_name: 'eletronicos', price: 900.0})
+CREATE (p2:Product {product_id: 'p2', name: 'desk lamp', product_category_name: 'casa', price: 80.0})
+CREATE (p3:Product {product_id: 'p3', name: 'phone case', product_category_name: 'eletronicos', price: 20.0})
+CREATE (c1:Customer {id: 'c1', customer_state: 'SP', customer_city: 'Campinas'})
+CREATE (c2:Customer {id: 'c2', customer_state: 'RJ', customer_city: 'Rio de Janeiro'})
+CREATE (o1:Order {id: 'o1', purchase_date: '2018-02-01', estimated_delivery_date: '2018-02-10',
+                  delivery_date: '2018-02-08', review_score: 5})
+CREATE (o2:Order {id: 'o2', order_purchase_timestamp: '2018-07-03', order_estimated_delivery_date: '2018-07-10',
+                  order_delivered_customer_date: '2018-07-20', reviewScore: 2})
+CREATE (o3:Order {id: 'o3', purchase_date: '2018-03-15', estimated_delivery_date: '2018-03-20',
+                  delivery_date: '2018-03-19'})
+CREATE (c1)-[:PLACED]->(o1), (c2)-[:PLACED]->(o2), (c1)-[:PLACED]->(o3)
+CREATE (o1)-[:CONTAINS]->(:OrderItem {product_id: 'p1', seller_id: 's1', price: 850.0})-[:REFERS_TO]->(p1)
+CREATE (o2)-[:CONTAINS]->(:OrderItem {product_id: 'p2', sellerId: 's2', price: 75.0})-[:REFERS_TO]->(p2)
+CREATE (o3)-[:CONTAINS]->(:OrderItem {product_id: 'p3', seller: 's1'})-[:REFERS_TO]->(p3)
+CREATE (:Review {review_score: 3})-[:REFERS_TO]->(o3)
+"""
+
+
+def canonical_rows(rows):
+    return sorted(json.dumps(row, sort_keys=True, default=str) for row in rows)
+
+
+@pytest.fixture(scope="module")
+def fixture_session():
+    """
+    Session on a disposable Neo4j database given by NEO4J_TEST_URI.
+
+    The fixture graph is migrated and its rollups built, so the canonical and
+    rollup variants have data to return. The fixture refuses to run against a
+    non-empty database and deletes everything it created afterwards.
+    """
+    uri = os.getenv("NEO4J_TEST_URI")
+    if not uri:
+        pytest.skip("NEO4J_TEST_URI not set")
+    from app.kg_client import KGClient
+    from app.migrations import migrate
+    from app.rollups import RollupRefresher
+
+    client = KGClient(
+        dataclasses.replace(
+            get_settings(),
+            neo4j_uri=uri,
+            neo4j_user=os.getenv("NEO4J_TEST_USER", "neo4j"),
+            neo4j_password=os.getenv("NEO4J_TEST_PASSWORD", ""),
+            neo4j_database=os.getenv("NEO4J_TEST_DATABASE", "neo4j"),
+        )
+    )
+    session = client.driver.session(database=client.settings.neo4j_database)
+    if session.run("MATCH (n) RETURN count(n) AS n").single()["n"]:
+        session.close()
+        client.close()
+        pytest.skip("NEO4J_TEST_URI database is not empty")
+    try:
+        session.run(FIXTURE).consume()
+        migrate(client)
+        RollupRefresher(client).refresh(full=True)
+        yield session
+    finally:
+        session.run("MATCH (n) DETACH DELETE n").consume()
+        session.close()
+        client.close()
+
+
+class TestSpecializedParity:
+    """Specialized and generic queries return the same rows on a fixture graph."""
+
+    @pytest.mark.parametrize("name", sorted(ALL_TEMPLATES))
+    def test_same_results_as_generic(self, fixture_session, name):
+        for entities in entity_combinations(ALL_TEMPLATES[name]):
+            generic = build(name, entities, specialize=False)
+            specialized = build(name, entities)
+            expected = fixture_session.run(generic["text"], **generic["params"]).data()
+            actual = fixture_session.run(specialized["text"], **specialized["params"]).data()
+            assert canonical_rows(actual) == canonical_rows(expected), (name, entities)
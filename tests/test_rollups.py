@@ -0,0 +1,154 @@
+import pathlib
+import re
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parents[1] / "src"
+sys.path.append(str(ROOT))
+
+import pytest
+from unittest.mock import MagicMock
+from app.entities import EntityResult
+from app.queries import CANONICAL_QUERY_LIBRARY, QUERY_LIBRARY, ROLLUP_QUERY_LIBRARY, build_query
+from app.migrations import CANONICAL_SCHEMA_VERSION, REDERIVE_ORDERS
+from app.rollups import ROLLUP_SCHEMA_VERSION, UNKNOWN_MONTH, WATERMARK_OVERLAP_MS, RollupRefresher, month_range
+
+
+class FakeGraph:
+    """Answers the refresher's order/month queries and records the rest."""
+
+    def __init__(self, meta, months, touched, moved=None):
+        self.meta = meta
+        self.months = months
+        # {order element id: month before re-deriving}
+        self.touched = touched
+        # Months of the touched orders after re-deriving (defaults to unchanged).
+        self.moved = moved if moved is not None else sorted(set(touched.values()))
+        self.queries = []
+
+    def graph_meta(self):
+        return self.meta
+
+    def run_query(self, query, params=None):
+        params = params or {}
+        self.queries.append((query, params))
+        if "timestamp() AS now" in query:
+            return [{"now": 1_700_000_000_000}]
+        if "$since" in query:
+            return [{"id": k, "month": m} for k, m in self.touched.items()]
+        if "$ids" in query and "SET" not in query:
+            return [{"month": m} for m in self.moved]
+        if "$unknown" in query:
+            return [{"month": m} for m in self.months]
+        return []
+
+    bump_data_version = MagicMock()
+
+    def rebuilt(self):
+        return [params["month"] for query, params in self.queries if "MERGE (s:SellerStats" in query]
+
+    def rederived(self):
+        return [params["ids"] for query, params in self.queries if "$ids" in query and "SET" in query]
+
+
+class TestRollupRefresh:
+    """Test which month partitions a refresh rebuilds."""
+
+    def test_month_range(self):
+        assert month_range("2018-02") == {"start": "2018-02-01", "end": "2018-03-01"}
+        assert month_range("2017-12") == {"start": "2017-12-01", "end": "2018-01-01"}
+        assert month_range(UNKNOWN_MONTH) == {"start": None, "end": None}
+
+    def test_first_refresh_builds_every_month(self):
+        graph = FakeGraph({"canonical_schema": CANONICAL_SCHEMA_VERSION}, ["2018-07", "2018-08", UNKNOWN_MONTH], {})
+        stats = RollupRefresher(graph).refresh()
+
+        assert graph.rebuilt() == ["2018-07", "2018-08", UNKNOWN_MONTH]
+        assert stats["months"] == 3
+
+    def test_incremental_refresh_only_touched_months(self):
+        meta = {"canonical_schema": CANONICAL_SCHEMA_VERSION, "rollup_watermark_ms": 1_600_000_000_000}
+        graph = FakeGraph(meta, ["2018-07", "2018-08"], {"4:abc:1": "2018-08"})
+        RollupRefresher(graph).refresh()
+
+        assert graph.rebuilt() == ["2018-08"]
+        since = [p["since"] for q, p in graph.queries if "$since" in q]
+        assert since == [1_600_000_000_000 - WATERMARK_OVERLAP_MS]
+
+    def test_updated_old_orders_are_rederived_first(self):
+        # A late review on a 2017 order: its stamp is new, its purchase month is not.
+        meta = {"canonical_schema": CANONICAL_SCHEMA_VERSION, "rollup_watermark_ms": 1_600_000_000_000}
+        graph = FakeGraph(meta, ["2017-03", "2018-08"], {"4:abc:1": "2017-03"})
+        RollupRefresher(graph).refresh()
+
+        assert graph.rederived() == [["4:abc:1"]]
+        statements = [q for q, _ in graph.queries]
+        first_merge = next(i for i, q in enumerate(statements) if "MERGE (s:SellerStats" in q)
+        assert statements.index(REDERIVE_ORDERS) < first_merge
+        assert graph.rebuilt() == ["2017-03"]
+
+    def test_touched_query_covers_items_and_reviews(self):
+        meta = {"canonical_schema": CANONICAL_SCHEMA_VERSION, "rollup_watermark_ms": 1_600_000_000_000}
+        graph = FakeGraph(meta, [], {})
+        RollupRefresher(graph).refresh()
+
+        touched = next(q for q, _ in graph.queries if "$since" in q)
+        for pattern in ("o.updated_at >= $since", "oi.updated_at >= $since", "r.updated_at >= $since"):
+            assert pattern in touched
+        assert graph.rederived() == [] and graph.rebuilt() == []
+
+    def test_order_moved_to_another_month_rebuilds_both(self):
+        meta = {"canonical_schema": CANONICAL_SCHEMA_VERSION, "rollup_watermark_ms": 1_600_000_000_000}
+        graph = FakeGraph(meta, ["2018-07", "2018-08"], {"4:abc:1": "2018-07"}, moved=["2018-08"])
+        RollupRefresher(graph).refresh()
+
+        assert graph.rebuilt() == ["2018-07", "2018-08"]
+
+    def test_watermark_is_the_refresh_start_time(self):
+        graph = FakeGraph({"canonical_schema": CANONICAL_SCHEMA_VERSION}, ["2018-07"], {})
+        RollupRefresher(graph).refresh()
+
+        assert {"version": ROLLUP_SCHEMA_VERSION, "watermark": 1_700_000_000_000} in [p for _, p in graph.queries]
+
+    def test_full_refresh_ignores_watermark(self):
+        meta = {"canonical_schema": CANONICAL_SCHEMA_VERSION, "rollup_watermark_ms": 1_600_000_000_000}
+        graph = FakeGraph(meta, ["2018-07", "2018-08"], {"4:abc:1": "2018-08"})
+        RollupRefresher(graph).refresh(full=True)
+
+        assert graph.rebuilt() == ["2018-07", "2018-08"]
+
+    def test_stale_partitions_are_deleted_per_month(self):
+        graph = FakeGraph({"canonical_schema": CANONICAL_SCHEMA_VERSION}, ["2018-07"], {})
+        RollupRefresher(graph).refresh()
+
+        merges = [p for q, p in graph.queries if "MERGE (s:" in q]
+        deletes = [(q, p) for q, p in graph.queries if "DETACH DELETE" in q]
+        assert len(deletes) == 2
+        assert all(p["refresh_id"] == merges[0]["refresh_id"] for _, p in deletes)
+        assert "o.purchase_date >= date($start)" in [q for q, _ in graph.queries if "MERGE (s:" in q][0]
+
+    def test_records_rollup_schema(self):
+        graph = FakeGraph({"canonical_schema": CANONICAL_SCHEMA_VERSION}, [], {})
+        RollupRefresher(graph).refresh()
+
+        assert any(p.get("version") == ROLLUP_SCHEMA_VERSION for _, p in graph.queries)
+
+    def test_requires_migration(self):
+        graph = FakeGraph({}, ["2018-07"], {})
+        with pytest.raises(RuntimeError):
+            RollupRefresher(graph).refresh()
+
+
+class TestRollupTemplates:
+    """Test rollup template selection."""
+
+    def test_variants_take_the_same_params(self):
+        for intent, template in ROLLUP_QUERY_LIBRARY.items():
+            assert set(re.findall(r"\$(\w+)", template)) <= set(re.findall(r"\$(\w+)", QUERY_LIBRARY[intent]))
+
+    def test_rollups_take_precedence(self):
+        entities = EntityResult()
+        query = build_query("seller_performance", entities, canonical=True, rollups=True, specialize=False)
+        assert query["text"] == ROLLUP_QUERY_LIBRARY["seller_performance"]
+
+        query = build_query("delivery_delay", entities, canonical=True, rollups=True, specialize=False)
+        assert query["text"] == CANONICAL_QUERY_LIBRARY["delivery_delay"]
@@ -0,0 +1,220 @@
+import http.client
+import json
+import pathlib
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = pathlib.Path(__file__).resolve().parents[1] / "src"
+sys.path.append(str(ROOT))
+
+import pytest
+from unittest.mock import MagicMock, patch
+from langchain_core.language_models import FakeListChatModel
+from app.llm_scheduler import SchedulerRejected
+from app.server import AnswerServer, SharedStream, SingleFlight
+from test_pipeline import pipeline  # noqa: F401  (fixture)
+
+
+@pytest.fixture
+def server(pipeline):
+    app = AnswerServer(pipeline, host="127.0.0.1", port=0, workers=8, access_log=False).start()
+    yield app
+    app.close()
+
+
+def request(server, method, path, body=None):
+    """(status, decoded JSON body) of one request."""
+    host, port = server.httpd.server_address[:2]
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    try:
+        conn.request(method, path, body=json.dumps(body) if body is not None else None)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        conn.close()
+
+
+def status_for_length(server, content_length):
+    """Status of a POST /v1/answer sent with a raw Content-Length header."""
+    host, port = server.httpd.server_address[:2]
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    try:
+        conn.putrequest("POST", "/v1/answer")
+        conn.putheader("Content-Length", content_length)
+        conn.endheaders()
+        return conn.getresponse().status
+    finally:
+        conn.close()
+
+
+def stream_lines(server, body):
+    """Decoded NDJSON lines of a streamed answer."""
+    host, port = server.httpd.server_address[:2]
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    try:
+        conn.request("POST", "/v1/answer/stream", body=json.dumps(body))
+        response = conn.getresponse()
+        assert response.status == 200
+        return [json.loads(line) for line in response.read().splitlines()]
+    finally:
+        conn.close()
+
+
+class TestSingleFlight:
+    """Test coalescing of concurrent identical calls."""
+
+    def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight()
+        calls = []
+
+        def work():
+            calls.append(1)
+            time.sleep(0.2)
+            return "value"
+
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            outcomes = list(pool.map(lambda _: flight.do("k", work), range(5)))
+
+        assert len(calls) == 1
+        assert [value for value, _ in outcomes] == ["value"] * 5
+        assert sorted(shared for _, shared in outcomes) == [False, True, True, True, True]
+        assert flight.stats() == {"in_flight": 0, "executions": 1, "coalesced": 4}
+
+    def test_finished_calls_are_not_reused(self):
+        flight = SingleFlight()
+
+        assert flight.do("k", lambda: 1) == (1, False)
+        assert flight.do("k", lambda: 2) == (2, False)
+
+    def test_error_reaches_every_caller(self):
+        flight = SingleFlight()
+        started = threading.Event()
+
+        def fail():
+            started.set()
+            time.sleep(0.1)
+            raise RuntimeError("boom")
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leader = pool.submit(flight.do, "k", fail)
+            started.wait(1.0)
+            follower = pool.submit(flight.do, "k", lambda: "unused")
+            for future in (leader, follower):
+                with pytest.raises(RuntimeError, match="boom"):
+                    future.result()
+
+    def test_late_stream_reader_gets_every_chunk(self):
+        stream = SharedStream()
+        stream.publish("a")
+        stream.publish("b")
+        reader = iter(stream)
+        assert next(reader) == "a"
+
+        stream.publish("c")
+        stream.finish(None)
+
+        assert list(reader) == ["b", "c"]
+        assert list(stream) == ["a", "b", "c"]
+
+
+class TestAnswerServer:
+    """Test the HTTP API against a running server."""
+
+    def test_answer_returns_result_json(self, server):
+        status, payload = request(server, "POST", "/v1/answer", {"question": "Top electronics in SP?", "retrieval": "baseline"})
+
+        assert status == 200
+        assert payload["answer"] == "answer"
+        assert payload["baseline_rows"] == [{"id": "p1", "rating": 4.5}]
+        assert payload["coalesced"] is False
+
+    def test_identical_requests_are_coalesced(self, server, pipeline):
+        body = {"question": "Top electronics in SP?", "retrieval": "baseline"}
+
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            outcomes = list(pool.map(lambda _: request(server, "POST", "/v1/answer", body), range(5)))
+
+        assert [status for status, _ in outcomes] == [200] * 5
+        assert sum(payload["coalesced"] for _, payload in outcomes) == 4
+        assert pipeline.client.run_query.call_count == 1
+
+    def test_different_requests_run_separately(self, server, pipeline):
+        bodies = [
+            {"question": "Top electronics in SP?", "retrieval": "baseline"},
+            {"question": "Top electronics in RJ?", "retrieval": "baseline"},
+        ]
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            outcomes = list(pool.map(lambda body: request(server, "POST", "/v1/answer", body), bodies))
+
+        assert not any(payload["coalesced"] for _, payload in outcomes)
+        assert pipeline.client.run_query.call_count == 2
+
+    def test_stream_yields_tokens_then_result(self, server, pipeline):
+        pipeline.llm_registry.get = MagicMock(return_value=FakeListChatModel(responses=["SP leads."]))
+
+        lines = stream_lines(server, {"question": "Top electronics in SP?", "retrieval": "baseline"})
+
+        tokens = [line["token"] for line in lines if "token" in line]
+        assert len(tokens) > 1 and "".join(tokens) == "SP leads."
+        assert lines[-1]["done"] and lines[-1]["result"]["answer"] == "SP leads."
+
+    def test_identical_streams_share_one_generation(self, server, pipeline):
+        model = FakeListChatModel(responses=["SP leads."], sleep=0.02)
+        pipeline.llm_registry.get = MagicMock(return_value=model)
+        body = {"question": "Top electronics in SP?", "retrieval": "baseline"}
+
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            outcomes = list(pool.map(lambda _: stream_lines(server, body), range(3)))
+
+        for lines in outcomes:
+            assert "".join(line.get("token", "") for line in lines) == "SP leads."
+        assert sorted(lines[-1]["coalesced"] for lines in outcomes) == [False, True, True]
+        assert pipeline.client.run_query.call_count == 1
+
+    def test_bad_requests(self, server):
+        assert request(server, "POST", "/v1/answer", {"retrieval": "baseline"})[0] == 400
+        assert request(server, "POST", "/v1/answer", {"question": "x", "retrieval": "graph"})[0] == 400
+        assert request(server, "POST", "/v1/answer", {"question": "x", "model": "no-such-model"})[0] == 400
+        assert request(server, "GET", "/v1/nothing")[0] == 404
+
+    def test_non_string_model_is_400(self, server):
+        for name in ("model", "embed_model"):
+            status, payload = request(server, "POST", "/v1/answer", {"question": "x", name: ["a"]})
+            assert status == 400
+            assert name in payload["error"]
+
+    @pytest.mark.parametrize("content_length", ["abc", "-1"])
+    def test_invalid_content_length_is_400(self, server, content_length):
+        assert status_for_length(server, content_length) == 400
+
+    def test_scheduler_rejection_is_429(self, server, pipeline):
+        with patch.object(pipeline, "run", side_effect=SchedulerRejected("ollama queue wait over deadline")):
+            status, payload = request(server, "POST", "/v1/answer", {"question": "Top electronics in SP?"})
+
+        assert status == 429
+        assert "deadline" in payload["error"]
+
+    def test_health(self, server, pipeline):
+        status, payload = request(server, "GET", "/health")
+        assert status == 200 and payload["status"] == "ok"
+
+        pipeline.client.warm_up.return_value = False
+        status, payload = request(server, "GET", "/health?deep=1")
+        assert status == 503 and payload["neo4j"] is False
+
+    def test_metrics_report_route_latency(self, server):
+        request(server, "POST", "/v1/answer", {"question": "Top electronics in SP?", "retrieval": "baseline"})
+        request(server, "POST", "/v1/answer", {})
+
+        status, payload = request(server, "GET", "/metrics")
+
+        assert status == 200
+        latency = payload["server"]["latency_ms"]["POST /v1/answer"]
+        assert latency["count"] == 2
+        assert {"p50_ms", "p95_ms", "p99_ms"} <= set(latency)
+        assert payload["server"]["responses"] == {"POST /v1/answer 200": 1, "POST /v1/answer 400": 1}
+        assert payload["coalescing"]["executions"] == 1
+        assert "scheduler" in payload and "stages" in payload
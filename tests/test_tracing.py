@@ -0,0 +1,149 @@
+import json
+import pathlib
+import sys
+import threading
+
+ROOT = pathlib.Path(__file__).resolve().parents[1] / "src"
+sys.path.append(str(ROOT))
+
+import pytest
+from app.tracing import LatencyRecorder, Trace, export_spans, optional_span, percentile, to_otlp
+
+from test_pipeline import pipeline  # noqa: F401  (fixture)
+
+
+class TestTrace:
+    """Test span nesting, status and recording."""
+
+    def test_spans_nest_within_a_thread(self):
+        trace = Trace(recorder=LatencyRecorder())
+        with trace.span("retrieve") as root:
+            with trace.span("query_build") as child:
+                child.set(found=True)
+
+        assert child.parent_id == root.span_id
+        assert root.parent_id is None
+        assert {s.trace_id for s in trace.spans} == {trace.trace_id}
+        assert child.attributes == {"found": True}
+        assert root.end_ns >= child.end_ns
+
+    def test_explicit_parent_across_threads(self):
+        trace = Trace(recorder=LatencyRecorder())
+        thread_trace = []
+        with trace.span("retrieve") as root:
+
+            def run():
+                with trace.span("baseline_query", parent=root) as span:
+                    thread_trace.append(span)
+
+            worker = threading.Thread(target=run)
+            worker.start()
+            worker.join()
+
+        assert thread_trace[0].parent_id == root.span_id
+
+    def test_errors_mark_the_span(self):
+        trace = Trace(recorder=LatencyRecorder())
+        with pytest.raises(ValueError):
+            with trace.span("llm_call"):
+                raise ValueError("boom")
+
+        assert trace.spans[0].status == "error"
+        assert "boom" in trace.spans[0].attributes["error"]
+
+    def test_optional_span_without_trace(self):
+        with optional_span(None, "prompt_build") as span:
+            span.set(truncated=False)
+        assert span.attributes == {"truncated": False}
+
+
+class TestLatencyRecorder:
+    """Test per-stage percentile summaries."""
+
+    def test_percentiles(self):
+        recorder = LatencyRecorder()
+        for ms in range(1, 101):
+            recorder.observe("vector_query", float(ms))
+        summary = recorder.summary()["vector_query"]
+
+        assert summary["count"] == 100
+        assert summary["p50_ms"] == pytest.approx(50, abs=1)
+        assert summary["p95_ms"] == pytest.approx(95, abs=1)
+        assert summary["max_ms"] == 100
+
+    def test_window_is_bounded(self):
+        recorder = LatencyRecorder(maxlen=3)
+        for ms in (100.0, 1.0, 1.0, 1.0):
+            recorder.observe("llm_call", ms)
+        assert recorder.summary()["llm_call"]["max_ms"] == 1.0
+
+    def test_percentile_empty(self):
+        assert percentile([], 95) == 0.0
+
+
+class TestExport:
+    """Test JSON lines and OTLP export."""
+
+    def make_trace(self):
+        trace = Trace(recorder=LatencyRecorder())
+        with trace.span("retrieve", retrieval="hybrid"):
+            with trace.span("baseline_query") as span:
+                span.set(rows=3)
+        return trace
+
+    def test_jsonl(self, tmp_path):
+        trace = self.make_trace()
+        path = tmp_path / "spans.jsonl"
+        export_spans(trace.spans, str(path))
+        export_spans(trace.spans, str(path))
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+
+        assert len(lines) == 4
+        assert lines[0]["name"] == "baseline_query" and lines[0]["attributes"]["rows"] == 3
+        assert "duration_ms" in lines[0]
+
+    def test_otlp(self):
+        trace = self.make_trace()
+        spans = to_otlp(trace.spans)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        child = next(s for s in spans if s["name"] == "baseline_query")
+        root = next(s for s in spans if s["name"] == "retrieve")
+
+        assert child["parentSpanId"] == root["spanId"]
+        assert child["attributes"] == [{"key": "rows", "value": {"intValue": "3"}}]
+        assert int(child["endTimeUnixNano"]) >= int(child["startTimeUnixNano"])
+
+
+class TestPipelineSpans:
+    """Test that pipeline results carry per-stage spans."""
+
+    def test_run_records_every_retrieval_stage(self, pipeline):
+        result = pipeline.run("Top electronics in SP with rating > 4?", retrieval="hybrid")
+        names = {s.name for s in result.spans}
+
+        assert {
+            "retrieve",
+            "intent_classification",
+            "entity_extraction",
+            "query_build",
+            "baseline_query",
+            "embedding_encode",
+            "vector_query",
+            "context_assembly",
+            "generate",
+        } <= names
+        assert len({s.trace_id for s in result.spans}) == 1
+        root = next(s for s in result.spans if s.name == "retrieve")
+        baseline = next(s for s in result.spans if s.name == "baseline_query")
+        assert baseline.parent_id == root.span_id
+        assert baseline.attributes["rows"] == 1
+
+    def test_to_dict_serializes_spans(self, pipeline):
+        result = pipeline.run("Top electronics in SP?", retrieval="baseline")
+        payload = pipeline.to_dict(result)
+        assert all("duration_ms" in span for span in payload["spans"])
+
+    def test_export_path(self, pipeline, tmp_path):
+        pipeline.settings.trace_export_path = str(tmp_path / "spans.jsonl")
+        pipeline.run("Top electronics in SP?", retrieval="baseline")
+        names = [json.loads(line)["name"] for line in (tmp_path / "spans.jsonl").read_text().splitlines()]
+        assert "retrieve" in names and "generate" in names